@@ -0,0 +1,81 @@
+"""
+Logging dùng chung cho các app (cấu hình ở settings.LOGGING).
+
+- QueueStreamHandler: request chỉ đẩy record vào hàng đợi, một thread nền
+  (QueueListener) mới ghi ra stream, nên stdout/stderr chậm không chặn worker.
+  Hàng đợi đầy thì record bị bỏ (đếm trong `dropped`) thay vì chờ.
+- SamplingFilter: chỉ giữ một tỉ lệ record dưới WARNING (log ở hot path),
+  WARNING trở lên luôn được giữ.
+- JSONFormatter: mỗi record một dòng JSON, có kèm các field truyền qua `extra`.
+- parse_levels: đọc mức log theo module từ biến môi trường
+  (LOG_LEVELS="spotify_app.middlewares=DEBUG,payment=INFO").
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Thuộc tính có sẵn của LogRecord, phần còn lại là field truyền qua `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class SamplingFilter(logging.Filter):
+    """SamplingFilter(rate=0.1): giữ khoảng 10% record DEBUG/INFO."""
+
+    def __init__(self, rate=1.0, name=''):
+        super().__init__(name)
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class QueueStreamHandler(QueueHandler):
+    """Handler không chặn: format ở thread gọi, ghi stream ở thread nền."""
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec):
+    """"a.b=DEBUG,c=info" -> {"a.b": "DEBUG", "c": "INFO"}; bỏ qua mục sai cú pháp."""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, sep, level = item.partition('=')
+        level = level.strip().upper()
+        if sep and name.strip() and isinstance(logging.getLevelName(level), int):
+            levels[name.strip()] = level
+    return levels
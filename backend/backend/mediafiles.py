@@ -0,0 +1,121 @@
+"""
+Trả file media local có hỗ trợ HTTP Range (206/416), ETag mạnh và sendfile.
+
+ranged_file_response(request, path) trả về FileResponse:
+- ETag mạnh từ (mtime_ns, size): If-None-Match khớp -> 304, If-Range không
+  khớp -> bỏ qua Range và trả cả file.
+- Range một đoạn (bytes=a-b, bytes=a-, bytes=-n) -> 206 + Content-Range;
+  đoạn ngoài file -> 416. Nhiều đoạn thì trả cả file (được phép theo RFC 7233).
+- File được bọc trong FileSlice: giữ fileno() và vị trí đã seek, nên server có
+  wsgi.file_wrapper (gunicorn) gửi đúng đoạn bằng sendfile(), không copy qua
+  Python; server khác thì đọc theo block và dừng đúng ở cuối đoạn.
+"""
+import mimetypes
+import os
+import re
+
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileSlice:
+    """File-like chỉ đọc `length` byte kể từ vị trí hiện tại của file gốc."""
+
+    def __init__(self, fileobj, start, length):
+        self._file = fileobj
+        self._file.seek(start)
+        self._remaining = length
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def make_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # So sánh yếu cho If-None-Match: bỏ tiền tố W/
+    candidates = [tag.strip() for tag in header.split(',')]
+    return any(tag.replace('W/', '', 1) == etag for tag in candidates)
+
+
+def parse_range(header, size):
+    """
+    (start, end) của Range một đoạn, None nếu không có/không hỗ trợ (trả cả file),
+    hoặc False nếu không thỏa mãn được (416).
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-n: n byte cuối
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def ranged_file_response(request, path, content_type=None, cache_control='public, max-age=86400'):
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = make_etag(stat)
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Accept-Ranges'] = 'bytes'
+        if cache_control:
+            response['Cache-Control'] = cache_control
+        return response
+
+    if _etag_matches(request.headers.get('If-None-Match'), etag):
+        return finish(HttpResponseNotModified())
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range and if_range.strip() != etag:
+        # File đã đổi kể từ lần client lưu: trả cả file mới
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return finish(response)
+
+    start, end = byte_range or (0, size - 1)
+    length = max(end - start + 1, 0)
+    response = FileResponse(FileSlice(open(path, 'rb'), start, length), content_type=content_type)
+    # FileSlice không có .name nên FileResponse không tự đặt Content-Length
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return finish(response)
@@ -0,0 +1,32 @@
+"""
+Tiện ích cho các thao tác pymongo chạy thẳng qua DjongoManager (mongo_*).
+"""
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def insert_many_ignore_duplicates(manager, docs):
+    """
+    insert_many không theo thứ tự: document vi phạm unique index bị bỏ qua, các
+    document còn lại vẫn được ghi. Trả về tập index (trong docs) của các
+    document trùng; lỗi khác được raise lại nguyên BulkWriteError.
+    """
+    if not docs:
+        return set()
+    try:
+        manager.mongo_insert_many(docs, ordered=False)
+    except BulkWriteError as bwe:
+        write_errors = bwe.details.get('writeErrors', [])
+        if any(error.get('code') != DUPLICATE_KEY_ERROR for error in write_errors):
+            raise
+        return {error['index'] for error in write_errors}
+    return set()
+
+
+def write_error_message(bwe):
+    """errmsg của lỗi ghi đầu tiên không phải trùng khóa, để báo lại cho client."""
+    for error in bwe.details.get('writeErrors', []):
+        if error.get('code') != DUPLICATE_KEY_ERROR:
+            return error.get('errmsg')
+    return str(bwe)
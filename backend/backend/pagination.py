@@ -0,0 +1,85 @@
+"""
+Phân trang keyset theo _id (ObjectId) dùng chung cho spotify_app, music_library, chatting.
+
+Khác với LimitOffsetPagination, trang sau được lấy bằng điều kiện `_id > cursor`
+nên Mongo đi thẳng theo index _id: không count() toàn collection, không skip N
+document. Trang sâu tốn chi phí như trang đầu.
+"""
+from bson import ObjectId
+from bson.errors import InvalidId
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class ObjectIdCursorPagination(BasePagination):
+    """
+    Dùng: ?limit=20 cho trang đầu, sau đó đi theo link `next` (?cursor=<_id>).
+    Đặt ordering = '-_id' để lấy mới nhất trước.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = api_settings.PAGE_SIZE or 10
+    max_limit = 100
+    ordering = '_id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        cursor = self.get_cursor(request)
+
+        descending = self.ordering.startswith('-')
+        if cursor is not None:
+            lookup = '_id__lt' if descending else '_id__gt'
+            queryset = queryset.filter(**{lookup: cursor})
+
+        # Lấy dư 1 document để biết còn trang sau hay không
+        rows = list(queryset.order_by(self.ordering)[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.next_cursor = rows[-1]._id if self.has_next else None
+        return rows
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def get_cursor(self, request):
+        raw = request.query_params.get(self.cursor_query_param)
+        if not raw:
+            return None
+        try:
+            return ObjectId(raw)
+        except (InvalidId, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, str(self.next_cursor))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
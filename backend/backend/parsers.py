@@ -0,0 +1,40 @@
+"""
+Parser bổ sung cho DRF.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class InvalidLine:
+    """Dòng NDJSON không parse được, giữ lại để báo lỗi theo từng dòng thay vì hủy cả request."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class NDJSONParser(BaseParser):
+    """
+    application/x-ndjson: mỗi dòng một object JSON.
+    Trả về list, dòng lỗi được thay bằng InvalidLine.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        rows = []
+        try:
+            for raw in stream:
+                line = raw.decode(encoding).strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError as exc:
+                    rows.append(InvalidLine(f"JSON không hợp lệ: {exc}"))
+        except UnicodeDecodeError as exc:
+            raise ParseError(f"NDJSON parse error - {exc}")
+        return rows
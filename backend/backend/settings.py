@@ -205,6 +205,54 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Host được phép làm nguồn media từ xa (file âm thanh cho ffmpeg, ảnh gốc cho
+# thumbnail); URL khác chỉ được đọc nếu trỏ vào MEDIA_ROOT
+TRUSTED_MEDIA_HOSTS = ['res.cloudinary.com']
+
+# Cache đọc-xuyên cho chi tiết bài hát/album/nghệ sĩ (spotify_app/cache.py),
+# lưu trong CACHES['catalog'] dùng chung giữa các process
+CATALOG_CACHE = {
+    'TTL': 300,           # Giây
+    'MISSING_TTL': 30,    # Giây, cache âm: id vừa tra không thấy
+    'LIKED_TTL': 3600,    # Giây, Redis set id bài hát đã thích của mỗi user (cập nhật bằng SADD/SREM)
+}
+
+# Đọc metadata âm thanh từ header ở nền sau khi upload (spotify_app/audio.py)
+AUDIO_METADATA = {
+    'WORKERS': 4,              # Số thread đọc metadata
+    'HTTP_TIMEOUT': 10,        # Giây, mỗi request Range
+    'BLOCK_SIZE': 64 * 1024,   # Byte mỗi request Range
+}
+
+# Phân tích waveform/loudness (spotify_app/analysis.py, manage.py analyze_songs)
+AUDIO_ANALYSIS = {
+    'FFMPEG': 'ffmpeg',         # Binary ffmpeg (phải cài riêng, xem README) dùng để giải mã
+    'PEAKS': 1000,              # Số điểm waveform lưu cho mỗi bài hát
+    'TARGET_LOUDNESS': -14.0,   # LUFS, để tính gain chuẩn hóa âm lượng trả cho client
+}
+
+# Phân đoạn MP3 kiểu HLS (spotify_app/hls.py), segment lưu ở MEDIA_ROOT/hls
+HLS = {
+    'SEGMENT_SECONDS': 6,                # Độ dài mục tiêu mỗi segment
+    'CACHE_MAX_BYTES': 2 * 1024 ** 3,    # Vượt quá thì xóa các bài ít dùng nhất
+}
+
+# Ảnh thu nhỏ cho cover/avatar (spotify_app/images.py), lưu ở MEDIA_ROOT/variants
+IMAGE_VARIANTS = {
+    'SIZES': {'thumb': 64, 'small': 300, 'medium': 640},   # Cạnh ảnh vuông (px)
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+    'MAX_SOURCE_BYTES': 20 * 1024 * 1024,   # Ảnh gốc lớn hơn thì không xử lý
+    'HTTP_TIMEOUT': 10,
+    'WORKERS': 2,                           # Thread tạo ảnh nền khi serialize một object (không phải list)
+    'MAX_PENDING': 100,                     # Quá số ảnh đang chờ thì bỏ qua, ảnh được tạo khi client tải
+}
+
+# Index tìm kiếm trong process (spotify_app/search.py)
+SEARCH_INDEX = {
+    'REBUILD_INTERVAL': 900,  # Giây, build lại nền để nhận thay đổi từ worker khác
+}
+
 import os
 from dotenv import load_dotenv
 
@@ -218,6 +266,75 @@ SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("REDIRECT_URI")
 SCOPE = "user-read-private user-read-email"
 
+# Cache dùng chung giữa các process (runserver :8000, daphne :8001, worker gunicorn).
+# Redis nên chạy với maxmemory-policy allkeys-lru để tự loại entry ít dùng.
+# IGNORE_EXCEPTIONS: Redis không kết nối được thì coi như cache miss, đọc thẳng DB.
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1")
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'spotify',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 1,
+            'SOCKET_TIMEOUT': 1,
+            'IGNORE_EXCEPTIONS': True,
+        },
+    },
+}
+
+
+# Logging (backend/log.py): ghi qua hàng đợi, thread nền mới ghi ra stderr.
+# Production (DEBUG tắt) mặc định chỉ WARNING trở lên; bật chi tiết theo module
+# bằng LOG_LEVELS="spotify_app.middlewares=DEBUG,payment=INFO".
+# LOG_SAMPLE_RATE giữ một tỉ lệ record DEBUG/INFO, LOG_FORMAT=json cho log collector.
+from backend.log import parse_levels
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG else "WARNING").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sampling': {
+            '()': 'backend.log.SamplingFilter',
+            'rate': LOG_SAMPLE_RATE,
+        },
+    },
+    'formatters': {
+        'text': {
+            'format': '%(asctime)s %(levelname)s %(name)s: %(message)s',
+        },
+        'json': {
+            '()': 'backend.log.JSONFormatter',
+        },
+    },
+    'handlers': {
+        'queue': {
+            '()': 'backend.log.QueueStreamHandler',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'text',
+            'filters': ['sampling'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        app: {'level': LOG_LEVEL}
+        for app in ('backend', 'spotify_app', 'music_library', 'user_management',
+                    'chatting', 'payment', 'spotify_api')
+    },
+}
+for _name, _level in parse_levels(os.getenv("LOG_LEVELS")).items():
+    LOGGING['loggers'].setdefault(_name, {})['level'] = _level
+
 
 # Authentication settings
 REST_FRAMEWORK = {
@@ -0,0 +1,78 @@
+"""
+Trả JSON dạng stream cho các danh sách lớn (?stream=true, export dùng ?stream=ndjson).
+
+Queryset được duyệt bằng cursor theo từng lô (iterator(chunk_size)), mỗi lô
+được serialize rồi ghi ra ngay, nên bộ nhớ mỗi request chỉ giữ một lô và
+byte đầu tiên được gửi trước khi đọc xong document cuối.
+"""
+from bson import ObjectId
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class ObjectIdJSONEncoder(JSONEncoder):
+    """JSONEncoder của DRF, thêm hỗ trợ ObjectId (khỏi phải str() từng field)."""
+
+    def default(self, obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        return super().default(obj)
+
+
+def wants_stream(request):
+    return request.query_params.get('stream', '').lower() in ('1', 'true', 'yes', 'ndjson')
+
+
+def wants_ndjson(request):
+    # Không dùng ?format= vì DRF dành tham số đó cho content negotiation
+    return request.query_params.get('stream', '').lower() == 'ndjson'
+
+
+def iter_batches(queryset, batch_size):
+    batch = []
+    for obj in queryset.iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_json_array(queryset, serializer_class, batch_size=500, context=None):
+    encoder = ObjectIdJSONEncoder(ensure_ascii=False)
+    yield '['
+    first = True
+    for batch in iter_batches(queryset, batch_size):
+        rows = serializer_class(batch, many=True, context=context or {}).data
+        chunk = ','.join(encoder.encode(row) for row in rows)
+        if not first:
+            chunk = ',' + chunk
+        first = False
+        yield chunk
+    yield ']'
+
+
+def iter_ndjson(queryset, serializer_class, batch_size=500, context=None):
+    encoder = ObjectIdJSONEncoder(ensure_ascii=False)
+    for batch in iter_batches(queryset, batch_size):
+        rows = serializer_class(batch, many=True, context=context or {}).data
+        yield ''.join(encoder.encode(row) + '\n' for row in rows)
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    StreamingJSONResponse(queryset, SongSerializer) -> mảng JSON
+    StreamingJSONResponse(queryset, SongSerializer, ndjson=True) -> mỗi dòng một document
+    """
+
+    def __init__(self, queryset, serializer_class, batch_size=500, ndjson=False, context=None, **kwargs):
+        if ndjson:
+            content = iter_ndjson(queryset, serializer_class, batch_size, context)
+            kwargs.setdefault('content_type', 'application/x-ndjson; charset=utf-8')
+        else:
+            content = iter_json_array(queryset, serializer_class, batch_size, context)
+            kwargs.setdefault('content_type', 'application/json; charset=utf-8')
+        super().__init__(content, **kwargs)
+        # Không để proxy (nginx) gom cả response lại rồi mới gửi
+        self['X-Accel-Buffering'] = 'no'
@@ -309,10 +309,13 @@ class SchemaFactory:
         item_example: Dict,
         search_fields: Optional[List[str]] = None,
         description: str = "",
-        pagination: bool = True,
+        pagination: Union[bool, str] = True,
         serializer=None
     ):
-        """Tạo schema cho GET list API"""
+        """Tạo schema cho GET list API
+
+        pagination: True (limit/offset), 'cursor' (ObjectIdCursorPagination) hoặc False
+        """
         query_params = []
         
         if search_fields:
@@ -321,7 +324,12 @@ class SchemaFactory:
                 'description': f'Filter by {field}'
             } for field in search_fields)
         
-        if pagination:
+        if pagination == 'cursor':
+            query_params.extend([
+                {'name': 'limit', 'type': OpenApiTypes.INT, 'description': 'Items per page'},
+                {'name': 'cursor', 'description': '_id of the last item of the previous page'}
+            ])
+        elif pagination:
             query_params.extend([
                 {'name': 'limit', 'type': OpenApiTypes.INT, 'description': 'Items per page'},
                 {'name': 'offset', 'type': OpenApiTypes.INT, 'description': 'Start position'}
@@ -330,7 +338,12 @@ class SchemaFactory:
         success_response = {
             "results": [item_example, item_example]
         }
-        if pagination:
+        if pagination == 'cursor':
+            success_response.update({
+                "next": None,
+                "previous": None
+            })
+        elif pagination:
             success_response.update({
                 "count": 2,
                 "next": None,
@@ -4,6 +4,9 @@ from channels.db import database_sync_to_async
 from .models import ChatRoom, Message
 from user_management.models import User
 from bson import ObjectId
+import logging
+
+logger = logging.getLogger(__name__)
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -60,7 +63,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     }
                 )
         except Exception as e:
-            print(f"Error in receive: {str(e)}")
+            logger.error("Error in receive: %s", e)
 
     async def chat_message(self, event):
         # Send message to WebSocket
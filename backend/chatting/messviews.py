@@ -8,6 +8,7 @@ from rest_framework.pagination import LimitOffsetPagination
 from backend.utils import SchemaFactory
 from .models import ChatRoom, Message
 from user_management.models import User
+from spotify_app.images import image_variants
 from django.utils import timezone
 
 @SchemaFactory.list_schema(
@@ -50,7 +51,8 @@ def get_messages(request, room_id):
                     "user": {
                         "_id": str(user._id),
                         "name": user.name,
-                        "profile_pic": user.profile_pic
+                        "profile_pic": user.profile_pic,
+                        "profile_pic_variants": image_variants(user.profile_pic)
                     }
                 })
             except User.DoesNotExist:
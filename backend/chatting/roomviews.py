@@ -14,6 +14,9 @@ from django.utils import timezone
 from .models import ChatRoom, Message
 from user_management.models import User
 from rest_framework.pagination import LimitOffsetPagination
+import logging
+
+logger = logging.getLogger(__name__)
 
 @SchemaFactory.post_schema(
     request_example={
@@ -104,15 +107,11 @@ def create_room(request):
                 "is_host": True
             }, status=status.HTTP_201_CREATED)
         except Exception as e:
-            import traceback
-            print(f"Error creating room: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error creating room: %s", e)
             return Response({"error": f"Error creating room: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     except Exception as e:
-        import traceback
-        print(f"Unexpected error in create_room: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Unexpected error in create_room: %s", e)
         return Response({"error": f"Unexpected error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @SchemaFactory.list_schema(
@@ -422,27 +421,27 @@ def get_user_rooms(request):
     """
     try:
         user_id = request.query_params.get('user_id')
-        print(f"Received request for user_id: {user_id}")
+        logger.debug("Received request for user_id: %s", user_id)
         
         if not user_id:
             return Response({"error": "User ID is required"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             user = User.objects.get(_id=ObjectId(user_id))
-            print(f"Found user: {user.name}")
+            logger.debug("Found user: %s", user.name)
         except User.DoesNotExist:
-            print(f"User not found with ID: {user_id}")
+            logger.warning("User not found with ID: %s", user_id)
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            print(f"Error finding user: {str(e)}")
+            logger.error("Error finding user: %s", e)
             return Response({"error": f"Error finding user: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Get all rooms where the user is either a member or the host
         try:
             rooms = ChatRoom.objects.filter(users=user).order_by('-created_at')
-            print(f"Found {rooms.count()} rooms for user")
+            logger.debug("Found %s rooms for user", rooms.count())
         except Exception as e:
-            print(f"Error querying rooms: {str(e)}")
+            logger.error("Error querying rooms: %s", e)
             return Response({"error": f"Error querying rooms: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Apply pagination
@@ -450,7 +449,7 @@ def get_user_rooms(request):
         try:
             paginated_rooms = paginator.paginate_queryset(rooms, request)
         except Exception as e:
-            print(f"Error paginating rooms: {str(e)}")
+            logger.error("Error paginating rooms: %s", e)
             return Response({"error": f"Error paginating rooms: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Format response
@@ -474,15 +473,13 @@ def get_user_rooms(request):
                 "previous": paginator.get_previous_link(),
                 "results": room_list
             }
-            print(f"Returning response with {len(room_list)} rooms")
+            logger.debug("Returning response with %s rooms", len(room_list))
             return Response(response_data)
         except Exception as e:
-            print(f"Error formatting response: {str(e)}")
+            logger.error("Error formatting response: %s", e)
             return Response({"error": f"Error formatting response: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     except Exception as e:
-        import traceback
-        print(f"Unexpected error in get_user_rooms: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Unexpected error in get_user_rooms: %s", e)
         return Response({"error": f"Unexpected error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
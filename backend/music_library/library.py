@@ -0,0 +1,89 @@
+"""
+"Thư viện" của user: bài hát/album/playlist đã thích, playlist của chính user
+và nghệ sĩ đang theo dõi, gộp thành một danh sách mới nhất trước.
+
+Thứ tự toàn cục là (thời điểm, type, _id của dòng nguồn) giảm dần; cursor mã
+hóa đúng bộ ba đó của phần tử cuối trang. Mỗi nguồn chỉ đọc tối đa limit + 1
+dòng sau cursor theo index (user, thời điểm), gộp lại rồi cắt trang, sau đó
+đối tượng liên quan của cả trang được lấy bằng một truy vấn $in mỗi loại.
+"""
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from django.db.models import Q
+
+from spotify_app.models import Album, Artist, Follow, Playlist, Song
+from .models import FavoriteAlbum, FavoritePlaylist, FavoriteSong
+
+TYPES = ('album', 'artist', 'playlist', 'song')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, item_type, row_id):
+    raw = json.dumps([timestamp.isoformat(), item_type, str(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        timestamp, item_type, row_id = json.loads(raw)
+        cursor = (datetime.fromisoformat(timestamp), item_type, ObjectId(row_id))
+    except Exception:
+        raise InvalidCursor(value)
+    if cursor[1] not in TYPES:
+        raise InvalidCursor(value)
+    return cursor
+
+
+def _sources(user_id):
+    """(type, queryset, trường thời điểm, trường id đối tượng liên quan hoặc None nếu là chính dòng đó, owned)."""
+    return [
+        ('song', FavoriteSong.objects.filter(user=user_id), 'added_at', 'song', False),
+        ('album', FavoriteAlbum.objects.filter(user=user_id), 'added_at', 'album', False),
+        ('playlist', FavoritePlaylist.objects.filter(user=user_id), 'added_at', 'playlist', False),
+        ('playlist', Playlist.objects.filter(user_id=user_id), 'created_at', None, True),
+        ('artist', Follow.objects.filter(follower=user_id, target_artist__isnull=False), 'created_at', 'target_artist', False),
+    ]
+
+
+def _after(queryset, field, item_type, cursor):
+    """Các dòng đứng sau cursor trong thứ tự (thời điểm, type, _id) giảm dần."""
+    if cursor is None:
+        return queryset
+    timestamp, cursor_type, row_id = cursor
+    if item_type < cursor_type:
+        return queryset.filter(**{f'{field}__lte': timestamp})
+    if item_type > cursor_type:
+        return queryset.filter(**{f'{field}__lt': timestamp})
+    return queryset.filter(Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, '_id__lt': row_id}))
+
+
+def library_page(user_id, types, limit, cursor=None):
+    """Trả về (các dòng của trang, cursor trang sau hoặc None). Mỗi dòng: (thời điểm, type, row_id, object_id, owned)."""
+    rows = []
+    for item_type, queryset, field, related, owned in _sources(user_id):
+        if item_type not in types:
+            continue
+        queryset = _after(queryset, field, item_type, cursor).order_by(f'-{field}', '-_id')
+        fields = ('_id', field, related) if related else ('_id', field)
+        for row_id, timestamp, *object_id in queryset.values_list(*fields)[:limit + 1]:
+            rows.append((timestamp, item_type, row_id, object_id[0] if object_id else row_id, owned))
+    rows.sort(key=lambda row: row[:3], reverse=True)
+    page = rows[:limit]
+    next_cursor = encode_cursor(*page[-1][:3]) if len(rows) > limit else None
+    return page, next_cursor
+
+
+def resolve(rows):
+    """{type: {object_id: object}} cho các dòng của trang, một truy vấn $in mỗi loại."""
+    models = {'song': Song, 'album': Album, 'playlist': Playlist, 'artist': Artist}
+    ids = {}
+    for _, item_type, _, object_id, _ in rows:
+        ids.setdefault(item_type, set()).add(object_id)
+    return {item_type: models[item_type].objects.in_bulk(list(object_ids)) for item_type, object_ids in ids.items()}
@@ -0,0 +1,56 @@
+# Generated by Django 3.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+from pymongo import UpdateOne
+
+from music_library.ordering import keys_after
+
+BATCH_SIZE = 1000
+
+
+def backfill_positions(apps, schema_editor):
+    # Giữ thứ tự cũ (thứ tự thêm vào) cho các playlist đã có
+    PlaylistSong = apps.get_model('music_library', 'PlaylistSong')
+    # Model lịch sử không có DjongoManager nên ghi qua collection pymongo
+    schema_editor.connection.ensure_connection()
+    collection = schema_editor.connection.connection[PlaylistSong._meta.db_table]
+    rows = PlaylistSong.objects.order_by('playlist', 'added_at', '_id').values_list('_id', 'playlist')
+
+    operations = []
+    current, row_ids = None, []
+
+    def flush_playlist():
+        for row_id, key in zip(row_ids, keys_after(None, len(row_ids))):
+            operations.append(UpdateOne({'_id': row_id}, {'$set': {'position': key}}))
+
+    for row_id, playlist_id in rows.iterator(chunk_size=5000):
+        if playlist_id != current:
+            flush_playlist()
+            current, row_ids = playlist_id, []
+            if len(operations) >= BATCH_SIZE:
+                collection.bulk_write(operations, ordered=False)
+                operations = []
+        row_ids.append(row_id)
+    flush_playlist()
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_library', '0003_remove_song_album_alter_artistperform_artist_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlistsong',
+            name='position',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='playlistsong',
+            index=models.Index(fields=['playlist', 'position'], name='playlist_song_position_idx'),
+        ),
+    ]
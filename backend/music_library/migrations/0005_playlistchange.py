@@ -0,0 +1,34 @@
+# Generated by Django 3.2 on 2026-10-18 09:30
+
+import bson.objectid
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '__first__'),
+        ('music_library', '0004_playlistsong_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaylistChange',
+            fields=[
+                ('_id', djongo.models.fields.ObjectIdField(auto_created=True, default=bson.objectid.ObjectId, editable=False, primary_key=True, serialize=False)),
+                ('version', models.IntegerField()),
+                ('op', models.CharField(max_length=10)),
+                ('song_id', models.CharField(blank=True, max_length=24, null=True)),
+                ('position', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='spotify_app.playlist')),
+            ],
+            options={
+                'db_table': 'playlist_changes',
+                'unique_together': {('playlist', 'version')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2 on 2026-10-18 10:00
+
+import bson.objectid
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import djongo.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '__first__'),
+        ('spotify_app', '__first__'),
+        ('music_library', '0005_playlistchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmartPlaylist',
+            fields=[
+                ('_id', djongo.models.fields.ObjectIdField(auto_created=True, default=bson.objectid.ObjectId, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('rule', models.CharField(choices=[('liked_followed_artists', 'Bài hát đã thích của nghệ sĩ đang theo dõi'), ('recent_releases', 'Bài hát phát hành trong N ngày gần đây')], max_length=32)),
+                ('days', models.IntegerField(default=30)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='user_management.user')),
+            ],
+            options={
+                'db_table': 'smart_playlists',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='smartplaylist',
+            index=models.Index(fields=['rule'], name='smart_playlist_rule_idx'),
+        ),
+        migrations.CreateModel(
+            name='SmartPlaylistSong',
+            fields=[
+                ('_id', djongo.models.fields.ObjectIdField(auto_created=True, default=bson.objectid.ObjectId, editable=False, primary_key=True, serialize=False)),
+                ('sort_key', models.DateTimeField()),
+                ('smart_playlist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='music_library.smartplaylist')),
+                ('song', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='spotify_app.song')),
+            ],
+            options={
+                'db_table': 'smart_playlist_songs',
+                'unique_together': {('smart_playlist', 'song')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='smartplaylistsong',
+            index=models.Index(fields=['smart_playlist', 'sort_key'], name='smart_playlist_song_sort_idx'),
+        ),
+    ]
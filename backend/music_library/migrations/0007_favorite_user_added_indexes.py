@@ -0,0 +1,25 @@
+# Generated by Django 3.2 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music_library', '0006_smartplaylist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favoritesong',
+            index=models.Index(fields=['user', 'added_at'], name='favorite_song_user_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favoritealbum',
+            index=models.Index(fields=['user', 'added_at'], name='favorite_album_user_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favoriteplaylist',
+            index=models.Index(fields=['user', 'added_at'], name='fav_playlist_user_added_idx'),
+        ),
+    ]
@@ -11,15 +11,71 @@ class PlaylistSong(models.Model):
     playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE)
     song = models.ForeignKey(Song, on_delete=models.CASCADE)
     added_at = models.DateTimeField(auto_now_add=True)
+    # Khóa thứ tự trong playlist (music_library/ordering.py), sắp xếp theo (position, _id)
+    position = models.CharField(max_length=255, default='', blank=True)
+    # DjongoManager để ghi hàng loạt bằng insert_many (xem add_songs_to_playlist_batch)
+    objects = models.DjongoManager()
 
     class Meta:
         unique_together = ('playlist', 'song') # Đảm bảo không có bài hát nào được thêm nhiều lần vào cùng một playlist
+        indexes = [models.Index(fields=['playlist', 'position'], name='playlist_song_position_idx')]
         db_table = "playlist_songs"
 
+class PlaylistChange(models.Model):
+    """Nhật ký thay đổi của playlist, mỗi dòng ứng với một snapshot_id (spotify_app/snapshots.py)."""
+    _id = models.ObjectIdField(primary_key=True, default=ObjectId, editable=False)
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE)
+    version = models.IntegerField()
+    op = models.CharField(max_length=10)   # add | remove | move | update
+    song_id = models.CharField(max_length=24, blank=True, null=True)   # Giữ cả khi bài hát đã bị xóa
+    position = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    objects = models.DjongoManager()
+
+    class Meta:
+        unique_together = ('playlist', 'version')
+        db_table = "playlist_changes"
+
+class SmartPlaylist(models.Model):
+    """Playlist tự động theo luật (music_library/smart.py); liked_followed_artists được duy trì tăng dần trong SmartPlaylistSong."""
+    RULE_LIKED_BY_FOLLOWED_ARTISTS = 'liked_followed_artists'
+    RULE_RECENT_RELEASES = 'recent_releases'
+    RULE_CHOICES = [
+        (RULE_LIKED_BY_FOLLOWED_ARTISTS, 'Bài hát đã thích của nghệ sĩ đang theo dõi'),
+        (RULE_RECENT_RELEASES, 'Bài hát phát hành trong N ngày gần đây'),
+    ]
+
+    _id = models.ObjectIdField(primary_key=True, default=ObjectId, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    name = models.CharField(max_length=255)
+    rule = models.CharField(max_length=32, choices=RULE_CHOICES)
+    days = models.IntegerField(default=30)   # Chỉ dùng cho recent_releases
+    created_at = models.DateTimeField(default=timezone.now)
+    objects = models.DjongoManager()
+
+    class Meta:
+        indexes = [models.Index(fields=['rule'], name='smart_playlist_rule_idx')]
+        db_table = "smart_playlists"
+
+class SmartPlaylistSong(models.Model):
+    _id = models.ObjectIdField(primary_key=True, default=ObjectId, editable=False)
+    smart_playlist = models.ForeignKey(SmartPlaylist, on_delete=models.CASCADE)
+    song = models.ForeignKey(Song, on_delete=models.CASCADE)
+    # Thời điểm thích, mới nhất trước (recent_releases không có dòng nào, xem smart.page)
+    sort_key = models.DateTimeField()
+    objects = models.DjongoManager()
+
+    class Meta:
+        unique_together = ('smart_playlist', 'song')
+        indexes = [models.Index(fields=['smart_playlist', 'sort_key'], name='smart_playlist_song_sort_idx')]
+        db_table = "smart_playlist_songs"
+
 class ArtistPerform(models.Model):
     _id = models.ObjectIdField(primary_key=True, default=ObjectId, editable=False)
     artist = models.ForeignKey(Artist, on_delete=models.CASCADE)
     song = models.ForeignKey(Song, on_delete=models.CASCADE)
+    # DjongoManager để ghi hàng loạt bằng insert_many (xem link_artist_performances)
+    objects = models.DjongoManager()
     # Sửa lại không gắn _id sau artist và song vì mongodb tự động thêm
     class Meta:
         unique_together = ('artist', 'song')
@@ -36,6 +92,8 @@ class FavoriteSong(models.Model):
 
     class Meta:
         unique_together = ('user', 'song') 
+        # Thư viện của user đọc theo (user, added_at) mới nhất trước (music_library/library.py)
+        indexes = [models.Index(fields=['user', 'added_at'], name='favorite_song_user_added_idx')]
         db_table = "favorite_songs"
 
     # def __str__(self):
@@ -49,6 +107,7 @@ class FavoriteAlbum(models.Model):
 
     class Meta:
         unique_together = ('user', 'album')
+        indexes = [models.Index(fields=['user', 'added_at'], name='favorite_album_user_added_idx')]
         db_table = "favorite_albums"
 
     # def __str__(self):
@@ -62,6 +121,7 @@ class FavoritePlaylist(models.Model):
 
     class Meta:
         unique_together = ('user', 'playlist')
+        indexes = [models.Index(fields=['user', 'added_at'], name='fav_playlist_user_added_idx')]
         db_table = "favorite_playlists"
 
     def __str__(self):
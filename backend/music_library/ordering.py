@@ -0,0 +1,171 @@
+"""
+Thứ tự bài hát trong playlist bằng khóa xếp hạng dạng chuỗi (fractional indexing).
+
+PlaylistSong.position là chuỗi base 62 so sánh theo thứ tự byte (đúng thứ tự
+Mongo dùng khi sort chuỗi). key_between(a, b) luôn sinh được một khóa nằm giữa
+a và b, nên chuyển một bài sang chỗ khác chỉ cần ghi lại position của đúng
+document đó, không phải đánh số lại cả playlist.
+
+Khóa gồm phần "nguyên" (ký tự đầu cho biết độ dài: 'a0', 'a1', ..., 'b10', ...)
+và phần thập phân tùy ý. Thêm vào cuối chỉ tăng phần nguyên nên khóa dài theo
+log(n); chèn nhiều lần vào cùng một khe thì phần thập phân dài thêm ~1 ký tự
+mỗi 6 lần. Thuật toán theo thư viện fractional-indexing (David Greenspan).
+"""
+from bson import ObjectId
+from django.db.models import Q
+
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+INTEGER_ZERO = 'a0'
+SMALLEST_INTEGER = 'A' + DIGITS[0] * 26
+
+
+def _midpoint(a, b):
+    """Chuỗi thập phân nằm giữa a và b (b=None là +vô cùng); không có số 0 ở cuối."""
+    if b is not None:
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head):
+    if 'a' <= head <= 'z':
+        return ord(head) - ord('a') + 2
+    if 'A' <= head <= 'Z':
+        return ord('Z') - ord(head) + 2
+    raise ValueError(f'Invalid order key head: {head!r}')
+
+
+def _integer_part(key):
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f'Invalid order key: {key!r}')
+    return key[:length]
+
+
+def _increment_integer(value):
+    head, digits = value[0], list(value[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        d = DIGITS.index(digits[i]) + 1
+        if d < len(DIGITS):
+            digits[i] = DIGITS[d]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[0]
+    if head == 'Z':
+        return 'a' + DIGITS[0]
+    if head == 'z':
+        return None
+    head = chr(ord(head) + 1)
+    if head > 'a':
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
+
+
+def _decrement_integer(value):
+    head, digits = value[0], list(value[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        d = DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = DIGITS[d]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[-1]
+    if head == 'a':
+        return 'Z' + DIGITS[-1]
+    if head == 'A':
+        return None
+    head = chr(ord(head) - 1)
+    if head < 'Z':
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
+
+
+def key_between(a, b):
+    """Khóa k với a < k < b; a=None là đầu danh sách, b=None là cuối danh sách."""
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f'{a!r} >= {b!r}')
+    if a is None:
+        if b is None:
+            return INTEGER_ZERO
+        integer = _integer_part(b)
+        if integer == SMALLEST_INTEGER:
+            return integer + _midpoint('', b[len(integer):])
+        if integer < b:
+            return integer
+        result = _decrement_integer(integer)
+        if result is None:
+            raise ValueError('Cannot decrement order key any further')
+        return result
+    integer = _integer_part(a)
+    fraction = a[len(integer):]
+    if b is None:
+        result = _increment_integer(integer)
+        return result if result is not None else integer + _midpoint(fraction, None)
+    if integer == _integer_part(b):
+        return integer + _midpoint(fraction, b[len(integer):])
+    result = _increment_integer(integer)
+    if result is None:
+        raise ValueError('Cannot increment order key any further')
+    return result if result < b else integer + _midpoint(fraction, None)
+
+
+def keys_after(a, count):
+    """count khóa tăng dần ngay sau a (thêm nhiều bài vào cuối playlist)."""
+    keys = []
+    for _ in range(count):
+        a = key_between(a, None)
+        keys.append(a)
+    return keys
+
+
+def last_position(playlist_id):
+    """Khóa lớn nhất hiện có của playlist, None nếu playlist rỗng (dùng index (playlist, position))."""
+    from .models import PlaylistSong
+
+    return (
+        PlaylistSong.objects.filter(playlist=playlist_id)
+        .exclude(position='')
+        .order_by('-position')
+        .values_list('position', flat=True)
+        .first()
+    )
+
+
+def position_cursor(position, row_id):
+    """Cursor trang sau theo thứ tự (position, _id): "<position>.<_id>", không cần mã hóa URL."""
+    return f'{position}.{row_id}'
+
+
+def parse_position_cursor(cursor):
+    """(position, _id) từ cursor; cursor cũ chỉ có position trả _id None. Sai định dạng: ValueError."""
+    position, _, row_id = cursor.partition('.')
+    if not position or any(char not in DIGITS for char in position):
+        raise ValueError(f'Invalid position cursor: {cursor!r}')
+    if not row_id:
+        return position, None
+    if not ObjectId.is_valid(row_id):
+        raise ValueError(f'Invalid position cursor: {cursor!r}')
+    return position, ObjectId(row_id)
+
+
+def after_position(queryset, cursor):
+    """
+    Các dòng đứng sau cursor trong thứ tự (position, _id). Hai bài có thể trùng
+    position (hai request thêm vào cuối cùng đọc last_position trước khi bên kia
+    ghi) nên so sánh cả _id để không bỏ sót dòng nằm ở ranh giới trang.
+    """
+    position, row_id = parse_position_cursor(cursor)
+    if row_id is None:
+        return queryset.filter(position__gt=position)
+    return queryset.filter(Q(position__gt=position) | Q(position=position, _id__gt=row_id))
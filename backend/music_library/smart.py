@@ -0,0 +1,227 @@
+"""
+Smart playlist: danh sách bài hát theo luật.
+
+Mở một smart playlist luôn là một range query theo index, mới nhất trước
+(page()), phân trang bằng cursor (sort_key, _id) mã hóa như library.encode_cursor.
+
+Luật:
+- liked_followed_artists: bài hát user đã thích và do ít nhất một nghệ sĩ user
+  đang theo dõi biểu diễn. Các dòng SmartPlaylistSong được tính sẵn lúc tạo
+  (build) rồi cập nhật tăng dần khi FavoriteSong, Follow (target_artist) hoặc
+  ArtistPerform được tạo/xóa; đọc theo index (smart_playlist, sort_key), không
+  join lại FavoriteSong/Follow/ArtistPerform.
+- recent_releases: bài hát tạo trong `days` ngày gần đây, giống nhau với mọi
+  user nên không lưu dòng nào: đọc thẳng Song theo index (created_at, _id)
+  (spotify_app.signals.ensure_indexes).
+
+signals.py gọi các hàm *_added/*_removed cho thay đổi qua ORM; các đường ghi
+hàng loạt bỏ qua signals (link_artist_performances) gọi trực tiếp. Dữ liệu ghi thẳng vào Mongo thì chạy `python manage.py rebuild_smart_playlists`.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.db.models import Q
+from django.utils.timezone import now
+
+from backend.mongo import insert_many_ignore_duplicates
+from spotify_app.models import Follow, Song
+from .library import InvalidCursor
+from .models import ArtistPerform, FavoriteSong, SmartPlaylist, SmartPlaylistSong
+
+LIKED = SmartPlaylist.RULE_LIKED_BY_FOLLOWED_ARTISTS
+RECENT = SmartPlaylist.RULE_RECENT_RELEASES
+
+
+def _owners(rule, user_ids=None):
+    """{smart_playlist_id: user_id} của các smart playlist theo luật (index rule / user)."""
+    playlists = SmartPlaylist.objects.filter(rule=rule)
+    if user_ids is not None:
+        playlists = playlists.filter(user__in=list(user_ids))
+    return dict(playlists.values_list('_id', 'user'))
+
+
+def _add(rows):
+    """rows: (smart_playlist_id, song_id, sort_key); cặp đã có bị unique index bỏ qua."""
+    documents = [
+        {'_id': ObjectId(), 'smart_playlist_id': playlist_id, 'song_id': song_id, 'sort_key': sort_key}
+        for playlist_id, song_id, sort_key in rows
+    ]
+    insert_many_ignore_duplicates(SmartPlaylistSong.objects, documents)
+
+
+def _remove(playlist_ids, song_ids):
+    playlist_ids, song_ids = list(playlist_ids), list(song_ids)
+    if playlist_ids and song_ids:
+        SmartPlaylistSong.objects.mongo_delete_many(
+            {'smart_playlist_id': {'$in': playlist_ids}, 'song_id': {'$in': song_ids}}
+        )
+
+
+def _followed_artists(user_ids):
+    """{(user_id, artist_id)} của các lượt theo dõi nghệ sĩ."""
+    return set(
+        Follow.objects.filter(follower__in=list(user_ids), target_artist__isnull=False)
+        .values_list('follower', 'target_artist')
+    )
+
+
+def _prune_liked(owners, song_ids):
+    """Bỏ khỏi các playlist liked_followed_artists những bài không còn nghệ sĩ nào được owner theo dõi."""
+    song_ids = list(song_ids)
+    if not owners or not song_ids:
+        return
+    members = SmartPlaylistSong.objects.filter(
+        smart_playlist__in=list(owners), song__in=song_ids
+    ).values_list('smart_playlist', 'song')
+    performers = {}
+    for song_id, artist_id in ArtistPerform.objects.filter(song__in=song_ids).values_list('song', 'artist'):
+        performers.setdefault(song_id, set()).add(artist_id)
+    follows = _followed_artists(set(owners.values()))
+    stale = {}
+    for playlist_id, song_id in members:
+        user_id = owners[playlist_id]
+        if not any((user_id, artist_id) in follows for artist_id in performers.get(song_id, ())):
+            stale.setdefault(playlist_id, []).append(song_id)
+    for playlist_id, stale_songs in stale.items():
+        _remove([playlist_id], stale_songs)
+
+
+# ---------------------------------------------------------------- liked_followed_artists
+
+def favorite_added(user_id, song_id, added_at):
+    owners = _owners(LIKED, [user_id])
+    if not owners:
+        return
+    artist_ids = list(ArtistPerform.objects.filter(song=song_id).values_list('artist', flat=True))
+    if artist_ids and Follow.objects.filter(follower=user_id, target_artist__in=artist_ids).exists():
+        _add((playlist_id, song_id, added_at) for playlist_id in owners)
+
+
+def favorite_removed(user_id, song_id):
+    _remove(_owners(LIKED, [user_id]), [song_id])
+
+
+def follow_added(user_id, artist_id):
+    owners = _owners(LIKED, [user_id])
+    if not owners:
+        return
+    song_ids = list(ArtistPerform.objects.filter(artist=artist_id).values_list('song', flat=True))
+    if not song_ids:
+        return
+    liked = FavoriteSong.objects.filter(user=user_id, song__in=song_ids).values_list('song', 'added_at')
+    _add((playlist_id, song_id, added_at) for song_id, added_at in liked for playlist_id in owners)
+
+
+def follow_removed(user_id, artist_id):
+    owners = _owners(LIKED, [user_id])
+    if owners:
+        _prune_liked(owners, ArtistPerform.objects.filter(artist=artist_id).values_list('song', flat=True))
+
+
+def _artist_followers(artist_ids):
+    """{(user_id, artist_id)} của các lượt theo dõi những nghệ sĩ này (chỉ họ bị ảnh hưởng)."""
+    artist_ids = list(artist_ids)
+    if not artist_ids:
+        return set()
+    return set(Follow.objects.filter(target_artist__in=artist_ids).values_list('follower', 'target_artist'))
+
+
+def performances_added(pairs):
+    """pairs: (artist_id, song_id) vừa được liên kết."""
+    performers = {}
+    for artist_id, song_id in pairs:
+        performers.setdefault(song_id, set()).add(artist_id)
+    follows = _artist_followers({artist_id for artists in performers.values() for artist_id in artists})
+    if not follows:
+        return
+    owners = _owners(LIKED, {user_id for user_id, _ in follows})
+    if not owners:
+        return
+    playlists_by_user = {}
+    for playlist_id, user_id in owners.items():
+        playlists_by_user.setdefault(user_id, []).append(playlist_id)
+    liked = FavoriteSong.objects.filter(
+        user__in=list(playlists_by_user), song__in=list(performers)
+    ).values_list('user', 'song', 'added_at')
+    _add(
+        (playlist_id, song_id, added_at)
+        for user_id, song_id, added_at in liked
+        if any((user_id, artist_id) in follows for artist_id in performers[song_id])
+        for playlist_id in playlists_by_user[user_id]
+    )
+
+
+def performances_removed(pairs):
+    pairs = list(pairs)
+    follows = _artist_followers({artist_id for artist_id, _ in pairs})
+    if follows:
+        _prune_liked(_owners(LIKED, {user_id for user_id, _ in follows}), {song_id for _, song_id in pairs})
+
+
+# ---------------------------------------------------------------- đọc
+
+def cutoff(smart_playlist):
+    """Mốc sort_key cũ nhất còn thuộc playlist, None nếu luật không giới hạn thời gian."""
+    if smart_playlist.rule == RECENT:
+        return now() - timedelta(days=smart_playlist.days)
+    return None
+
+
+def encode_cursor(sort_key, row_id):
+    raw = json.dumps([sort_key.isoformat(), str(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        sort_key, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_key), ObjectId(row_id)
+    except Exception:
+        raise InvalidCursor(value)
+
+
+def _rows(smart_playlist):
+    """(queryset, trường sort_key, trường id bài hát) của nguồn dữ liệu theo luật."""
+    if smart_playlist.rule == RECENT:
+        return Song.objects.visible().filter(created_at__gte=cutoff(smart_playlist)), 'created_at', '_id'
+    return SmartPlaylistSong.objects.filter(smart_playlist=smart_playlist._id), 'sort_key', 'song'
+
+
+def page(smart_playlist, limit, before=None):
+    """
+    Trả về (các dòng (row_id, song_id, sort_key) mới nhất trước, tổng số bài,
+    cursor trang sau hoặc None). before: cursor từ decode_cursor().
+    """
+    queryset, field, song_field = _rows(smart_playlist)
+    total = queryset.count()
+    if before is not None:
+        sort_key, row_id = before
+        queryset = queryset.filter(Q(**{f'{field}__lt': sort_key}) | Q(**{field: sort_key, '_id__lt': row_id}))
+    rows = list(queryset.order_by(f'-{field}', '-_id').values_list('_id', song_field, field)[:limit])
+    next_cursor = encode_cursor(rows[-1][2], rows[-1][0]) if len(rows) == limit else None
+    return rows, total, next_cursor
+
+
+# ---------------------------------------------------------------- build
+
+def build(smart_playlist):
+    """Tính toàn bộ danh sách một lần (lúc tạo hoặc rebuild); trả về số bài hát."""
+    SmartPlaylistSong.objects.mongo_delete_many({'smart_playlist_id': smart_playlist._id})
+    if smart_playlist.rule == RECENT:
+        # Không có gì để tính sẵn, page() đọc thẳng Song
+        return _rows(smart_playlist)[0].count()
+    artist_ids = list(
+        Follow.objects.filter(follower=smart_playlist.user_id, target_artist__isnull=False)
+        .values_list('target_artist', flat=True)
+    )
+    song_ids = list(
+        ArtistPerform.objects.filter(artist__in=artist_ids).values_list('song', flat=True)
+    ) if artist_ids else []
+    rows = list(FavoriteSong.objects.filter(
+        user=smart_playlist.user_id, song__in=song_ids
+    ).values_list('song', 'added_at')) if song_ids else []
+    _add((smart_playlist._id, song_id, sort_key) for song_id, sort_key in rows)
+    return len(rows)
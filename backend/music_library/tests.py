@@ -1,3 +1,312 @@
-from django.test import TestCase
+import random
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+from bson import ObjectId
+from django.db.models import Q
+from django.test import RequestFactory, SimpleTestCase
+from pymongo.errors import BulkWriteError
+
+from backend.mongo import insert_many_ignore_duplicates
+from music_library import library, smart, views
+from music_library.library import InvalidCursor
+from music_library.models import SmartPlaylist
+from music_library.ordering import (
+    key_between, keys_after, parse_position_cursor, position_cursor,
+)
+
+
+class KeyBetweenTests(SimpleTestCase):
+    def test_first_key(self):
+        self.assertEqual(key_between(None, None), 'a0')
+
+    def test_append_and_prepend(self):
+        self.assertEqual(key_between('a0', None), 'a1')
+        self.assertEqual(key_between('az', None), 'b00')
+        self.assertEqual(key_between(None, 'a0'), 'Zz')
+
+    def test_midpoint(self):
+        self.assertEqual(key_between('a0', 'a1'), 'a0V')
+        self.assertEqual(key_between('a0', 'a0V'), 'a0G')
+
+    def test_rejects_unordered_bounds(self):
+        with self.assertRaises(ValueError):
+            key_between('a1', 'a0')
+        with self.assertRaises(ValueError):
+            key_between('a1', 'a1')
+
+    def test_random_inserts_stay_ordered(self):
+        rng = random.Random(7)
+        keys = [key_between(None, None)]
+        for _ in range(2000):
+            index = rng.randint(0, len(keys))
+            low = keys[index - 1] if index > 0 else None
+            high = keys[index] if index < len(keys) else None
+            key = key_between(low, high)
+            self.assertTrue(low is None or low < key)
+            self.assertTrue(high is None or key < high)
+            keys.insert(index, key)
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_keys_after(self):
+        keys = keys_after('a5', 100)
+        self.assertEqual(len(keys), 100)
+        self.assertEqual(keys, sorted(keys))
+        self.assertLess('a5', keys[0])
+
+
+class PositionCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        row_id = ObjectId()
+        self.assertEqual(parse_position_cursor(position_cursor('a0V', row_id)), ('a0V', row_id))
+
+    def test_position_only_cursor(self):
+        self.assertEqual(parse_position_cursor('a3'), ('a3', None))
+
+    def test_invalid_cursor(self):
+        for cursor in ('', '.', 'a0.xyz', 'a 0', f'a+0.{ObjectId()}'):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                parse_position_cursor(cursor)
+
+
+class InsertManyIgnoreDuplicatesTests(SimpleTestCase):
+    def test_returns_duplicate_indexes(self):
+        manager = mock.Mock()
+        manager.mongo_insert_many.side_effect = BulkWriteError(
+            {'writeErrors': [{'index': 1, 'code': 11000}, {'index': 3, 'code': 11000}]}
+        )
+        self.assertEqual(insert_many_ignore_duplicates(manager, [{}] * 4), {1, 3})
+        manager.mongo_insert_many.assert_called_once_with([{}] * 4, ordered=False)
+
+    def test_other_errors_are_raised(self):
+        manager = mock.Mock()
+        manager.mongo_insert_many.side_effect = BulkWriteError(
+            {'writeErrors': [{'index': 0, 'code': 11000}, {'index': 1, 'code': 121}]}
+        )
+        with self.assertRaises(BulkWriteError):
+            insert_many_ignore_duplicates(manager, [{}, {}])
+
+    def test_empty(self):
+        manager = mock.Mock()
+        self.assertEqual(insert_many_ignore_duplicates(manager, []), set())
+        manager.mongo_insert_many.assert_not_called()
+
+
+class PerformancePairsTests(SimpleTestCase):
+    def test_performances_are_deduplicated_and_errors_indexed(self):
+        artist, song = str(ObjectId()), str(ObjectId())
+        rows, pairs, errors = views._parse_performance_pairs({'performances': [
+            {'artist_id': artist, 'song_id': song},
+            {'artist_id': artist, 'song_id': song},
+            {'artist_id': 'x', 'song_id': song},
+            'nope',
+        ]})
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(pairs, [(0, (ObjectId(artist), ObjectId(song)))])
+        self.assertEqual([error['index'] for error in errors], [2, 3])
+
+    def test_compact_form(self):
+        artist, songs = str(ObjectId()), [str(ObjectId()), str(ObjectId())]
+        _, pairs, errors = views._parse_performance_pairs({'artist_id': artist, 'song_ids': songs})
+        self.assertEqual([pair for _, pair in pairs], [(ObjectId(artist), ObjectId(s)) for s in songs])
+        self.assertEqual(errors, [])
+
+    def test_body_must_be_an_object(self):
+        request = RequestFactory().post('/artist_performs/batch/', '[1, 2]', content_type='application/json')
+        self.assertEqual(views.link_artist_performances(request).status_code, 400)
+
+
+class SmartPlaylistTests(SimpleTestCase):
+    def setUp(self):
+        self.recent = SmartPlaylist(_id=ObjectId(), rule=smart.RECENT, days=7)
+        self.liked = SmartPlaylist(_id=ObjectId(), rule=smart.LIKED)
+
+    def source(self, rows=(), total=0):
+        queryset = mock.MagicMock()
+        queryset.count.return_value = total
+        ordered = queryset.filter.return_value.order_by.return_value
+        ordered.values_list.return_value.__getitem__.return_value = list(rows)
+        queryset.order_by.return_value.values_list.return_value.__getitem__.return_value = list(rows)
+        return queryset
+
+    def test_cursor_round_trip_is_url_safe(self):
+        sort_key, row_id = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc), ObjectId()
+        cursor = smart.encode_cursor(sort_key, row_id)
+        self.assertRegex(cursor, r'^[A-Za-z0-9_-]+$')
+        self.assertEqual(smart.decode_cursor(cursor), (sort_key, row_id))
+
+    def test_decode_rejects_garbage(self):
+        for value in ('', 'not-a-cursor', f'2024-05-01T00:00:00_{ObjectId()}'):
+            with self.assertRaises(InvalidCursor):
+                smart.decode_cursor(value)
+
+    def test_recent_releases_reads_songs(self):
+        rows = [(ObjectId(), ObjectId(), datetime(2024, 5, 1, tzinfo=timezone.utc)) for _ in range(2)]
+        with mock.patch.object(smart.Song, 'objects') as songs, \
+                mock.patch.object(smart.SmartPlaylistSong, 'objects') as members:
+            queryset = songs.visible.return_value.filter.return_value = self.source(rows, total=5)
+            page, total, next_cursor = smart.page(self.recent, 2)
+        members.filter.assert_not_called()
+        lookup = songs.visible.return_value.filter.call_args[1]['created_at__gte']
+        self.assertAlmostEqual(lookup, smart.now() - timedelta(days=7), delta=timedelta(seconds=5))
+        queryset.order_by.assert_called_once_with('-created_at', '-_id')
+        queryset.order_by.return_value.values_list.assert_called_once_with('_id', '_id', 'created_at')
+        self.assertEqual((page, total), (rows, 5))
+        self.assertEqual(smart.decode_cursor(next_cursor), (rows[-1][2], rows[-1][0]))
+
+    def test_liked_reads_members_after_cursor(self):
+        before = (datetime(2024, 5, 1, tzinfo=timezone.utc), ObjectId())
+        rows = [(ObjectId(), ObjectId(), datetime(2024, 4, 1, tzinfo=timezone.utc))]
+        with mock.patch.object(smart.SmartPlaylistSong, 'objects') as members:
+            queryset = members.filter.return_value = self.source(rows, total=3)
+            page, total, next_cursor = smart.page(self.liked, 2, before)
+        members.filter.assert_called_once_with(smart_playlist=self.liked._id)
+        queryset.filter.assert_called_once_with(
+            Q(sort_key__lt=before[0]) | Q(sort_key=before[0], _id__lt=before[1])
+        )
+        queryset.filter.return_value.order_by.return_value.values_list.assert_called_once_with('_id', 'song', 'sort_key')
+        self.assertEqual((page, total, next_cursor), (rows, 3, None))
+
+    def test_build_recent_stores_no_rows(self):
+        with mock.patch.object(smart.Song, 'objects') as songs, \
+                mock.patch.object(smart.SmartPlaylistSong, 'objects') as members, \
+                mock.patch.object(smart, 'insert_many_ignore_duplicates') as insert:
+            songs.visible.return_value.filter.return_value.count.return_value = 4
+            self.assertEqual(smart.build(self.recent), 4)
+        members.mongo_delete_many.assert_called_once_with({'smart_playlist_id': self.recent._id})
+        insert.assert_not_called()
+
+    def test_view_rejects_old_cursor_format(self):
+        with mock.patch.object(views.SmartPlaylist, 'objects') as objects, \
+                mock.patch.object(views.smart, 'page') as page:
+            objects.filter.return_value.first.return_value = self.recent
+            request = RequestFactory().get('/', {'before': f'2024-05-01T00:00:00_{ObjectId()}'})
+            response = views.get_smart_playlist_songs(request, str(self.recent._id))
+        self.assertEqual(response.status_code, 400)
+        page.assert_not_called()
+
+
+class CheckFavoriteSongsTests(SimpleTestCase):
+    def setUp(self):
+        self.user_id, self.songs = ObjectId(), [str(ObjectId()) for _ in range(3)]
+
+    def post(self, liked_songs, song_ids):
+        with mock.patch.object(views, 'liked_songs', liked_songs), \
+                mock.patch.object(views.FavoriteSong, 'objects') as objects:
+            objects.filter.return_value.values_list.return_value = [ObjectId(self.songs[1])]
+            request = RequestFactory().post('/', {'song_ids': song_ids}, content_type='application/json')
+            response = views.check_favorite_songs(request, str(self.user_id))
+        return response, objects
+
+    def test_loads_set_on_miss(self):
+        liked_songs = mock.Mock()
+        liked_songs.contains.return_value = None
+        response, objects = self.post(liked_songs, self.songs)
+        self.assertEqual(response.data['bitmap'], '010')
+        objects.filter.assert_called_once_with(user_id=self.user_id)
+        liked_songs.begin.assert_called_once_with(self.user_id)
+        liked_songs.load.assert_called_once_with(self.user_id, {self.songs[1]}, liked_songs.begin.return_value)
+
+    def test_answers_from_set_without_db(self):
+        liked_songs = mock.Mock()
+        liked_songs.contains.return_value = [True, False]
+        response, objects = self.post(liked_songs, self.songs[:2])
+        self.assertEqual(response.data, {'bitmap': '10', 'liked': [self.songs[0]]})
+        liked_songs.contains.assert_called_once_with(self.user_id, self.songs[:2])
+        objects.filter.assert_not_called()
+
+
+class LibraryCursorTests(SimpleTestCase):
+    def setUp(self):
+        self.timestamp = datetime(2024, 5, 1, 12, 30, 15, 123000, tzinfo=timezone.utc)
+        self.row_id = ObjectId()
+
+    def test_round_trip_is_url_safe(self):
+        cursor = library.encode_cursor(self.timestamp, 'playlist', self.row_id)
+        self.assertRegex(cursor, r'^[A-Za-z0-9_-]+$')
+        self.assertEqual(library.decode_cursor(cursor), (self.timestamp, 'playlist', self.row_id))
+
+    def test_decode_rejects_garbage(self):
+        bad_type = library.encode_cursor(self.timestamp, 'podcast', self.row_id)
+        for value in ('', '!!!', bad_type, library.encode_cursor(self.timestamp, 'song', self.row_id)[:-3]):
+            with self.assertRaises(InvalidCursor):
+                library.decode_cursor(value)
+
+    def after(self, item_type, cursor_type):
+        queryset = mock.Mock()
+        result = library._after(queryset, 'added_at', item_type, (self.timestamp, cursor_type, self.row_id))
+        self.assertIs(result, queryset.filter.return_value)
+        return queryset.filter.call_args
+
+    def test_after_without_cursor(self):
+        queryset = mock.Mock()
+        self.assertIs(library._after(queryset, 'added_at', 'song', None), queryset)
+        queryset.filter.assert_not_called()
+
+    def test_after_same_type_breaks_ties_on_id(self):
+        self.assertEqual(self.after('song', 'song'), mock.call(
+            Q(added_at__lt=self.timestamp) | Q(added_at=self.timestamp, _id__lt=self.row_id)
+        ))
+
+    def test_after_other_types_compare_timestamp(self):
+        # Cùng thời điểm: type nhỏ hơn đứng sau cursor (thứ tự giảm dần), type lớn hơn đứng trước
+        self.assertEqual(self.after('album', 'song'), mock.call(added_at__lte=self.timestamp))
+        self.assertEqual(self.after('song', 'album'), mock.call(added_at__lt=self.timestamp))
+
+    def test_page_merges_sources_newest_first(self):
+        def source(item_type, rows, owned=False):
+            queryset = mock.MagicMock()
+            queryset.order_by.return_value.values_list.return_value.__getitem__.return_value = rows
+            return item_type, queryset, 'added_at', 'song', owned
+
+        at = [datetime(2024, 5, day, tzinfo=timezone.utc) for day in range(1, 5)]
+        songs = [(ObjectId(), at[3], ObjectId()), (ObjectId(), at[0], ObjectId())]
+        albums = [(ObjectId(), at[2], ObjectId()), (ObjectId(), at[1], ObjectId())]
+        with mock.patch.object(library, '_sources', return_value=[
+            source('song', songs), source('album', albums), source('artist', [(ObjectId(), at[3], ObjectId())]),
+        ]):
+            page, next_cursor = library.library_page(ObjectId(), {'song', 'album'}, 3)
+        self.assertEqual([(row[1], row[0]) for row in page], [('song', at[3]), ('album', at[2]), ('album', at[1])])
+        self.assertEqual(page[0][3], songs[0][2])
+        self.assertEqual(library.decode_cursor(next_cursor), (at[1], 'album', albums[1][0]))
+
+
+class SmartPerformanceTests(SimpleTestCase):
+    def setUp(self):
+        self.artist, self.other_artist, self.song = ObjectId(), ObjectId(), ObjectId()
+        self.fan, self.playlist = ObjectId(), ObjectId()
+
+    def test_added_only_touches_followers_of_linked_artists(self):
+        with mock.patch.object(smart.Follow, 'objects') as follows, \
+                mock.patch.object(smart, '_owners', return_value={self.playlist: self.fan}) as owners, \
+                mock.patch.object(smart.FavoriteSong, 'objects') as favorites, \
+                mock.patch.object(smart, '_add') as add:
+            follows.filter.return_value.values_list.return_value = [(self.fan, self.artist)]
+            favorites.filter.return_value.values_list.return_value = [(self.fan, self.song, 'liked-at')]
+            smart.performances_added([(self.artist, self.song)])
+            rows = list(add.call_args[0][0])
+        follows.filter.assert_called_once_with(target_artist__in=[self.artist])
+        owners.assert_called_once_with(smart.LIKED, {self.fan})
+        favorites.filter.assert_called_once_with(user__in=[self.fan], song__in=[self.song])
+        self.assertEqual(rows, [(self.playlist, self.song, 'liked-at')])
+
+    def test_artist_without_followers_is_a_single_query(self):
+        with mock.patch.object(smart.Follow, 'objects') as follows, \
+                mock.patch.object(smart, '_owners') as owners, \
+                mock.patch.object(smart, '_prune_liked') as prune:
+            follows.filter.return_value.values_list.return_value = []
+            smart.performances_added([(self.artist, self.song)])
+            smart.performances_removed([(self.other_artist, self.song)])
+        self.assertEqual(follows.filter.call_count, 2)
+        owners.assert_not_called()
+        prune.assert_not_called()
+
+    def test_removed_prunes_only_followers(self):
+        with mock.patch.object(smart.Follow, 'objects') as follows, \
+                mock.patch.object(smart, '_owners', return_value={self.playlist: self.fan}) as owners, \
+                mock.patch.object(smart, '_prune_liked') as prune:
+            follows.filter.return_value.values_list.return_value = [(self.fan, self.artist)]
+            smart.performances_removed([(self.artist, self.song)])
+        owners.assert_called_once_with(smart.LIKED, {self.fan})
+        prune.assert_called_once_with({self.playlist: self.fan}, {self.song})
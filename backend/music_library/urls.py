@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     # ARTIST PERFORMANCE
     path('artistperform/upload/<str:artist_id>/', views.add_artist_performance, name='add_artist_performance'),
+    path('artistperform/batch/', views.link_artist_performances, name='link_artist_performances'),
     path('artistperform/<str:artist_id>/', views.get_artist_performances, name='get_artist_performance'),
     path('artistperform/song/<str:song_id>/', views.get_song_artists_performances, name='get_artist_performance_by_song'),
     path('artistperform/<str:artist_id>/<str:song_id>/delete/', views.delete_artist_performance, name='delete_artist_performance'),
@@ -12,6 +13,7 @@ urlpatterns = [
     path('favorite_songs/<str:user_id>/create', views.create_favorite_songs, name='add_favorite_song'),
     path('favorite_songs/<str:user_id>/<str:song_id>/delete/', views.delete_favorite_song, name='delete_favorite_song'),
     path('favorite_songs/<str:user_id>/favorite/songs/summary/', views.get_favorite_songs_summary, name='check_favorite_song'),
+    path('favorite_songs/<str:user_id>/contains', views.check_favorite_songs, name='check_favorite_songs'),
     # FAVORITE ALBUM
     path('favorite_albums/<str:user_id>/', views.get_favorite_albums, name='get_favorite_albums'),
     path('favorite_albums/<str:user_id>/create', views.create_favorite_album, name='add_favorite_album'),
@@ -20,4 +22,11 @@ urlpatterns = [
     path('favorite_playlists/<str:user_id>/', views.get_favorite_playlists, name='get_favorite_playlists'),
     path('favorite_playlists/<str:user_id>/create', views.create_favorite_playlist, name='add_favorite_playlist'),
     path('favorite_playlists/<str:user_id>/<str:playlist_id>/delete/', views.delete_favorite_playlist, name='delete_favorite_playlist'),
+    # LIBRARY
+    path('library/<str:user_id>/', views.get_library, name='get_library'),
+    # SMART PLAYLIST
+    path('smart_playlists/<str:user_id>/', views.get_smart_playlists, name='get_smart_playlists'),
+    path('smart_playlists/<str:user_id>/create', views.create_smart_playlist, name='create_smart_playlist'),
+    path('smart_playlists/songs/<str:smart_playlist_id>/', views.get_smart_playlist_songs, name='get_smart_playlist_songs'),
+    path('smart_playlists/<str:smart_playlist_id>/delete/', views.delete_smart_playlist, name='delete_smart_playlist'),
 ]
\ No newline at end of file
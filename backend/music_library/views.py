@@ -7,12 +7,21 @@ from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from bson import ObjectId
 from bson.errors import InvalidId
-from .models import ArtistPerform, Artist, Song, FavoriteSong, User, FavoriteAlbum, Album, FavoritePlaylist, Playlist
+from pymongo.errors import BulkWriteError
+from backend.mongo import insert_many_ignore_duplicates, write_error_message
+from .models import ArtistPerform, Artist, Song, FavoriteSong, User, FavoriteAlbum, Album, FavoritePlaylist, Playlist, SmartPlaylist, SmartPlaylistSong
 from music_library.serializers import ArtistPerformSerializer, ArtistPerformByArtistSerializer, ArtistPerformBySongSerializer, FavoriteSongSerializer, SongSerializer, FavoriteSongCreateSerializer, FavoriteAlbumSerializer, FavoritePlaylistSerializer
 from backend.utils import SchemaFactory
-import traceback
 from datetime import datetime
 from spotify_app.permissionsCustom import IsAdminUser, IsAuthenticated
+from . import smart
+from .library import TYPES as LIBRARY_TYPES, InvalidCursor, decode_cursor, library_page, resolve
+from rest_framework.utils.urls import replace_query_param
+from spotify_app.images import image_variants
+from spotify_app.cache import liked_songs
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # ========================================  ARTISTPERFORM  ========================================
@@ -77,11 +86,11 @@ def add_artist_performance(request, artist_id):
     try:
         artist_obj_id = ObjectId(artist_id)
         song_obj_id = ObjectId(song_id)
-        print(f"DEBUG: artist_obj_id - {artist_obj_id}, song_obj_id - {song_obj_id}")
+        logger.debug("artist_obj_id - %s, song_obj_id - %s", artist_obj_id, song_obj_id)
         # Kiểm tra sự tồn tại của artist và bài hát
         artist = Artist.objects.get(_id=artist_obj_id)
         song = Song.objects.get(_id=song_obj_id)
-        print(f"DEBUG: Artist found - {artist}, Song found - {song}")
+        logger.debug("Artist found - %s, Song found - %s", artist, song)
         # Kiểm tra trùng lặp
         if ArtistPerform.objects.filter(artist=artist, song=song).exists():
             return Response(
@@ -94,15 +103,15 @@ def add_artist_performance(request, artist_id):
             'artist': artist_obj_id, 
             'song': song_obj_id,      
         }
-        print(f"DEBUG: ArtistPerform data - {artist_perform_data}")
+        logger.debug("ArtistPerform data - %s", artist_perform_data)
         # Khởi tạo và validate serializer
         serializer = ArtistPerformSerializer(data=artist_perform_data)
         serializer.is_valid(raise_exception=True)
-        print(f"DEBUG: Serializer - {serializer}")
+        logger.debug("Serializer - %s", serializer)
         # Lưu dữ liệu
         try:
             artist_perform = serializer.save()
-            print(f"DEBUG: ArtistPerform saved - {artist_perform}")
+            logger.debug("ArtistPerform saved - %s", artist_perform)
             return Response({
                 "message": "Thêm nghệ sĩ biểu diễn bài hát thành công",
                 "artist_perform": {
@@ -113,8 +122,7 @@ def add_artist_performance(request, artist_id):
             }, status=status.HTTP_201_CREATED)
             
         except Exception as save_error:
-            print(f"SAVE ERROR DETAILS: {str(save_error)}")
-            print(f"TRACEBACK: {traceback.format_exc()}")
+            logger.exception("Database save failed: %s", save_error)
             return Response(
                 {"error": f"Database save failed: {str(save_error)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -132,13 +140,132 @@ def add_artist_performance(request, artist_id):
             )
     except Exception as e:
         error_msg = f"Unexpected error: {str(e)}"
-        print(f"FULL ERROR: {error_msg}\n{traceback.format_exc()}")
+        logger.exception(error_msg)
         return Response(
             {"error": error_msg}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
     
 
+# THÊM NHIỀU CẶP (NGHỆ SĨ, BÀI HÁT) MỘT LẦN
+ARTIST_PERFORM_BATCH_MAX = 1000
+
+
+def _parse_performance_pairs(data):
+    """
+    Nhận {"performances": [{"artist_id", "song_id"}, ...]} hoặc dạng gọn
+    {"artist_id": ..., "song_ids": [...]} (toàn bộ credit của một album).
+    Trả về (các dòng gốc, các cặp (index, (artist_id, song_id)) không trùng, lỗi theo index).
+    """
+    if data.get('song_ids') is not None:
+        rows = [{'artist_id': data.get('artist_id'), 'song_id': song_id} for song_id in data.get('song_ids') or []]
+    else:
+        rows = data.get('performances') or []
+
+    pairs, errors, seen = [], [], set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({"index": index, "error": "Each performance must be an object."})
+            continue
+        artist_id, song_id = row.get('artist_id'), row.get('song_id')
+        if not ObjectId.is_valid(artist_id) or not ObjectId.is_valid(song_id):
+            errors.append({"index": index, "error": "Invalid Artist ID or Song ID format."})
+            continue
+        pair = (ObjectId(artist_id), ObjectId(song_id))
+        if pair not in seen:
+            seen.add(pair)
+            pairs.append((index, pair))
+    return rows, pairs, errors
+
+
+@SchemaFactory.post_schema(
+    item_id_param=None,
+    request_example={
+        "performances": [
+            {"artist_id": "663bb2e3e0d4f142c6f51498", "song_id": "663bb2f9e0d4f142c6f51499"},
+            {"artist_id": "663bb2e3e0d4f142c6f51498", "song_id": "663bb2f9e0d4f142c6f5149b"}
+        ]
+    },
+    success_response={
+        "message": "Đã thêm 1 nghệ sĩ biểu diễn bài hát",
+        "created": [{"artist_id": "663bb2e3e0d4f142c6f51498", "song_id": "663bb2f9e0d4f142c6f51499"}],
+        "skipped": [{"artist_id": "663bb2e3e0d4f142c6f51498", "song_id": "663bb2f9e0d4f142c6f5149b"}],
+        "errors": []
+    },
+    error_responses=[
+        {
+            "name": "Dữ liệu rỗng",
+            "response": {"error": "performances or song_ids is required."},
+            "status_code": 400
+        }
+    ],
+    description="Thêm nhiều cặp nghệ sĩ - bài hát trong một request (ví dụ toàn bộ credit của album). "
+                "Có thể gửi dạng gọn {\"artist_id\": ..., \"song_ids\": [...]}. "
+                "Cặp đã tồn tại được bỏ qua (skipped), cặp lỗi được báo theo index."
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def link_artist_performances(request):
+    if not isinstance(request.data, dict):
+        return Response({"error": "Request body must be a JSON object."}, status=status.HTTP_400_BAD_REQUEST)
+    rows, pairs, errors = _parse_performance_pairs(request.data)
+    if not rows:
+        return Response({"error": "performances or song_ids is required."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > ARTIST_PERFORM_BATCH_MAX:
+        return Response(
+            {"error": f"At most {ARTIST_PERFORM_BATCH_MAX} performances per request."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Kiểm tra tồn tại bằng $in: một truy vấn cho nghệ sĩ, một cho bài hát
+    artist_ids = {artist_id for _, (artist_id, _) in pairs}
+    song_ids = {song_id for _, (_, song_id) in pairs}
+    found_artists = set(Artist.objects.filter(_id__in=list(artist_ids)).values_list('_id', flat=True)) if artist_ids else set()
+    found_songs = set(Song.objects.filter(_id__in=list(song_ids)).values_list('_id', flat=True)) if song_ids else set()
+
+    # Một truy vấn cho tất cả các cặp đã tồn tại thay vì exists() từng cặp
+    existing = set(
+        ArtistPerform.objects.filter(artist__in=list(artist_ids), song__in=list(song_ids))
+        .values_list('artist', 'song')
+    ) if pairs else set()
+
+    to_insert, skipped = [], []
+    for index, (artist_id, song_id) in pairs:
+        if artist_id not in found_artists or song_id not in found_songs:
+            errors.append({"index": index, "error": "Artist or Song not found."})
+        elif (artist_id, song_id) in existing:
+            skipped.append((artist_id, song_id))
+        else:
+            to_insert.append({'_id': ObjectId(), 'artist_id': artist_id, 'song_id': song_id})
+
+    # insert_many không theo thứ tự: unique index (artist, song) loại các cặp vừa
+    # được request khác thêm vào, các document còn lại vẫn được ghi
+    try:
+        duplicates = insert_many_ignore_duplicates(ArtistPerform.objects, to_insert)
+    except BulkWriteError as bwe:
+        logger.error("Bulk insert of artist performances failed: %s", bwe.details)
+        return Response(
+            {"error": f"Database save failed: {write_error_message(bwe)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    created = [doc for i, doc in enumerate(to_insert) if i not in duplicates]
+    skipped.extend((to_insert[i]['artist_id'], to_insert[i]['song_id']) for i in sorted(duplicates))
+    # insert_many không phát post_save nên cập nhật smart playlist trực tiếp
+    smart.performances_added((doc['artist_id'], doc['song_id']) for doc in created)
+    errors.sort(key=lambda error: error["index"])
+
+    return Response({
+        "message": f"Đã thêm {len(created)} nghệ sĩ biểu diễn bài hát",
+        "created": [
+            {"_id": str(doc['_id']), "artist_id": str(doc['artist_id']), "song_id": str(doc['song_id'])}
+            for doc in created
+        ],
+        "skipped": [{"artist_id": str(a), "song_id": str(s)} for a, s in skipped],
+        "errors": errors
+    }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
 # LẤY DANH SÁCH BÀI HÁT DO NGHỆ SĨ BIỂU DIỄN
 @SchemaFactory.retrieve_schema(
     item_id_param='artist_id',
@@ -363,13 +490,76 @@ def get_favorite_songs_summary(request, user_id):
         return Response(response_data, status=status.HTTP_200_OK)
 
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.error("Error: %s", e)
         return Response(
             {"error": "Đã xảy ra lỗi khi xử lý yêu cầu"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+LIKED_CHECK_MAX = 500
+
+
+def _liked_flags(user_obj_id, song_ids):
+    """[bool] theo thứ tự song_ids; tập chưa có trong Redis thì nạp từ cột song (không join bài hát)."""
+    flags = liked_songs.contains(user_obj_id, song_ids)
+    if flags is None:
+        # Version trước khi đọc DB: like/unlike xen giữa thì không nạp ảnh chụp cũ
+        token = liked_songs.begin(user_obj_id)
+        liked = {
+            str(song_id) for song_id in
+            FavoriteSong.objects.filter(user_id=user_obj_id).values_list('song', flat=True)
+        }
+        liked_songs.load(user_obj_id, liked, token)
+        flags = [str(song_id) in liked for song_id in song_ids]
+    return flags
+
+
+# Kiểm tra theo lô các bài hát user đã thích (icon trái tim)
+@SchemaFactory.post_schema(
+    item_id_param="user_id",
+    request_example={"song_ids": ["507f1f77bcf86cd799439011", "507f1f77bcf86cd799439012"]},
+    success_response={
+        "bitmap": "10",
+        "liked": ["507f1f77bcf86cd799439011"]
+    },
+    error_responses=[
+        {
+            "name": "Thiếu song_ids",
+            "response": {"error": "song_ids must be a non-empty list."},
+            "status_code": 400
+        },
+        {
+            "name": "Quá nhiều bài hát",
+            "response": {"error": "At most 500 song_ids per request."},
+            "status_code": 400
+        }
+    ],
+    description="Với mỗi song_id trong danh sách, trả về '1' nếu user đã thích và '0' nếu chưa "
+                "(bitmap theo đúng thứ tự gửi lên). Dùng tập id được cache theo user.",
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def check_favorite_songs(request, user_id):
+    if not ObjectId.is_valid(user_id):
+        return Response({"error": "Invalid user ID format."}, status=status.HTTP_400_BAD_REQUEST)
+
+    song_ids = request.data.get('song_ids')
+    if not isinstance(song_ids, list) or not song_ids:
+        return Response({"error": "song_ids must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(song_ids) > LIKED_CHECK_MAX:
+        return Response(
+            {"error": f"At most {LIKED_CHECK_MAX} song_ids per request."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    flags = _liked_flags(ObjectId(user_id), song_ids)
+    return Response({
+        "bitmap": ''.join('1' if flag else '0' for flag in flags),
+        "liked": [str(song_id) for song_id, flag in zip(song_ids, flags) if flag],
+    }, status=status.HTTP_200_OK)
+
+
 #  Thêm bài hát vào danh sách yêu thích
 @SchemaFactory.post_schema(
     item_id_param="user_id",
@@ -547,13 +737,13 @@ def create_favorite_songs(request, user_id):
         )
 
     try:
-        print(f"DEBUG: user - {user}, song - {song}")
+        logger.debug("user - %s, song - %s", user, song)
         # Tạo bản ghi trực tiếp bằng model thay vì serializer
         favorite_song = FavoriteSong.objects.create(
             user=user,
             song=song
         )
-        print(f"DEBUG: Created favorite song - {favorite_song}")
+        logger.debug("Created favorite song - %s", favorite_song)
         
         return Response({
             "message": "Thêm vào danh sách yêu thích thành công",
@@ -566,8 +756,7 @@ def create_favorite_songs(request, user_id):
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
-        print(f"ERROR: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("%s", e)
         return Response(
             {"error": "Lỗi khi thêm vào danh sách yêu thích"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -656,7 +845,7 @@ def delete_favorite_song(request, user_id):
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
-        print(f"ERROR: {str(e)}")
+        logger.error("%s", e)
         return Response(
             {"error": "Lỗi khi xóa bài hát khỏi danh sách yêu thích"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -787,7 +976,7 @@ def create_favorite_album(request, user_id):
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
-        print(f"ERROR: {str(e)}")
+        logger.error("%s", e)
         return Response(
             {"error": "Lỗi khi thêm album vào danh sách yêu thích"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -859,7 +1048,7 @@ def delete_favorite_album(request, favorite_album_id):
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
-        print(f"ERROR: {str(e)}")
+        logger.error("%s", e)
         return Response(
             {"error": "Lỗi khi xóa album khỏi danh sách yêu thích"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -991,7 +1180,7 @@ def create_favorite_playlist(request, user_id):
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
-        print(f"ERROR: {str(e)}")
+        logger.error("%s", e)
         return Response(
             {"error": "Lỗi khi thêm playlist vào danh sách yêu thích"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1063,8 +1252,372 @@ def delete_favorite_playlist(request, favorite_playlist_id):
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
-        print(f"ERROR: {str(e)}")
+        logger.error("%s", e)
         return Response(
             {"error": "Lỗi khi xóa playlist khỏi danh sách yêu thích"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+# ========================================  SMART PLAYLIST  ========================================
+SMART_PLAYLIST_WINDOW_MAX = 500
+SMART_PLAYLIST_DAYS_MAX = 365
+
+
+def _smart_playlist_data(smart_playlist):
+    return {
+        "_id": str(smart_playlist._id),
+        "user_id": str(smart_playlist.user_id),
+        "name": smart_playlist.name,
+        "rule": smart_playlist.rule,
+        "days": smart_playlist.days if smart_playlist.rule == SmartPlaylist.RULE_RECENT_RELEASES else None,
+        "created_at": smart_playlist.created_at,
+    }
+
+
+# Tạo smart playlist
+@SchemaFactory.post_schema(
+    item_id_param="user_id",
+    request_example={"name": "Mới phát hành", "rule": "recent_releases", "days": 30},
+    success_response={
+        "message": "Tạo smart playlist thành công",
+        "data": {
+            "_id": "507f1f77bcf86cd799439013",
+            "user_id": "507f1f77bcf86cd799439010",
+            "name": "Mới phát hành",
+            "rule": "recent_releases",
+            "days": 30,
+            "created_at": "2023-01-01T00:00:00Z",
+            "total_songs": 12
+        }
+    },
+    error_responses=[
+        {
+            "name": "Luật không hợp lệ",
+            "response": {"error": "rule phải là một trong: liked_followed_artists, recent_releases"},
+            "status_code": 400
+        },
+        {
+            "name": "Không có quyền",
+            "response": {"error": "Không có quyền thực hiện thao tác này"},
+            "status_code": 403
+        }
+    ],
+    description="Tạo smart playlist theo luật (liked_followed_artists hoặc recent_releases). "
+                "Danh sách bài hát được tính một lần lúc tạo rồi cập nhật tăng dần.",
+)
+@api_view(['POST'])
+@permission_classes([IsAdminUser | IsAuthenticated])
+def create_smart_playlist(request, user_id):
+    if not ObjectId.is_valid(user_id) or not User.objects.filter(_id=ObjectId(user_id)).exists():
+        return Response(
+            {"error": "User ID không hợp lệ hoặc không tồn tại"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Kiểm tra quyền
+    if str(request.user._id) != user_id and request.user.role != 'admin':
+        return Response(
+            {"error": "Không có quyền thực hiện thao tác này"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    rules = [rule for rule, _ in SmartPlaylist.RULE_CHOICES]
+    rule = request.data.get('rule')
+    if rule not in rules:
+        return Response(
+            {"error": f"rule phải là một trong: {', '.join(rules)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        days = int(request.data.get('days', 30))
+    except (TypeError, ValueError):
+        return Response({"error": "days phải là số nguyên"}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= SMART_PLAYLIST_DAYS_MAX:
+        return Response(
+            {"error": f"days phải nằm trong khoảng 1-{SMART_PLAYLIST_DAYS_MAX}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    name = request.data.get('name') or dict(SmartPlaylist.RULE_CHOICES)[rule]
+
+    try:
+        smart_playlist = SmartPlaylist.objects.create(user_id=ObjectId(user_id), name=name, rule=rule, days=days)
+        total = smart.build(smart_playlist)
+    except Exception as e:
+        logger.exception("%s", e)
+        return Response(
+            {"error": "Lỗi khi tạo smart playlist"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    return Response({
+        "message": "Tạo smart playlist thành công",
+        "data": {**_smart_playlist_data(smart_playlist), "total_songs": total}
+    }, status=status.HTTP_201_CREATED)
+
+
+# Danh sách smart playlist của user
+@SchemaFactory.retrieve_schema(
+    item_id_param='user_id',
+    success_response=[{
+        "_id": "507f1f77bcf86cd799439013",
+        "user_id": "507f1f77bcf86cd799439010",
+        "name": "Mới phát hành",
+        "rule": "recent_releases",
+        "days": 30,
+        "created_at": "2023-01-01T00:00:00Z"
+    }],
+    error_responses=[
+        {
+            "name": "ID không hợp lệ",
+            "response": {"error": "Invalid user ID format."},
+            "status_code": 400
+        }
+    ],
+    description="Lấy danh sách smart playlist của người dùng",
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_smart_playlists(request, user_id):
+    if not ObjectId.is_valid(user_id):
+        return Response({"error": "Invalid user ID format."}, status=status.HTTP_400_BAD_REQUEST)
+    smart_playlists = SmartPlaylist.objects.filter(user=ObjectId(user_id)).order_by('created_at')
+    return Response([_smart_playlist_data(smart_playlist) for smart_playlist in smart_playlists])
+
+
+# Bài hát trong smart playlist
+@SchemaFactory.retrieve_schema(
+    item_id_param='smart_playlist_id',
+    success_response={
+        "smart_playlist": {
+            "_id": "507f1f77bcf86cd799439013",
+            "name": "Mới phát hành",
+            "rule": "recent_releases"
+        },
+        "total_songs": 12,
+        "songs": [
+            {
+                "_id": "507f1f77bcf86cd799439011",
+                "title": "Tên bài hát",
+                "duration": "00:03:45",
+                "sort_key": "2023-01-01T00:00:00Z"
+            }
+        ],
+        "next_before": None
+    },
+    error_responses=[
+        {
+            "name": "Không tìm thấy",
+            "response": {"error": "Smart playlist not found."},
+            "status_code": 404
+        }
+    ],
+    description="Lấy bài hát của smart playlist từ danh sách đã tính sẵn (mới nhất trước). "
+                "Phân trang bằng ?limit=&before=<next_before>.",
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_smart_playlist_songs(request, smart_playlist_id):
+    if not ObjectId.is_valid(smart_playlist_id):
+        return Response({"error": "Invalid smart playlist ID format."}, status=status.HTTP_400_BAD_REQUEST)
+    smart_playlist = SmartPlaylist.objects.filter(_id=ObjectId(smart_playlist_id)).first()
+    if smart_playlist is None:
+        return Response({"error": "Smart playlist not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        limit = min(max(int(request.query_params.get('limit', SMART_PLAYLIST_WINDOW_MAX)), 1), SMART_PLAYLIST_WINDOW_MAX)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    before = request.query_params.get('before')
+    try:
+        before = smart.decode_cursor(before) if before else None
+    except InvalidCursor:
+        return Response({"error": "Invalid before cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Range query theo index, không join lại dữ liệu gốc
+    members, total, next_before = smart.page(smart_playlist, limit, before)
+
+    # Một truy vấn $in cho các bài hát của trang
+    songs = Song.objects.in_bulk([song_id for _, song_id, _ in members])
+    songs_data = []
+    for _, song_id, sort_key in members:
+        song = songs.get(song_id)
+        if song is None or song.isHidden:
+            continue
+        songs_data.append({
+            "_id": str(song._id),
+            "album_id": str(song.album_id_id) if song.album_id_id else None,
+            "title": song.title,
+            "duration": str(song.duration),
+            "audio_file": str(song.audio_file) if song.audio_file else None,
+            "img": str(song.img) if song.img else None,
+            "img_variants": image_variants(song.img),
+            "sort_key": sort_key,
+        })
+
+    return Response({
+        "smart_playlist": _smart_playlist_data(smart_playlist),
+        "total_songs": total,
+        "songs": songs_data,
+        "next_before": next_before
+    }, status=status.HTTP_200_OK)
+
+
+# Xóa smart playlist
+@SchemaFactory.delete_schema(
+    item_id_params="smart_playlist_id",
+    success_response={"message": "Xóa smart playlist thành công"},
+    error_responses=[
+        {
+            "name": "Không tìm thấy",
+            "response": {"error": "Smart playlist not found."},
+            "status_code": 404
+        },
+        {
+            "name": "Không có quyền",
+            "response": {"error": "Không có quyền thực hiện thao tác này"},
+            "status_code": 403
+        }
+    ],
+    description="Xóa smart playlist cùng danh sách bài hát đã tính sẵn",
+)
+@api_view(['DELETE'])
+@permission_classes([IsAdminUser | IsAuthenticated])
+def delete_smart_playlist(request, smart_playlist_id):
+    if not ObjectId.is_valid(smart_playlist_id):
+        return Response({"error": "Invalid smart playlist ID format."}, status=status.HTTP_400_BAD_REQUEST)
+    smart_playlist = SmartPlaylist.objects.filter(_id=ObjectId(smart_playlist_id)).first()
+    if smart_playlist is None:
+        return Response({"error": "Smart playlist not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    if str(request.user._id) != str(smart_playlist.user_id) and request.user.role != 'admin':
+        return Response(
+            {"error": "Không có quyền thực hiện thao tác này"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    SmartPlaylistSong.objects.mongo_delete_many({'smart_playlist_id': smart_playlist._id})
+    smart_playlist.delete()
+    return Response({"message": "Xóa smart playlist thành công"}, status=status.HTTP_200_OK)
+
+
+# ========================================  LIBRARY  ========================================
+LIBRARY_DEFAULT_LIMIT = 30
+LIBRARY_MAX_LIMIT = 100
+
+
+def _library_item(item_type, obj, owned):
+    if item_type == 'song':
+        return {
+            "_id": str(obj._id),
+            "title": obj.title,
+            "album_id": str(obj.album_id_id) if obj.album_id_id else None,
+            "duration": str(obj.duration),
+            "img": str(obj.img) if obj.img else None,
+            "img_variants": image_variants(obj.img),
+        }
+    if item_type == 'album':
+        return {
+            "_id": str(obj._id),
+            "album_name": obj.album_name,
+            "artist_name": obj.artist_name,
+            "cover_img": obj.cover_img,
+            "cover_img_variants": image_variants(obj.cover_img),
+            "total_tracks": obj.total_tracks,
+        }
+    if item_type == 'playlist':
+        return {
+            "_id": str(obj._id),
+            "title": obj.name,
+            "user_id": str(obj.user_id_id),
+            "image": obj.cover_img,
+            "image_variants": image_variants(obj.cover_img),
+            "track_count": obj.track_count,
+            "total_duration": obj.total_duration,
+            "owned": owned,
+        }
+    return {
+        "_id": str(obj._id),
+        "artist_name": obj.artist_name,
+        "profile_img": obj.profile_img,
+        "profile_img_variants": image_variants(obj.profile_img),
+    }
+
+
+@SchemaFactory.retrieve_schema(
+    item_id_param='user_id',
+    success_response={
+        "next": "http://localhost:8000/music_library/library/507f1f77bcf86cd799439010/?cursor=WyIyMDI1...",
+        "results": [
+            {
+                "type": "song",
+                "added_at": "2025-05-02T20:54:28.043902Z",
+                "item": {"_id": "507f1f77bcf86cd799439011", "title": "Tên bài hát"}
+            },
+            {
+                "type": "playlist",
+                "added_at": "2025-05-01T10:00:00Z",
+                "item": {"_id": "507f1f77bcf86cd799439012", "title": "My Playlist", "owned": True}
+            }
+        ]
+    },
+    error_responses=[
+        {
+            "name": "ID không hợp lệ",
+            "response": {"error": "Invalid user ID format."},
+            "status_code": 400
+        },
+        {
+            "name": "Cursor không hợp lệ",
+            "response": {"error": "Invalid cursor."},
+            "status_code": 400
+        }
+    ],
+    description="Thư viện của user: bài hát/album/playlist đã thích, playlist của user và nghệ sĩ đang "
+                "theo dõi, mới nhất trước. Lọc bằng ?types=song,album,playlist,artist; "
+                "phân trang bằng ?limit= và link `next` (?cursor=).",
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_library(request, user_id):
+    if not ObjectId.is_valid(user_id):
+        return Response({"error": "Invalid user ID format."}, status=status.HTTP_400_BAD_REQUEST)
+
+    types = set(LIBRARY_TYPES)
+    if request.query_params.get('types'):
+        types = {item_type.strip() for item_type in request.query_params['types'].split(',')}
+        unknown = types - set(LIBRARY_TYPES)
+        if unknown:
+            return Response(
+                {"error": f"Unknown types: {', '.join(sorted(unknown))}. Allowed: {', '.join(LIBRARY_TYPES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    try:
+        limit = min(max(int(request.query_params.get('limit', LIBRARY_DEFAULT_LIMIT)), 1), LIBRARY_MAX_LIMIT)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    cursor = request.query_params.get('cursor')
+    try:
+        cursor = decode_cursor(cursor) if cursor else None
+    except InvalidCursor:
+        return Response({"error": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Không kiểm tra user tồn tại riêng: user không tồn tại có thư viện rỗng
+    rows, next_cursor = library_page(ObjectId(user_id), types, limit, cursor)
+    objects = resolve(rows)
+
+    results = []
+    for timestamp, item_type, _, object_id, owned in rows:
+        obj = objects[item_type].get(object_id)
+        # Đối tượng đã bị ẩn thì bỏ khỏi trang, cursor vẫn đi tiếp sau dòng đó
+        if obj is None or obj.isHidden:
+            continue
+        results.append({"type": item_type, "added_at": timestamp, "item": _library_item(item_type, obj, owned)})
+
+    return Response({
+        "next": replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor) if next_cursor else None,
+        "results": results,
+    }, status=status.HTTP_200_OK)
@@ -13,6 +13,9 @@ import paypalrestsdk
 
 from user_management.models import User
 from .models import Payment
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Configure PayPal SDK
 paypalrestsdk.configure({
@@ -32,8 +35,7 @@ def create_payment(request):
         
         if not amount:
             return JsonResponse({"error": "Amount is required"}, status=400)
-        print(f"Received amount: {amount}")  # Debugging line
-        print(type(amount))  # Debugging line
+        logger.debug("Received amount: %r (%s)", amount, type(amount).__name__)
 
         try:
             # Convert amount to Decimal, handling both string and numeric inputs
@@ -43,17 +45,17 @@ def create_payment(request):
         except (InvalidOperation, TypeError, ValueError) as e:
             return JsonResponse({"error": f"Invalid amount format: {str(e)}"}, status=400)
 
-        print(type(amount_decimal))  # Debugging line
+        logger.debug("Parsed amount: %s", amount_decimal)
         # Get user if user_id is provided
         user = None
         if user_id:
             try:
                 user = User.objects.get(_id=ObjectId(user_id))
             except User.DoesNotExist:
-                print(f"User not found with id: {user_id}")
+                logger.warning("User not found with id: %s", user_id)
                 pass
             except Exception as e:
-                print(f"Error finding user: {str(e)}")
+                logger.error("Error finding user: %s", e)
                 pass
 
         # Create the payment
@@ -91,12 +93,12 @@ def create_payment(request):
                     })
             return JsonResponse({"error": "No approval URL found"}, status=400)
         else:
-            print("PayPal Error:", payment.error)  # Add error logging
+            logger.error("PayPal Error: %s", payment.error)
             return JsonResponse({"error": f"Payment creation failed: {payment.error}"}, status=400)
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON data"}, status=400)
     except Exception as e:
-        print("Error creating payment:", str(e))  # Add error logging
+        logger.error("Error creating payment: %s", e)
         return JsonResponse({"error": str(e)}, status=500)
 
 @csrf_exempt
@@ -106,7 +108,7 @@ def execute_payment(request):
     payer_id = request.GET.get('PayerID')         # Also a string, NOT ObjectId
     token = request.GET.get('token')              # Get the token as well
 
-    print(f"Executing payment - PaymentID: {payment_id}, PayerID: {payer_id}, Token: {token}")  # Debug log
+    logger.debug("Executing payment - PaymentID: %s, PayerID: %s, Token: %s", payment_id, payer_id, token)
 
     if not payment_id or not payer_id:
         return JsonResponse({'error': 'Missing paymentId or PayerID'}, status=400)
@@ -115,26 +117,26 @@ def execute_payment(request):
         # Find local payment record by PayPal string payment_id
         try:
             payment = Payment.objects.get(payment_id=payment_id)
-            print(f"Found payment record: {payment}")  # Debug log
+            logger.debug("Found payment record: %s", payment)
         except Payment.DoesNotExist:
-            print(f"Payment not found in database: {payment_id}")  # Debug log
+            logger.warning("Payment not found in database: %s", payment_id)
             return HttpResponse("Payment not found", status=404)
 
         # Execute the payment via PayPal SDK
         try:
             paypal_payment = paypalrestsdk.Payment.find(payment_id)
-            print(f"Found PayPal payment: {paypal_payment}")  # Debug log
+            logger.debug("Found PayPal payment: %s", paypal_payment)
             
             # Execute the payment with just the payer_id
             if paypal_payment.execute({"payer_id": payer_id}):
-                print("Payment executed successfully")  # Debug log
+                logger.info("Payment %s executed successfully", payment_id)
 
                 # Extract amount string safely from PayPal response
                 try:
                     amount_str = paypal_payment['transactions'][0]['amount']['total']
                     amount_decimal = Decimal(amount_str)  # Ensure it's a valid Decimal
                 except Exception as e:
-                    print(f"Error parsing amount from PayPal response: {str(e)}")
+                    logger.error("Error parsing amount from PayPal response: %s", e)
                     amount_decimal = None
 
                 # Update payment record
@@ -148,24 +150,24 @@ def execute_payment(request):
                     try:
                         from user_management.services import activate_premium
                         result = activate_premium(payment.user.email)
-                        print(f"Premium activation result: {result}")  # Debug log
+                        logger.info("Premium activation result: %s", result)
                     except Exception as e:
-                        print(f"Error activating premium: {str(e)}")  # Debug log
+                        logger.error("Error activating premium: %s", e)
 
                 return redirect('/payment/success/')
             else:
-                print(f"Payment execution failed: {paypal_payment.error}")  # Debug log
+                logger.error("Payment execution failed: %s", paypal_payment.error)
                 payment.status = 'failed'
                 payment.save()
                 return redirect('/payment/failed/')
         except Exception as e:
-            print(f"Error executing PayPal payment: {str(e)}")  # Debug log
+            logger.error("Error executing PayPal payment: %s", e)
             payment.status = 'failed'
             payment.save()
             return redirect('/payment/failed/')
             
     except Exception as e:
-        print(f"Unexpected error in execute_payment: {str(e)}")  # Debug log
+        logger.error("Unexpected error in execute_payment: %s", e)
         return HttpResponse(f"Error: {str(e)}", status=500)
 
 
@@ -181,7 +183,7 @@ def cancel_payment(request):
     except Payment.DoesNotExist:
         return HttpResponse("Payment not found", status=404)
     except Exception as e:
-        print("Error cancelling payment:", str(e))  # Add error logging
+        logger.error("Error cancelling payment: %s", e)
         return HttpResponse(f"Error: {str(e)}", status=500)
 
 @csrf_exempt
@@ -190,9 +192,9 @@ def ipn_listener(request):
     """Handle PayPal IPN notifications"""
     try:
         # Log the raw request data
-        print("=== IPN Request Details ===")
-        print(f"Request method: {request.method}")
-        print(f"Content type: {request.content_type}")
+        logger.debug("=== IPN Request Details ===")
+        logger.debug("Request method: %s", request.method)
+        logger.debug("Content type: %s", request.content_type)
         
         # Get the raw POST data
         raw_data = request.body.decode('utf-8')
@@ -213,20 +215,20 @@ def ipn_listener(request):
         response = requests.post(verify_url, data=verify_data, headers=headers)
         
         if response.text != 'VERIFIED':
-            print("IPN verification failed")
+            logger.warning("IPN verification failed")
             return HttpResponse("Invalid IPN", status=400)
 
         # Parse IPN data
         try:
             ipn_data = dict(item.split("=") for item in raw_data.split("&"))
         except Exception as e:
-            print(f"Error parsing IPN data: {str(e)}")
+            logger.error("Error parsing IPN data: %s", e)
             return HttpResponse("Invalid IPN data format", status=400)
         
         # Get transaction ID from either txn_id or parent_txn_id
         transaction_id = ipn_data.get('txn_id') or ipn_data.get('parent_txn_id')
         if not transaction_id:
-            print("No transaction ID found in IPN data")
+            logger.warning("No transaction ID found in IPN data")
             return HttpResponse("No transaction ID", status=400)
             
         # Find payment by transaction ID
@@ -236,7 +238,7 @@ def ipn_listener(request):
             # Only process if payment status has changed
             payment_status = ipn_data.get('payment_status')
             if payment_status != payment.status:
-                print(f"Updating payment status from {payment.status} to {payment_status}")
+                logger.debug("Updating payment status from %s to %s", payment.status, payment_status)
                 
                 if payment_status == 'Completed':
                     payment.status = 'completed'
@@ -245,9 +247,9 @@ def ipn_listener(request):
                         try:
                             from user_management.services import activate_premium
                             result = activate_premium(payment.user.email)
-                            print(f"Premium activation result: {result}")
+                            logger.info("Premium activation result: %s", result)
                         except Exception as e:
-                            print(f"Error activating premium: {str(e)}")
+                            logger.error("Error activating premium: %s", e)
                 elif payment_status == 'Refunded':
                     payment.status = 'refunded'
                 elif payment_status == 'Failed':
@@ -256,17 +258,17 @@ def ipn_listener(request):
                 # Store IPN data
                 payment.ipn_data = ipn_data
                 payment.save()
-                print(f"Payment {transaction_id} updated to {payment_status}")
+                logger.info("Payment %s updated to %s", transaction_id, payment_status)
             else:
-                print(f"Payment {transaction_id} already in {payment_status} state - skipping update")
+                logger.debug("Payment %s already in %s state - skipping update", transaction_id, payment_status)
             
             return HttpResponse("IPN processed", status=200)
         except Payment.DoesNotExist:
-            print(f"Payment not found for IPN txn_id: {transaction_id}")
+            logger.warning("Payment not found for IPN txn_id: %s", transaction_id)
             return HttpResponse("Payment not found", status=404)
             
     except Exception as e:
-        print(f"Error processing IPN: {str(e)}")
+        logger.error("Error processing IPN: %s", e)
         return HttpResponse(f"Error: {str(e)}", status=500)
 
 def payment_success(request):
@@ -2,6 +2,9 @@ import requests
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from .services import get_spotify_access_token  
+import logging
+
+logger = logging.getLogger(__name__)
 
 SPOTIFY_SEARCH_URL = "https://api.spotify.com/v1/search"
 
@@ -107,7 +110,7 @@ def fetch_new_releases(request):
     new_releases_data = response.json()
 
     # Debug: Print the response to see the structure
-    print(new_releases_data)
+    logger.debug("New releases: %s", new_releases_data)
 
     # Extract albums from the response
     try:
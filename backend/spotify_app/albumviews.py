@@ -4,22 +4,31 @@ from rest_framework.response import Response
 from rest_framework import status
 from bson.errors import InvalidId
 from datetime import datetime
-from .models import Album, Artist
+from .models import Album, Artist, Song
+from music_library.models import ArtistPerform
 from .serializers import AlbumSerializer
+from .cache import catalog_cache
+from .images import image_variants
 from backend.utils import SchemaFactory
+from backend.pagination import ObjectIdCursorPagination
+from backend.streaming import StreamingJSONResponse, wants_stream, wants_ndjson
+from rest_framework.exceptions import NotFound
 
 from bson import ObjectId, errors
+import logging
+
+logger = logging.getLogger(__name__)
 
 # 1. Create Album API
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def create_album(request):
     try:
-        print("Received data:", dict(request.data), "Files:", dict(request.FILES))
+        logger.debug("Received data: %s Files: %s", dict(request.data), dict(request.FILES))
 
         def get_string_value(field, default=''):
             value = request.data.get(field, default)
-            print(f"Getting {field}:", value, type(value))
+            logger.debug("Getting %s: %s %s", field, value, type(value))
             if isinstance(value, list):
                 return value[0].strip() if value and value[0] else default
             return value.strip() if isinstance(value, str) else default
@@ -36,7 +45,7 @@ def create_album(request):
 
         # Lấy artist_id và kiểm tra nghệ sĩ
         artist_id = get_string_value('artist')
-        print("Processed artist_id:", artist_id, type(artist_id))
+        logger.debug("Processed artist_id: %s %s", artist_id, type(artist_id))
         try:
             artist = Artist.objects.get(_id=ObjectId(artist_id))
         except (Artist.DoesNotExist, ValueError):
@@ -47,7 +56,7 @@ def create_album(request):
 
         # Tạo dữ liệu album
         release_date = get_string_value('release_date')
-        print("Processed release_date:", release_date, type(release_date))
+        logger.debug("Processed release_date: %s %s", release_date, type(release_date))
         if not release_date:
             return Response(
                 {"error": "Ngày phát hành không được để trống."},
@@ -59,14 +68,13 @@ def create_album(request):
             'album_name': get_string_value('album_name'),
             'artist_name': artist.artist_name,  # Lấy tên nghệ sĩ từ đối tượng Artist
             'release_date': release_date,
-            'total_tracks': int(get_string_value('total_tracks', '0') or 0),
             'isfromDB': get_string_value('isfromDB', 'true').lower() == 'true',
             'isHidden': get_string_value('isHidden', 'false').lower() == 'true',
             'cover_img': get_string_value('cover_img', None),
         }
 
         # Debug dữ liệu trước khi serialize
-        print("Album data before serializer:", album_data)
+        logger.debug("Album data before serializer: %s", album_data)
 
         # Lưu album
         serializer = AlbumSerializer(data=album_data)
@@ -76,14 +84,14 @@ def create_album(request):
                 {"message": "Tạo album thành công!", "data": serializer.data},
                 status=status.HTTP_201_CREATED
             )
-        print("Serializer errors:", serializer.errors)
+        logger.debug("Serializer errors: %s", serializer.errors)
         return Response(
             {"error": "Dữ liệu không hợp lệ.", "details": serializer.errors},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     except Exception as e:
-        print("Exception:", str(e))
+        logger.exception("Exception: %s", e)
         return Response(
             {"error": f"Lỗi hệ thống khi tạo album: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -101,16 +109,21 @@ def create_album(request):
     },
     search_fields=["album_name", "artist_name"],
     description="Lấy danh sách tất cả album",
-    pagination=True,
+    pagination='cursor',
     serializer=AlbumSerializer
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def list_albums(request):
-    """ Retrieve all albums """
+    """ Retrieve all albums (?stream=true để stream toàn bộ, ?stream=ndjson cho export) """
     try:
-        albums = Album.objects.all()
-        serializer = AlbumSerializer(albums, many=True)
+        albums = Album.objects.select_related('artist')
+        if wants_stream(request):
+            return StreamingJSONResponse(albums.order_by('_id'), AlbumSerializer, ndjson=wants_ndjson(request))
+
+        paginator = ObjectIdCursorPagination()
+        page = paginator.paginate_queryset(albums, request)
+        serializer = AlbumSerializer(page, many=True)
         data = serializer.data
         
         # Convert ObjectId to string for each album
@@ -118,7 +131,9 @@ def list_albums(request):
             album['_id'] = str(album['_id'])
             album['artist'] = str(album['artist'])
             
-        return Response(data)
+        return paginator.get_paginated_response(data)
+    except NotFound as e:
+        return Response({"error": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response(
             {"error": f"Error retrieving albums: {str(e)}"},
@@ -148,27 +163,124 @@ def get_album(request, album_id):
     except InvalidId:
         return Response({"error": "ID album không hợp lệ."}, status=400)
 
+    data = catalog_cache.get('album', object_id)
+    if data is not None:
+        return Response(data)
+
+    token = catalog_cache.begin('album', object_id)
     try:
-        album = Album.objects.get(_id=object_id)
+        album = Album.objects.select_related('artist').get(_id=object_id)
         serializer = AlbumSerializer(album)
         data = serializer.data
         data['_id'] = str(album._id)
         data['artist'] = str(album.artist)
+        catalog_cache.set('album', album._id, data, depends_on=[('artist', album.artist_id)], token=token)
         return Response(data)
     except Album.DoesNotExist:
         return Response({"error": "Không tìm thấy album."}, status=404)
 
 
+# 3b. Album Detail Aggregate API: album + bài hát + nghệ sĩ biểu diễn trong 1 request
+@SchemaFactory.retrieve_schema(
+    item_id_param="album_id",
+    success_response={
+        "_id": "507f1f77bcf86cd799439011",
+        "album_name": "Chi tiết Album",
+        "artist_name": "Nghệ sĩ ABC",
+        "cover_img": "https://example.com/cover.jpg",
+        "release_date": "2023-05-01",
+        "total_tracks": 8,
+        "isHidden": False,
+        "songs": [
+            {
+                "_id": "60d5ec9cf8a1b4626e7d4e92",
+                "title": "Bài hát mẫu",
+                "duration": "00:03:45",
+                "audio_file": "https://res.cloudinary.com/demo/audio.mp3",
+                "video_file": None,
+                "img": "https://example.com/image.jpg",
+                "artists": [
+                    {"_id": "507f1f77bcf86cd799439012", "artist_name": "Nghệ sĩ ABC", "profile_img": None}
+                ]
+            }
+        ]
+    },
+    description="Lấy album, các bài hát (không ẩn) và nghệ sĩ biểu diễn từng bài trong một lần gọi, "
+                "số truy vấn cố định không phụ thuộc số bài hát"
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_album_detail(request, album_id):
+    try:
+        object_id = ObjectId(album_id)
+    except InvalidId:
+        return Response({"error": "ID album không hợp lệ."}, status=400)
+
+    # 1. Album (ưu tiên catalog cache)
+    album_data = catalog_cache.get('album', object_id)
+    if album_data is None:
+        token = catalog_cache.begin('album', object_id)
+        try:
+            album = Album.objects.select_related('artist').get(_id=object_id)
+        except Album.DoesNotExist:
+            return Response({"error": "Không tìm thấy album."}, status=404)
+        album_data = AlbumSerializer(album).data
+        album_data['_id'] = str(album._id)
+        album_data['artist'] = str(album.artist)
+        catalog_cache.set('album', album._id, album_data, depends_on=[('artist', album.artist_id)], token=token)
+
+    # 2. Các bài hát không ẩn của album
+    songs = list(Song.objects.visible().filter(album_id=object_id).order_by('_id'))
+
+    # 3. Quan hệ nghệ sĩ - bài hát của tất cả bài hát, một truy vấn $in
+    performances = list(
+        ArtistPerform.objects.filter(song__in=[song._id for song in songs]).values_list('song', 'artist')
+    )
+
+    # 4. Thông tin nghệ sĩ, một truy vấn $in
+    artists = {
+        artist._id: {
+            "_id": str(artist._id),
+            "artist_name": artist.artist_name,
+            "profile_img": artist.profile_img,
+            "profile_img_variants": image_variants(artist.profile_img),
+        }
+        for artist in Artist.objects.visible().filter(_id__in={artist_id for _, artist_id in performances})
+    }
+
+    artists_by_song = {}
+    for song_id, artist_id in performances:
+        if artist_id in artists:
+            artists_by_song.setdefault(song_id, []).append(artists[artist_id])
+
+    data = dict(album_data)
+    data['songs'] = [
+        {
+            "_id": str(song._id),
+            "title": song.title,
+            "duration": str(song.duration) if song.duration else None,
+            "audio_file": song.audio_file,
+            "video_file": song.video_file,
+            "img": song.img,
+            "img_variants": image_variants(song.img),
+            "created_at": song.created_at,
+            "artists": artists_by_song.get(song._id, []),
+        }
+        for song in songs
+    ]
+    return Response(data)
+
+
 # 4. Update Album API
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def create_album(request):
     try:
-        print("Received data:", dict(request.data), "Files:", dict(request.FILES))
+        logger.debug("Received data: %s Files: %s", dict(request.data), dict(request.FILES))
 
         def get_string_value(field, default=''):
             value = request.data.get(field, default)
-            print(f"Getting {field}:", value, type(value))
+            logger.debug("Getting %s: %s %s", field, value, type(value))
             if isinstance(value, list):
                 return value[0].strip() if value and value[0] else default
             return value.strip() if isinstance(value, str) else default
@@ -183,10 +295,10 @@ def create_album(request):
                 )
 
         artist_id = get_string_value('artist')
-        print("Processed artist_id:", artist_id, type(artist_id))
+        logger.debug("Processed artist_id: %s %s", artist_id, type(artist_id))
 
         release_date = get_string_value('release_date')
-        print("Processed release_date:", release_date, type(release_date))
+        logger.debug("Processed release_date: %s %s", release_date, type(release_date))
         if not release_date:
             return Response(
                 {"error": "Ngày phát hành không được để trống."},
@@ -198,13 +310,12 @@ def create_album(request):
             'album_name': get_string_value('album_name'),
             'artist_name': get_string_value('artist_name', 'Unknown Artist'),
             'release_date': release_date,
-            'total_tracks': int(get_string_value('total_tracks', '0') or 0),
             'isfromDB': get_string_value('isfromDB', 'true').lower() == 'true',
             'isHidden': get_string_value('isHidden', 'false').lower() == 'true',
             'cover_img': get_string_value('cover_img', None),
         }
 
-        print("Album data before serializer:", album_data)
+        logger.debug("Album data before serializer: %s", album_data)
 
         serializer = AlbumSerializer(data=album_data)
         if serializer.is_valid():
@@ -213,14 +324,14 @@ def create_album(request):
                 {"message": "Tạo album thành công!", "data": serializer.data},
                 status=status.HTTP_201_CREATED
             )
-        print("Serializer errors:", serializer.errors)
+        logger.debug("Serializer errors: %s", serializer.errors)
         return Response(
             {"error": "Dữ liệu không hợp lệ.", "details": serializer.errors},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     except Exception as e:
-        print("Exception:", str(e))
+        logger.exception("Exception: %s", e)
         return Response(
             {"error": f"Lỗi hệ thống khi tạo album: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -230,7 +341,7 @@ def create_album(request):
 @permission_classes([AllowAny])
 def update_album(request, albumId):
     try:
-        print("Received data:", dict(request.data), "Files:", dict(request.FILES))
+        logger.debug("Received data: %s Files: %s", dict(request.data), dict(request.FILES))
 
         # Lấy album hiện có
         try:
@@ -244,7 +355,7 @@ def update_album(request, albumId):
         # Hàm lấy chuỗi từ request.data
         def get_string_value(field, default=''):
             value = request.data.get(field, default)
-            print(f"Getting {field}:", value, type(value))
+            logger.debug("Getting %s: %s %s", field, value, type(value))
             if isinstance(value, list):
                 return value[0].strip() if value and value[0] else default
             return value.strip() if isinstance(value, str) else default
@@ -261,11 +372,11 @@ def update_album(request, albumId):
 
         # Lấy artist_id
         artist_id = get_string_value('artist')
-        print("Processed artist_id:", artist_id, type(artist_id))
+        logger.debug("Processed artist_id: %s %s", artist_id, type(artist_id))
 
         # Tạo dữ liệu album
         release_date = get_string_value('release_date')
-        print("Processed release_date:", release_date, type(release_date))
+        logger.debug("Processed release_date: %s %s", release_date, type(release_date))
         if not release_date:
             return Response(
                 {"error": "Ngày phát hành không được để trống."},
@@ -277,14 +388,13 @@ def update_album(request, albumId):
             'album_name': get_string_value('album_name'),
             'artist_name': get_string_value('artist_name', album.artist_name),
             'release_date': release_date,
-            'total_tracks': int(get_string_value('total_tracks', '0') or 0),
             'isfromDB': get_string_value('isfromDB', 'true').lower() == 'true',
             'isHidden': get_string_value('isHidden', 'false').lower() == 'true',
             'cover_img': get_string_value('cover_img', None),
         }
 
         # Debug dữ liệu trước khi serialize
-        print("Album data before serializer:", album_data)
+        logger.debug("Album data before serializer: %s", album_data)
 
         # Cập nhật album
         serializer = AlbumSerializer(album, data=album_data, partial=True)
@@ -294,14 +404,14 @@ def update_album(request, albumId):
                 {"message": "Cập nhật album thành công!", "data": serializer.data},
                 status=status.HTTP_200_OK
             )
-        print("Serializer errors:", serializer.errors)
+        logger.debug("Serializer errors: %s", serializer.errors)
         return Response(
             {"error": "Dữ liệu không hợp lệ.", "details": serializer.errors},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     except Exception as e:
-        print("Exception:", str(e))
+        logger.exception("Exception: %s", e)
         return Response(
             {"error": f"Lỗi hệ thống khi cập nhật album: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -0,0 +1,215 @@
+"""
+Phân tích âm thanh một lần cho mỗi bài hát: waveform peaks và loudness.
+
+Audio được ffmpeg giải mã thành PCM float32 (48 kHz, stereo) và đọc theo
+khối qua pipe, nên bộ nhớ chỉ giữ vài giây âm thanh:
+
+- Peaks: |sample| lớn nhất mỗi 10 ms, cuối cùng gộp (max) về
+  AUDIO_ANALYSIS['PEAKS'] điểm, lưu float16 (2 byte/điểm).
+- Loudness: integrated loudness kiểu BS.1770 (LUFS). Năng lượng K-weighted
+  của mỗi khối 100 ms tính bằng FFT (Parseval với |H(f)|^2 của bộ lọc K),
+  rồi gating tuyệt đối -70 LUFS và tương đối -10 LU trên cửa sổ 400 ms.
+
+Chạy bằng `python manage.py analyze_songs`, kết quả lưu ở SongAnalysis.
+"""
+import shutil
+import subprocess
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+
+from .audio import is_trusted_media_url, local_media_path
+
+_config = getattr(settings, 'AUDIO_ANALYSIS', {})
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+SUB_BLOCK = SAMPLE_RATE // 10     # 100 ms, bước của cửa sổ gating
+PEAK_WINDOW = SAMPLE_RATE // 100  # 10 ms cho mỗi peak thô
+ERROR_TAIL = 2000                 # Số ký tự cuối của stderr ffmpeg giữ trong AnalysisError
+
+# Hệ số bộ lọc K-weighting ở 48 kHz (ITU-R BS.1770): shelf + high-pass
+K_FILTERS = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285),
+     (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0),
+     (1.0, -1.99004745483398, 0.99007225036621)),
+)
+
+AnalysisResult = namedtuple('AnalysisResult', ['peaks', 'loudness', 'peak_db', 'duration'])
+
+
+class AnalysisError(Exception):
+    pass
+
+
+def ffmpeg_path():
+    """Đường dẫn đầy đủ của binary ffmpeg đã cấu hình, None nếu không tìm thấy."""
+    return shutil.which(_config.get('FFMPEG', 'ffmpeg'))
+
+
+def audio_source(url):
+    """
+    File trong MEDIA_ROOT, hoặc URL https trên host tin cậy để ffmpeg tự đọc
+    stream. Nguồn khác bị từ chối: ffmpeg đọc được nhiều giao thức nên không
+    được đưa cho nó URL tùy ý.
+    """
+    path = local_media_path(url)
+    if path:
+        return path
+    if is_trusted_media_url(url):
+        return url
+    raise AnalysisError(f'Nguồn âm thanh không được phép: {url}')
+
+
+def decode_pcm(source, sample_rate=SAMPLE_RATE, channels=CHANNELS, chunk_seconds=10):
+    """Yield các khối float32 shape (n, channels) do ffmpeg giải mã."""
+    command = [
+        _config.get('FFMPEG', 'ffmpeg'), '-v', 'error', '-nostdin',
+        '-protocol_whitelist', 'file,https,tls,tcp',
+        '-i', source, '-vn', '-ac', str(channels), '-ar', str(sample_rate),
+        '-f', 'f32le', '-',
+    ]
+    # stderr vào file tạm chứ không vào pipe: file lỗi có thể làm ffmpeg ghi lỗi
+    # theo từng frame; pipe đầy thì ffmpeg chặn ở stderr trong khi ta chặn ở stdout
+    stderr = tempfile.TemporaryFile()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+    frame_bytes = channels * 4
+    chunk_bytes = chunk_seconds * sample_rate * frame_bytes
+    completed = False
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % frame_bytes
+            yield np.frombuffer(data[:usable], dtype='<f4').reshape(-1, channels)
+        completed = True
+    finally:
+        # Bên gọi dừng giữa chừng (hoặc lỗi) thì dừng luôn ffmpeg
+        if not completed:
+            process.kill()
+        process.stdout.close()
+        returncode = process.wait()
+        stderr.seek(0)
+        error = stderr.read()
+        stderr.close()
+    if returncode != 0:
+        # Chỉ giữ phần cuối: lỗi theo từng frame có thể dài hàng MB
+        error = error.decode(errors='replace').strip()[-ERROR_TAIL:]
+        raise AnalysisError(error or f'ffmpeg exit {returncode}')
+
+
+def k_weighting_power(n, sample_rate=SAMPLE_RATE):
+    """|H(f)|^2 của bộ lọc K tại các bin của rfft độ dài n."""
+    z_inv = np.exp(-2j * np.pi * np.fft.rfftfreq(n, 1 / sample_rate) / sample_rate)
+    response = np.ones_like(z_inv)
+    for b, a in K_FILTERS:
+        response *= np.polyval(b[::-1], z_inv) / np.polyval(a[::-1], z_inv)
+    return np.abs(response) ** 2
+
+
+def downsample_peaks(peaks, count):
+    """Gộp (max) mảng peaks về tối đa `count` điểm."""
+    if count <= 0 or len(peaks) <= count:
+        return peaks
+    edges = (np.arange(count) * len(peaks)) // count
+    return np.maximum.reduceat(peaks, edges)
+
+
+def integrated_loudness(energies):
+    """Loudness (LUFS) từ năng lượng K-weighted của các khối 100 ms liên tiếp."""
+    if len(energies) < 4:
+        return None
+    # Cửa sổ 400 ms, chồng 75%: trung bình 4 khối 100 ms liền nhau
+    blocks = np.convolve(energies, np.full(4, 0.25), mode='valid')
+    with np.errstate(divide='ignore'):
+        loudness = -0.691 + 10 * np.log10(blocks)
+    gated = loudness > -70
+    if not gated.any():
+        return None
+    relative = -0.691 + 10 * np.log10(blocks[gated].mean()) - 10
+    gated &= loudness > relative
+    return float(-0.691 + 10 * np.log10(blocks[gated].mean()))
+
+
+class WaveformAnalyzer:
+    """Nhận các khối PCM liên tiếp qua feed(), gọi result() khi hết dữ liệu."""
+
+    def __init__(self, peak_count=None):
+        self.peak_count = peak_count or _config.get('PEAKS', 1000)
+        self._carry = np.empty((0, CHANNELS), dtype=np.float32)
+        self._peaks = []
+        self._energies = []
+        self._frames = 0
+        # Parseval cho rfft độ dài chẵn: bin 0 và Nyquist chỉ tính một lần,
+        # chia N^2 để ra trung bình bình phương của khối
+        weights = 2 * k_weighting_power(SUB_BLOCK)
+        weights[0] /= 2
+        weights[-1] /= 2
+        self._weights = (weights / SUB_BLOCK ** 2)[None, :, None]
+
+    def feed(self, frames):
+        self._frames += len(frames)
+        if len(self._carry):
+            frames = np.concatenate([self._carry, frames])
+        usable = len(frames) - len(frames) % SUB_BLOCK
+        self._carry = frames[usable:]
+        if usable:
+            self._process(frames[:usable].reshape(-1, SUB_BLOCK, CHANNELS))
+
+    def _process(self, blocks):
+        loudest = np.abs(blocks).max(axis=2)
+        self._peaks.append(loudest.reshape(-1, PEAK_WINDOW).max(axis=1))
+        spectrum = np.fft.rfft(blocks, axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        # Tổng năng lượng các kênh (trọng số kênh trái/phải = 1)
+        self._energies.append((power * self._weights).sum(axis=(1, 2)))
+
+    def result(self):
+        if len(self._carry):
+            # Khối cuối chưa đủ 100 ms: chỉ lấy peaks, không tính vào loudness
+            tail = np.abs(self._carry).max(axis=1)
+            windows = -(-len(tail) // PEAK_WINDOW)
+            tail = np.pad(tail, (0, windows * PEAK_WINDOW - len(tail)))
+            self._peaks.append(tail.reshape(-1, PEAK_WINDOW).max(axis=1))
+        if not self._peaks:
+            raise AnalysisError('Không có dữ liệu âm thanh')
+        peaks = np.concatenate(self._peaks)
+        energies = np.concatenate(self._energies) if self._energies else np.empty(0)
+        maximum = float(peaks.max())
+        return AnalysisResult(
+            peaks=downsample_peaks(peaks, self.peak_count).astype('<f2'),
+            loudness=integrated_loudness(energies),
+            peak_db=float(20 * np.log10(maximum)) if maximum > 0 else None,
+            duration=self._frames / SAMPLE_RATE,
+        )
+
+
+def analyze(source, peak_count=None):
+    analyzer = WaveformAnalyzer(peak_count)
+    for frames in decode_pcm(source):
+        analyzer.feed(frames)
+    return analyzer.result()
+
+
+def analyze_song(song):
+    """Phân tích một bài hát và lưu (ghi đè) SongAnalysis của nó."""
+    from .models import SongAnalysis
+
+    if not song.audio_file:
+        raise AnalysisError('Bài hát không có file âm thanh')
+    result = analyze(audio_source(song.audio_file))
+    analysis, _ = SongAnalysis.objects.update_or_create(
+        song=song,
+        defaults={
+            'peaks': result.peaks.tobytes(),
+            'peak_count': len(result.peaks),
+            'loudness': result.loudness,
+            'peak_db': result.peak_db,
+            'source_url': song.audio_file,
+        },
+    )
+    return analysis
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class SpotifyAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'spotify_app'
+
+    def ready(self):
+        # Đăng ký các signal (cache, index tìm kiếm, bộ đếm) và tạo index Mongo sau migrate
+        from . import signals
+        post_migrate.connect(signals.ensure_indexes, sender=self)
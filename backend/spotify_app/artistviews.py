@@ -6,9 +6,11 @@ from rest_framework import status
 from bson import ObjectId
 from .models import Artist, Album
 from .serializers import ArtistSerializer, AlbumSerializer
+from .cache import catalog_cache
 from backend.utils import SchemaFactory
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.pagination import LimitOffsetPagination
+from backend.pagination import ObjectIdCursorPagination
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,19 +28,18 @@ logger = logging.getLogger(__name__)
     },
     search_fields=["artist_name", "label"],
     description="Danh sách nghệ sĩ",
+    pagination='cursor',
     serializer=ArtistSerializer
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_all_artists(request):
     artists = Artist.objects.all()
-    serializer = ArtistSerializer(artists, many=True)
-    return Response({
-        "count": artists.count(),
-        "next": None,
-        "previous": None,
-        "results": serializer.data
-    })
+    # Phân trang keyset theo _id, không count() toàn collection
+    paginator = ObjectIdCursorPagination()
+    page = paginator.paginate_queryset(artists, request)
+    serializer = ArtistSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 # Get Artist Detail API: Lấy thông tin nghệ sĩ theo ID
@@ -64,20 +65,24 @@ def get_all_artists(request):
 @permission_classes([AllowAny])
 def get_artist_by_id(request, artist_id):
     try:
-        # Validate and convert artist_id to ObjectId
-        artist = Artist.objects.get(_id=ObjectId(artist_id))
+        data = catalog_cache.get('artist', artist_id)
+        if data is None:
+            token = catalog_cache.begin('artist', artist_id)
+            # Validate and convert artist_id to ObjectId
+            artist = Artist.objects.get(_id=ObjectId(artist_id))
+            data = ArtistSerializer(artist).data
+            catalog_cache.set('artist', artist._id, data, token=token)
         
         # Check if artist is hidden (only show to admin)
-        if artist.isHidden and not request.user.is_staff:
+        if data['isHidden'] and not request.user.is_staff:
             return Response({"error": "Artist not found"}, status=404)
         
-        serializer = ArtistSerializer(artist)
-        return Response(serializer.data)
+        return Response(data)
     
     except (Artist.DoesNotExist, ValueError):
         return Response({"error": "Artist not found"}, status=404)
     except Exception as e:
-        print(f"Error fetching artist: {str(e)}")
+        logger.error("Error fetching artist: %s", e)
         return Response({"error": "Internal server error"}, status=500)
 
 
@@ -131,7 +136,7 @@ def create_artist(request):
         )
         
     except Exception as e:
-        logger.error(f"Error creating artist: {str(e)}")
+        logger.error("Error creating artist: %s", e)
         return Response(
             {"error": "Internal server error"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -176,14 +181,14 @@ def delete_artist(request, artist_id):
     try:
         artist = Artist.objects.get(_id=ObjectId(artist_id))
         artist.delete()
-        print(f"Deleted artist with ID: {artist_id}")  # Log để debug
+        logger.debug("Deleted artist with ID: %s", artist_id)
         return Response({"message": "Artist deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
     except Artist.DoesNotExist:
         return Response({"error": "Artist not found"}, status=status.HTTP_404_NOT_FOUND)
     except ValueError:
         return Response({"error": "Invalid artist ID"}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        print(f"Error deleting artist: {str(e)}")
+        logger.error("Error deleting artist: %s", e)
         return Response({"error": "Internal server error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # Lấy danh sách album của nghệ sĩ
@@ -270,7 +275,7 @@ def hide_artist(request, _id):
         }, status=200)
 
     except Exception as e:
-        print(f"ERROR: {str(e)}")  # Debugging log
+        logger.error("%s", e)
         return Response({"error": "Internal Server Error"}, status=500)
 
 
@@ -310,5 +315,5 @@ def unhide_artist(request, _id):
         }, status=200)
 
     except Exception as e:
-        print(f"ERROR: {str(e)}")  # Debugging log
+        logger.error("%s", e)
         return Response({"error": "Internal Server Error"}, status=500)
\ No newline at end of file
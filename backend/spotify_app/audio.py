@@ -0,0 +1,294 @@
+"""
+Đọc metadata âm thanh chỉ từ phần header (không nạp cả file vào RAM).
+
+- probe(fileobj): thời lượng, bitrate, sample rate, số kênh (mutagen) và
+  encoder delay/padding từ LAME tag của MP3. Chỉ seek/đọc vài KB đầu file
+  (và tag ở cuối file nếu có).
+- HTTPRangeReader: file-like có seek trên URL (Cloudinary) bằng HTTP Range,
+  chỉ tải các block mà parser thực sự đọc.
+- schedule_song_metadata(): chạy probe trong thread pool sau khi upload rồi
+  ghi lại Song.duration, request upload không phải chờ.
+"""
+import datetime
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import mutagen
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from mutagen.mp3 import MP3
+
+logger = logging.getLogger(__name__)
+
+_config = getattr(settings, 'AUDIO_METADATA', {})
+
+AudioInfo = namedtuple('AudioInfo', [
+    'duration', 'bitrate', 'sample_rate', 'channels', 'encoder_delay', 'encoder_padding',
+])
+
+
+class AudioProbeError(Exception):
+    pass
+
+
+# ------------------------------------------------------------------ probe
+def _skip_id3v2(fileobj):
+    """Trả về offset ngay sau tag ID3v2 (0 nếu không có)."""
+    header = fileobj.read(10)
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def read_lame_gapless(fileobj):
+    """
+    (encoder_delay, encoder_padding) từ LAME tag trong frame Xing/Info đầu
+    tiên, hoặc (None, None) nếu file không có LAME tag.
+    """
+    fileobj.seek(0)
+    start = _skip_id3v2(fileobj)
+    fileobj.seek(start)
+    data = fileobj.read(4096)
+
+    # Frame sync: 11 bit 1
+    sync = next((i for i in range(len(data) - 1)
+                 if data[i] == 0xFF and data[i + 1] & 0xE0 == 0xE0), None)
+    if sync is None:
+        return None, None
+
+    # Tag Xing/Info nằm sau side info (17 hoặc 32 byte tùy version/kênh)
+    window = data[sync:sync + 64]
+    tag = max(window.find(b'Xing'), window.find(b'Info'))
+    if tag < 0:
+        return None, None
+    offset = sync + tag
+    flags = int.from_bytes(data[offset + 4:offset + 8], 'big')
+    offset += 8
+    offset += 4 if flags & 0x1 else 0     # số frame
+    offset += 4 if flags & 0x2 else 0     # số byte
+    offset += 100 if flags & 0x4 else 0   # TOC
+    offset += 4 if flags & 0x8 else 0     # quality
+
+    if data[offset:offset + 4] != b'LAME' or len(data) < offset + 24:
+        return None, None
+    # 9 byte version + revision, lowpass, replay gain, flags, bitrate = 21 byte,
+    # sau đó là 12 bit delay + 12 bit padding
+    raw = data[offset + 21:offset + 24]
+    return (raw[0] << 4) | (raw[1] >> 4), ((raw[1] & 0x0F) << 8) | raw[2]
+
+
+def probe(fileobj):
+    """Đọc metadata từ file-like có seek (file local, upload, HTTPRangeReader)."""
+    audio = mutagen.File(fileobj)
+    if audio is None or audio.info is None:
+        raise AudioProbeError('Không nhận dạng được định dạng âm thanh')
+    info = audio.info
+    delay = padding = None
+    if isinstance(audio, MP3):
+        delay, padding = read_lame_gapless(fileobj)
+    return AudioInfo(
+        duration=info.length,
+        bitrate=getattr(info, 'bitrate', None),
+        sample_rate=getattr(info, 'sample_rate', None),
+        channels=getattr(info, 'channels', None),
+        encoder_delay=delay,
+        encoder_padding=padding,
+    )
+
+
+def probe_upload(uploaded_file):
+    """Probe file upload: dùng file tạm trên đĩa nếu có, không copy sang BytesIO."""
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        with open(uploaded_file.temporary_file_path(), 'rb') as fileobj:
+            return probe(fileobj)
+    uploaded_file.seek(0)
+    try:
+        return probe(uploaded_file.file)
+    finally:
+        uploaded_file.seek(0)
+
+
+# ------------------------------------------------------------ HTTP source
+class HTTPRangeReader(io.RawIOBase):
+    """
+    File-like chỉ đọc trên URL hỗ trợ Range. Đọc theo block, giữ vài block gần
+    nhất (LRU) vì parser hay đọc lại header. Server không hỗ trợ Range thì báo
+    lỗi thay vì tải cả file.
+    """
+
+    def __init__(self, url, block_size=None, timeout=None, max_blocks=16, session=None):
+        super().__init__()
+        self.url = url
+        self.block_size = block_size or _config.get('BLOCK_SIZE', 64 * 1024)
+        self.timeout = timeout or _config.get('HTTP_TIMEOUT', 10)
+        self.max_blocks = max_blocks
+        self.session = session or requests.Session()
+        self._blocks = OrderedDict()
+        self._pos = 0
+        self.size = self._fetch_size()
+
+    def _get_range(self, start, end):
+        response = self.session.get(
+            self.url, headers={'Range': f'bytes={start}-{end}'},
+            timeout=self.timeout, stream=True,
+        )
+        try:
+            if response.status_code != 206:
+                raise AudioProbeError(f'Server không hỗ trợ Range (HTTP {response.status_code})')
+            return response.headers, response.content
+        finally:
+            response.close()
+
+    def _fetch_size(self):
+        headers, _ = self._get_range(0, 0)
+        # Content-Range: bytes 0-0/12345
+        total = headers.get('Content-Range', '').rpartition('/')[2]
+        if not total.isdigit():
+            raise AudioProbeError('Không xác định được kích thước file')
+        return int(total)
+
+    def _block(self, index):
+        block = self._blocks.get(index)
+        if block is None:
+            start = index * self.block_size
+            end = min(start + self.block_size, self.size) - 1
+            _, block = self._get_range(start, end)
+            self._blocks[index] = block
+            if len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(index)
+        return block
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError('negative seek position')
+        self._pos = offset
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._pos
+        size = max(0, min(size, self.size - self._pos))
+        chunks = []
+        while size:
+            index, offset = divmod(self._pos, self.block_size)
+            chunk = self._block(index)[offset:offset + size]
+            if not chunk:
+                break
+            chunks.append(chunk)
+            self._pos += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def local_media_path(url):
+    """Đường dẫn trong MEDIA_ROOT nếu URL trỏ vào media local, ngược lại None."""
+    if not url:
+        return None
+    media_url = settings.MEDIA_URL
+    path = url
+    if '://' in path:
+        path = '/' + path.split('://', 1)[1].partition('/')[2]
+    if not path.startswith(media_url):
+        return None
+    full_path = os.path.normpath(os.path.join(settings.MEDIA_ROOT, path[len(media_url):]))
+    if not full_path.startswith(os.path.normpath(str(settings.MEDIA_ROOT)) + os.sep):
+        return None
+    return full_path if os.path.isfile(full_path) else None
+
+
+def is_trusted_media_url(url):
+    """URL https trên một host trong settings.TRUSTED_MEDIA_HOSTS (mặc định chỉ Cloudinary)."""
+    try:
+        parts = urlsplit(url or '')
+        hostname = parts.hostname
+    except ValueError:
+        return False
+    return parts.scheme == 'https' and hostname in getattr(settings, 'TRUSTED_MEDIA_HOSTS', ['res.cloudinary.com'])
+
+
+def open_audio_source(url):
+    """File local nếu có trong MEDIA_ROOT, ngược lại đọc qua HTTP Range."""
+    path = local_media_path(url)
+    if path:
+        return open(path, 'rb')
+    return HTTPRangeReader(url)
+
+
+# ---------------------------------------------------------- worker pool
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_config.get('WORKERS', 4),
+                    thread_name_prefix='audio-metadata',
+                )
+    return _executor
+
+
+def seconds_to_time(seconds):
+    """Song.duration là TimeField nên giới hạn dưới 24 giờ."""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    return datetime.time(min(hours, 23), rest // 60, rest % 60)
+
+
+def update_song_metadata(song_id, url):
+    """Probe audio của bài hát rồi ghi lại Song.duration (chạy trong worker pool)."""
+    from .models import Song
+
+    try:
+        with open_audio_source(url) as source:
+            info = probe(source)
+        logger.debug("Metadata bài hát %s: %s", song_id, info)
+        song = Song.objects.filter(_id=song_id).first()
+        if song is None:
+            return None
+        song.duration = seconds_to_time(info.duration)
+        # save() để signals xóa cache/cập nhật index như các thay đổi khác
+        song.save(update_fields=['duration'])
+        return info
+    except Exception:
+        logger.exception("Không đọc được metadata âm thanh cho bài hát %s", song_id)
+        return None
+    finally:
+        close_old_connections()
+
+
+def schedule_song_metadata(song_id, url):
+    if not url:
+        return None
+    return get_executor().submit(update_song_metadata, song_id, url)
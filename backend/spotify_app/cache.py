@@ -0,0 +1,221 @@
+"""
+Cache đọc-xuyên (read-through) cho các endpoint chi tiết của catalog.
+
+Entry nằm trong cache dùng chung của Django (CACHES['catalog'], Redis), không
+nằm trong bộ nhớ của từng process: runserver :8000, daphne :8001 và các worker
+khác đọc cùng một bản, nên một lần invalidate từ spotify_app.signals ở process
+bất kỳ có hiệu lực ngay cho mọi process. Mỗi entry có TTL riêng; khi Redis đầy
+thì policy allkeys-lru của Redis loại các entry ít dùng nhất.
+
+Entry có thể phụ thuộc vào entry khác (bài hát nhúng dữ liệu album chứa nó).
+Mỗi đối tượng bị invalidate nhận một version mới (key `v:<kind>:<id>`); entry
+con lưu version của cha lúc được ghi và bị coi là không còn nếu version của cha
+đã đổi, nên không cần biết trước danh sách entry con để xóa.
+
+Đọc-xuyên gọi begin() trước khi đọc DB và truyền kết quả cho set(): entry lưu
+version của chính đối tượng lúc *trước* khi đọc, nên một invalidate xen giữa
+lần đọc DB và set() (ví dụ hide_song) làm entry bị từ chối thay vì phục vụ dữ
+liệu cũ suốt TTL. Cha chỉ biết được sau khi đọc, nên set() bỏ qua không ghi nếu
+version của cha được tạo từ lúc begin() (version là ObjectId, mang thời điểm).
+
+`missing_cache` là cache âm: nhớ các id vừa tra không thấy (hoặc vừa bị xóa)
+trong thời gian ngắn, để crawler/client cũ gọi lại id không tồn tại được trả
+404 ngay mà không chạm DB.
+
+`liked_songs` giữ tập id bài hát mỗi user đã thích (chỉ id, không join bài
+hát) cho endpoint kiểm tra "đã thích" theo lô, dưới dạng một Redis set mỗi
+user: kiểm tra là SISMEMBER, signals SADD/SREM đúng một id khi FavoriteSong
+được tạo hoặc xóa thay vì bỏ cả tập để request sau đọc lại từ DB.
+"""
+import logging
+import time
+
+from bson import ObjectId
+from django.conf import settings
+from django.core.cache import caches
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError, WatchError
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'catalog'
+# Version phải sống lâu hơn mọi entry phụ thuộc vào nó
+VERSION_TTL = 24 * 3600
+
+
+def make_key(kind, obj_id):
+    return f'{kind}:{obj_id}'
+
+
+def album_song_key(album_id, song_id):
+    """Id cho cặp (album, bài hát) trong missing_cache, dùng bởi delete_song_inAlbum."""
+    return f'{album_id}:{song_id}'
+
+
+def _created_since(version, started):
+    # Version cùng giây với begin() cũng tính (độ phân giải của ObjectId là giây)
+    return bool(version) and ObjectId.is_valid(version) and ObjectId(version).generation_time.timestamp() >= started
+
+
+class CatalogCache:
+    """Cache theo (kind, id) với TTL và invalidate theo phụ thuộc, trên cache dùng chung."""
+
+    def __init__(self, namespace, ttl=300, track_dependents=True):
+        self.namespace = namespace
+        self.ttl = ttl
+        # Cache không có entry nào phụ thuộc vào (missing_cache) thì không cần ghi version
+        self.track_dependents = track_dependents
+
+    @property
+    def cache(self):
+        return caches[CACHE_ALIAS]
+
+    def _key(self, kind, obj_id):
+        return f'{self.namespace}:{make_key(kind, obj_id)}'
+
+    def _version_key(self, kind, obj_id):
+        # Version dùng chung giữa các namespace: phụ thuộc luôn trỏ tới catalog
+        return f'v:{make_key(kind, obj_id)}'
+
+    def get(self, kind, obj_id):
+        entry = self.cache.get(self._key(kind, obj_id))
+        if entry is None:
+            return None
+        value, parents = entry
+        if parents:
+            current = self.cache.get_many([version_key for version_key, _ in parents])
+            if any(current.get(version_key) != version for version_key, version in parents):
+                return None
+        return value
+
+    def begin(self, kind, obj_id):
+        """Gọi trước khi đọc DB; kết quả truyền cho set(token=...)."""
+        return self.cache.get(self._version_key(kind, obj_id)), int(time.time())
+
+    def set(self, kind, obj_id, value, depends_on=(), ttl=None, token=None):
+        version_keys = [self._version_key(k, i) for k, i in depends_on if i is not None]
+        own_key = self._version_key(kind, obj_id)
+        lookup = version_keys + [own_key] if token is not None else version_keys
+        current = self.cache.get_many(lookup) if lookup else {}
+        parents = [(version_key, current.get(version_key)) for version_key in version_keys]
+        if token is not None:
+            own_version, started = token
+            # Bị invalidate trong lúc đọc DB: dữ liệu vừa đọc có thể đã cũ
+            if current.get(own_key) != own_version:
+                return
+            if any(_created_since(version, started) for _, version in parents):
+                return
+            parents.append((own_key, own_version))
+        self.cache.set(self._key(kind, obj_id), (value, parents), self.ttl if ttl is None else ttl)
+
+    def invalidate(self, kind, obj_id):
+        self.cache.delete(self._key(kind, obj_id))
+        if self.track_dependents:
+            # Version mới không bao giờ trùng version cũ (kể cả sau khi key version hết hạn)
+            self.cache.set(self._version_key(kind, obj_id), str(ObjectId()), VERSION_TTL)
+
+
+class MemberSetCache:
+    """
+    Một Redis set mỗi owner trên Redis của CACHES['catalog']. Member LOADED
+    phân biệt tập đã nạp (kể cả rỗng) với key chưa có/hết hạn; SADD vào key
+    chưa nạp tạo set thiếu LOADED nên vẫn bị coi là chưa nạp. Redis lỗi thì
+    hành xử như cache trống (giống IGNORE_EXCEPTIONS của CACHES['catalog']).
+
+    Nạp từ DB: begin() đọc version của owner trước truy vấn DB, load() WATCH
+    version đó và chỉ SADD (gộp, không xóa set) nếu không có add/remove nào
+    xen giữa; add/remove tăng version, nên ảnh chụp DB đã cũ không bao giờ
+    được ghi vào set.
+    """
+    LOADED = '__loaded__'
+
+    def __init__(self, namespace, ttl=300):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    @property
+    def redis(self):
+        return get_redis_connection(CACHE_ALIAS)
+
+    def _key(self, owner_id):
+        return caches[CACHE_ALIAS].make_key(f'{self.namespace}:{owner_id}')
+
+    def _version_key(self, owner_id):
+        return caches[CACHE_ALIAS].make_key(f'{self.namespace}:{owner_id}:v')
+
+    def begin(self, owner_id):
+        """Gọi trước khi đọc DB; kết quả truyền cho load()."""
+        try:
+            return self.redis.get(self._version_key(owner_id))
+        except RedisError as e:
+            logger.warning("Không đọc được version %s: %s", owner_id, e)
+            return None
+
+    def contains(self, owner_id, members):
+        """[bool] theo thứ tự members, hoặc None nếu tập chưa được nạp."""
+        key = self._key(owner_id)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sismember(key, self.LOADED)
+            for member in members:
+                pipe.sismember(key, str(member))
+            loaded, *flags = pipe.execute()
+        except RedisError as e:
+            logger.warning("Không đọc được %s: %s", key, e)
+            return None
+        return [bool(flag) for flag in flags] if loaded else None
+
+    def load(self, owner_id, members, token):
+        """Nạp tập đọc từ DB sau begin(); trả về False nếu bị add/remove xen giữa (không ghi)."""
+        key, version_key = self._key(owner_id), self._version_key(owner_id)
+        try:
+            with self.redis.pipeline() as pipe:
+                pipe.watch(version_key)
+                if pipe.get(version_key) != token:
+                    return False
+                pipe.multi()
+                pipe.sadd(key, self.LOADED, *(str(member) for member in members))
+                pipe.expire(key, self.ttl)
+                pipe.execute()
+        except WatchError:
+            return False
+        except RedisError as e:
+            logger.warning("Không ghi được %s: %s", key, e)
+            return False
+        return True
+
+    def _update(self, command, owner_id, member):
+        key = self._key(owner_id)
+        try:
+            version_key = self._version_key(owner_id)
+            pipe = self.redis.pipeline()
+            getattr(pipe, command)(key, str(member))
+            pipe.expire(key, self.ttl)
+            pipe.incr(version_key)
+            pipe.expire(version_key, self.ttl)
+            pipe.execute()
+        except RedisError as e:
+            # Tập có thể đã lệch: xóa để lần đọc sau nạp lại từ DB
+            logger.warning("Không cập nhật được %s: %s", key, e)
+            self.discard(owner_id)
+
+    def add(self, owner_id, member):
+        self._update('sadd', owner_id, member)
+
+    def remove(self, owner_id, member):
+        self._update('srem', owner_id, member)
+
+    def discard(self, owner_id):
+        try:
+            self.redis.delete(self._key(owner_id), self._version_key(owner_id))
+        except RedisError:
+            pass
+
+
+_config = getattr(settings, 'CATALOG_CACHE', {})
+
+catalog_cache = CatalogCache('catalog', ttl=_config.get('TTL', 300))
+
+missing_cache = CatalogCache('missing', ttl=_config.get('MISSING_TTL', 30), track_dependents=False)
+
+liked_songs = MemberSetCache('liked_songs', ttl=_config.get('LIKED_TTL', 3600))
@@ -0,0 +1,66 @@
+"""
+Bộ đếm denormalized: Playlist.track_count/total_duration và
+Album.total_tracks/total_duration (giây).
+
+Mọi thay đổi là một lệnh $inc nguyên tử trên Mongo (không đọc - sửa - ghi nên
+không mất cập nhật khi nhiều request chạy song song):
+- signals.py gọi khi Song/PlaylistSong được tạo, sửa, xóa qua ORM (kể cả xóa
+  dây chuyền khi xóa bài hát hoặc playlist);
+- các đường ghi hàng loạt bỏ qua signals (bulk_upload_songs,
+  add_songs_to_playlist_batch) gọi trực tiếp.
+Dữ liệu ghi thẳng vào Mongo thì chạy `python manage.py recount_counters`.
+"""
+from pymongo import UpdateOne
+
+from music_library.models import PlaylistSong
+from .cache import catalog_cache
+from .models import Album, Playlist, Song
+
+
+def duration_seconds(value):
+    """Song.duration (TimeField) -> số giây."""
+    if not value:
+        return 0
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _inc(model, ids, count_field, tracks, seconds):
+    ids = [object_id for object_id in ids if object_id is not None]
+    changes = {field: value for field, value in ((count_field, tracks), ('total_duration', seconds)) if value}
+    if not ids or not changes:
+        return
+    model.objects.mongo_update_many({'_id': {'$in': ids}}, {'$inc': changes})
+
+
+def inc_playlists(playlist_ids, tracks=0, seconds=0):
+    _inc(Playlist, playlist_ids, 'track_count', tracks, seconds)
+
+
+def inc_playlist(playlist_id, tracks=0, seconds=0):
+    inc_playlists([playlist_id], tracks, seconds)
+
+
+def inc_each_playlist(changes):
+    """changes: {playlist_id: (tracks, seconds)} khác nhau mỗi playlist, ghi bằng một bulk_write."""
+    operations = [
+        UpdateOne({'_id': playlist_id}, {'$inc': {'track_count': tracks, 'total_duration': seconds}})
+        for playlist_id, (tracks, seconds) in changes.items()
+        if playlist_id is not None and (tracks or seconds)
+    ]
+    if operations:
+        Playlist.objects.mongo_bulk_write(operations, ordered=False)
+
+
+def recount_playlist(playlist_id):
+    """Ghi đè bộ đếm của một playlist từ các dòng PlaylistSong thật; trả về (tracks, seconds)."""
+    song_ids = list(PlaylistSong.objects.filter(playlist=playlist_id).values_list('song', flat=True))
+    durations = Song.objects.filter(_id__in=song_ids).values_list('duration', flat=True) if song_ids else []
+    tracks, seconds = len(song_ids), sum(duration_seconds(duration) for duration in durations)
+    Playlist.objects.mongo_update_one({'_id': playlist_id}, {'$set': {'track_count': tracks, 'total_duration': seconds}})
+    return tracks, seconds
+
+
+def inc_album(album_id, tracks=0, seconds=0):
+    _inc(Album, [album_id], 'total_tracks', tracks, seconds)
+    if album_id is not None:
+        catalog_cache.invalidate('album', album_id)
@@ -0,0 +1,308 @@
+"""
+Phân đoạn MP3 kiểu HLS (packed audio), không transcode.
+
+- iter_frames(): đọc header từng frame MPEG audio (bảng bitrate/sample rate
+  của MPEG-1/2/2.5, layer I/II/III) để biết độ dài frame, nhảy thẳng sang frame
+  kế tiếp; gặp rác (tag APE, byte hỏng) thì dò lại byte đồng bộ 0xFF.
+- build_segments(): gom các frame liền nhau thành segment khoảng
+  HLS['SEGMENT_SECONDS'] giây, cắt đúng ranh giới frame. Frame Xing/Info đầu
+  file bị bỏ vì nó mô tả cả file chứ không phải từng segment.
+- Mỗi segment là một đoạn byte của file gốc, thêm tag ID3 PRIV chứa timestamp
+  (transportStreamTimestamp, 90 kHz) như spec HLS yêu cầu cho packed audio.
+  Bit reservoir của MP3 có thể làm vài ms đầu segment giải mã thiếu khi nhảy
+  thẳng vào segment đó; phát liên tục thì không ảnh hưởng.
+
+Cache trên đĩa: MEDIA_ROOT/hls/<song_id>/<version>/ chứa index.json và các
+segment. `version` đổi khi file nguồn đổi (URL, hoặc mtime/size với file
+local) nên URL segment bất biến, CDN cache lâu được. Tổng dung lượng vượt
+HLS['CACHE_MAX_BYTES'] thì xóa cả thư mục của các bài lâu không được dùng
+nhất (LRU theo mtime của file .used).
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+
+from .audio import _skip_id3v2, local_media_path, open_audio_source
+
+logger = logging.getLogger(__name__)
+
+_config = getattr(settings, 'HLS', {})
+
+SEGMENT_SECONDS = _config.get('SEGMENT_SECONDS', 6)
+CACHE_MAX_BYTES = _config.get('CACHE_MAX_BYTES', 2 * 1024 ** 3)
+READ_CHUNK = 64 * 1024
+TOUCH_INTERVAL = 60             # Giây, tránh ghi mtime của .used ở mọi request
+TIMESTAMP_OWNER = b'com.apple.streaming.transportStreamTimestamp'
+
+Frame = namedtuple('Frame', ['offset', 'length', 'samples', 'sample_rate'])
+Segment = namedtuple('Segment', ['start', 'end', 'duration', 'start_sample', 'sample_rate'])
+
+# Bitrate (kbps) theo (MPEG-1?, layer); chỉ số 0 (free format) và 15 không hợp lệ
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rate theo 2 bit version: 0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1
+_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+
+class HLSError(Exception):
+    pass
+
+
+# ------------------------------------------------------------ MP3 frames
+def parse_frame_header(header):
+    """(length, samples, sample_rate, version, layer) của 4 byte header, None nếu không hợp lệ."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x3
+    layer = 4 - ((header[1] >> 1) & 0x3)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x1
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return length, samples, sample_rate, version, layer
+
+
+def iter_frames(fileobj):
+    """Yield Frame cho từng frame audio của file MP3 (bỏ frame Xing/Info)."""
+    size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(0)
+    buffer_start = _skip_id3v2(fileobj)
+    fileobj.seek(buffer_start)
+    buffer = fileobj.read(READ_CHUNK)
+    pos = 0
+    stream = None    # (version, layer, sample_rate) của frame hợp lệ đầu tiên
+    first = True
+    while True:
+        if len(buffer) - pos < 4:
+            buffer_start += pos
+            if buffer_start + 4 > size:
+                return
+            fileobj.seek(buffer_start)
+            buffer = fileobj.read(READ_CHUNK)
+            pos = 0
+            if len(buffer) < 4:
+                return
+        header = parse_frame_header(buffer[pos:pos + 4])
+        if header is not None and stream is not None and (header[3], header[4], header[2]) != stream:
+            # Khác version/layer/sample rate với stream: đồng bộ nhầm trong dữ liệu
+            header = None
+        if header is None or buffer_start + pos + header[0] > size:
+            # Không phải frame (hoặc frame cuối bị cắt): dò byte đồng bộ tiếp theo
+            if header is not None:
+                return
+            following = buffer.find(b'\xff', pos + 1)
+            pos = following if following >= 0 else len(buffer)
+            continue
+        length, samples, sample_rate, version, layer = header
+        stream = (version, layer, sample_rate)
+        if first:
+            first = False
+            head = buffer[pos:pos + min(length, 64)]
+            if b'Xing' in head or b'Info' in head:
+                pos += length
+                continue
+        yield Frame(buffer_start + pos, length, samples, sample_rate)
+        pos += length
+
+
+def build_segments(frames, target_seconds=SEGMENT_SECONDS):
+    """Gom các Frame liên tiếp thành Segment dài khoảng target_seconds."""
+    segments = []
+    start = end = None
+    samples = total = 0
+    sample_rate = None
+    for frame in frames:
+        if start is not None and frame.offset != end:
+            # Có rác giữa hai frame: đóng segment để không chép rác vào
+            segments.append(Segment(start, end, samples / sample_rate, total - samples, sample_rate))
+            start = None
+            samples = 0
+        if start is None:
+            start = frame.offset
+            sample_rate = frame.sample_rate
+        end = frame.offset + frame.length
+        samples += frame.samples
+        total += frame.samples
+        if samples >= target_seconds * sample_rate:
+            segments.append(Segment(start, end, samples / sample_rate, total - samples, sample_rate))
+            start = None
+            samples = 0
+    if start is not None:
+        segments.append(Segment(start, end, samples / sample_rate, total - samples, sample_rate))
+    return segments
+
+
+def _syncsafe(value):
+    return bytes(((value >> shift) & 0x7F) for shift in (21, 14, 7, 0))
+
+
+def timestamp_tag(start_sample, sample_rate):
+    """Tag ID3v2.4 chỉ có frame PRIV transportStreamTimestamp (PTS 33 bit, 90 kHz)."""
+    pts = (start_sample * 90000 // sample_rate) & ((1 << 33) - 1)
+    payload = TIMESTAMP_OWNER + b'\x00' + pts.to_bytes(8, 'big')
+    frame = b'PRIV' + _syncsafe(len(payload)) + b'\x00\x00' + payload
+    return b'ID3\x04\x00\x00' + _syncsafe(len(frame)) + frame
+
+
+# ------------------------------------------------------------ playlist
+def media_version(url):
+    """Phiên bản của file nguồn: đổi khi URL đổi, hoặc khi file local bị ghi đè."""
+    key = url
+    path = local_media_path(url)
+    if path:
+        stat = os.stat(path)
+        key = f'{url}|{stat.st_mtime_ns}|{stat.st_size}'
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def render_playlist(segments, segment_url):
+    """Nội dung m3u8 (VOD); segment_url(i) trả về URL của segment thứ i."""
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        f'#EXT-X-TARGETDURATION:{math.ceil(max((s.duration for s in segments), default=0))}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+    ]
+    for index, segment in enumerate(segments):
+        lines.append(f'#EXTINF:{segment.duration:.3f},')
+        lines.append(segment_url(index))
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+# ------------------------------------------------------------ disk cache
+class SegmentCache:
+
+    def __init__(self, root=None, max_bytes=CACHE_MAX_BYTES):
+        self.root = str(root or os.path.join(settings.MEDIA_ROOT, 'hls'))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._written = 0
+
+    def directory(self, song_id, version):
+        return os.path.join(self.root, str(song_id), version)
+
+    def _write(self, path, data):
+        # Ghi file tạm rồi rename: request song song không bao giờ đọc file dở
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp, 'wb') as fileobj:
+            fileobj.write(data)
+        os.replace(temp, path)
+        with self._lock:
+            self._written += len(data)
+            should_evict = self._written >= self.max_bytes // 20
+            if should_evict:
+                self._written = 0
+        if should_evict:
+            self.evict()
+
+    def touch(self, directory):
+        marker = os.path.join(directory, '.used')
+        try:
+            if time.time() - os.path.getmtime(marker) < TOUCH_INTERVAL:
+                return
+        except OSError:
+            pass
+        try:
+            with open(marker, 'a'):
+                os.utime(marker)
+        except OSError:
+            pass
+
+    def segments(self, song_id, url):
+        """(version, danh sách Segment) của bài hát, quét file nguồn nếu chưa có index."""
+        version = media_version(url)
+        directory = self.directory(song_id, version)
+        index_path = os.path.join(directory, 'index.json')
+        try:
+            with open(index_path) as fileobj:
+                segments = [Segment(*item) for item in json.load(fileobj)]
+        except (OSError, ValueError):
+            with open_audio_source(url) as source:
+                segments = build_segments(iter_frames(source))
+            if not segments:
+                raise HLSError('Không tìm thấy frame MP3 nào trong file')
+            self._write(index_path, json.dumps(segments).encode())
+            logger.info("Đã phân đoạn bài hát %s: %d segment", song_id, len(segments))
+        self.touch(directory)
+        return version, segments
+
+    def segment_path(self, song_id, url, index):
+        """Đường dẫn file của segment thứ index, cắt từ file nguồn nếu chưa có."""
+        version, segments = self.segments(song_id, url)
+        if not 0 <= index < len(segments):
+            raise IndexError(index)
+        path = os.path.join(self.directory(song_id, version), f'{index}.mp3')
+        if not os.path.isfile(path):
+            segment = segments[index]
+            with open_audio_source(url) as source:
+                source.seek(segment.start)
+                data = source.read(segment.end - segment.start)
+            self._write(path, timestamp_tag(segment.start_sample, segment.sample_rate) + data)
+        return version, path
+
+    def evict(self):
+        """Xóa thư mục của các bài ít dùng nhất đến khi dưới max_bytes."""
+        entries = []
+        total = 0
+        for song_dir in _scandirs(self.root):
+            for version_dir in _scandirs(song_dir.path):
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(version_dir.path) if entry.is_file())
+                except FileNotFoundError:
+                    # Worker khác vừa xóa thư mục này (rmtree bên dưới)
+                    continue
+                try:
+                    used = os.path.getmtime(os.path.join(version_dir.path, '.used'))
+                except OSError:
+                    used = 0
+                entries.append((used, size, version_dir.path))
+                total += size
+        entries.sort()
+        for used, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(path))   # Thư mục bài hát đã rỗng
+            except OSError:
+                pass
+            total -= size
+            logger.debug("Đã xóa cache HLS %s (%d byte)", path, size)
+
+
+def _scandirs(path):
+    try:
+        return [entry for entry in os.scandir(path) if entry.is_dir()]
+    except OSError:
+        return []
+
+
+segment_cache = SegmentCache()
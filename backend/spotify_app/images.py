@@ -0,0 +1,338 @@
+"""
+Ảnh thu nhỏ (variant) cho cover album/playlist, ảnh nghệ sĩ, ảnh bài hát và
+avatar người dùng, để list endpoint không phải trả ảnh gốc độ phân giải đầy đủ.
+
+- Mỗi ảnh gốc sinh các cỡ vuông cố định IMAGE_VARIANTS['SIZES'] ở WebP và
+  JPEG (Pillow, crop giữa bằng ImageOps.fit), kèm chuỗi blurhash ~20 ký tự
+  để client vẽ placeholder mờ trước khi tải ảnh.
+- Cache trên đĩa theo nội dung: MEDIA_ROOT/variants/<key[:2]>/<key>/, với key
+  là sha256 của URL ảnh gốc (URL Cloudinary có version nên đổi ảnh là đổi
+  URL), cộng mtime/size nếu ảnh nằm trong MEDIA_ROOT. URL variant nhờ vậy bất
+  biến, cache vĩnh viễn được.
+- image_variants(url) chỉ dựng URL (không tải ảnh) nên gọi được cho từng dòng
+  của list/stream; URL mang token ký bằng SECRET_KEY chứa URL gốc, view chỉ xử
+  lý ảnh từ token hợp lệ. Variant được tạo khi client tải lần đầu (view
+  image_variant). Chỉ khi serialize một object đơn lẻ (warm=True) ảnh chưa có
+  blurhash mới được tạo nền, trong thread pool có hàng đợi giới hạn MAX_PENDING.
+- Chỉ ảnh trong MEDIA_ROOT hoặc trên host trong TRUSTED_MEDIA_HOSTS
+  (Cloudinary) mới được tải; URL khác không có variant.
+- Mỗi ảnh chỉ trả một URL mẫu "<...>/{size}.{fmt}" (token xuất hiện một lần):
+  6 URL đầy đủ làm mỗi field ảnh tốn ~2 KB JSON, bằng dung lượng của chính ảnh thumb.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from .audio import is_trusted_media_url, local_media_path
+
+logger = logging.getLogger(__name__)
+
+_config = getattr(settings, 'IMAGE_VARIANTS', {})
+
+SIZES = _config.get('SIZES', {'thumb': 64, 'small': 300, 'medium': 640})
+FORMATS = tuple(_config.get('FORMATS', ('webp', 'jpeg')))
+QUALITY = _config.get('QUALITY', 80)
+MAX_SOURCE_BYTES = _config.get('MAX_SOURCE_BYTES', 20 * 1024 * 1024)
+TOKEN_SALT = 'spotify_app.images'
+VERSION_CHARS = 16              # Phần đầu của key đưa vào token để URL đổi khi ảnh local đổi
+PLACEHOLDER_CACHE_SIZE = 10000
+MAX_PENDING = _config.get('MAX_PENDING', 100)
+BLURHASH_COMPONENTS = (4, 3)
+
+_BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+_PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+class ImageVariantError(Exception):
+    pass
+
+
+# ------------------------------------------------------------ blurhash
+def _base83(value, length):
+    return ''.join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _linear_to_srgb(value):
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash(image, components=BLURHASH_COMPONENTS):
+    """Mã blurhash (https://blurha.sh) của ảnh, tính trên bản thu nhỏ 32x32."""
+    x_components, y_components = components
+    pixels = np.asarray(image.convert('RGB').resize((32, 32), Image.Resampling.BILINEAR), dtype=np.float64) / 255
+    linear = np.where(pixels <= 0.04045, pixels / 12.92, ((pixels + 0.055) / 1.055) ** 2.4)
+    height, width = linear.shape[:2]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            basis = np.outer(np.cos(np.pi * j * np.arange(height) / height),
+                             np.cos(np.pi * i * np.arange(width) / width))
+            scale = 1 if i == j == 0 else 2
+            factors.append(scale * (basis[:, :, None] * linear).sum(axis=(0, 1)) / (width * height))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = int(max(0, min(82, np.floor(max(abs(v).max() for v in ac) * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+    else:
+        quantised_max, maximum = 0, 1
+    result += _base83(quantised_max, 1)
+    r, g, b = (_linear_to_srgb(v) for v in dc)
+    result += _base83((r << 16) + (g << 8) + b, 4)
+    for value in ac:
+        q = [int(max(0, min(18, np.floor(np.sign(v) * abs(v / maximum) ** 0.5 * 9 + 9.5)))) for v in value]
+        result += _base83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+    return result
+
+
+# ------------------------------------------------------------ cache
+def allowed_source(url):
+    """Ảnh gốc có được phép tải không: file trong MEDIA_ROOT hoặc URL https trên host tin cậy."""
+    return local_media_path(url) is not None or is_trusted_media_url(url)
+
+
+def source_key(url):
+    """Key nội dung của ảnh gốc (xem docstring module)."""
+    identity = url
+    path = local_media_path(url)
+    if path:
+        stat = os.stat(path)
+        identity = f'{url}|{stat.st_mtime_ns}|{stat.st_size}'
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+def cache_dir(key):
+    return os.path.join(settings.MEDIA_ROOT, 'variants', key[:2], key)
+
+
+def variant_path(key, size, fmt):
+    return os.path.join(cache_dir(key), f'{size}.{fmt}')
+
+
+def _write(path, data):
+    temp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp, 'wb') as fileobj:
+        fileobj.write(data)
+    os.replace(temp, path)
+
+
+def _fetch(url):
+    path = local_media_path(url)
+    if path:
+        if os.path.getsize(path) > MAX_SOURCE_BYTES:
+            raise ImageVariantError('Ảnh gốc quá lớn')
+        with open(path, 'rb') as fileobj:
+            return fileobj.read()
+    if not is_trusted_media_url(url):
+        raise ImageVariantError('Nguồn ảnh không được phép')
+    try:
+        # Không theo redirect: đích redirect không nằm trong danh sách host tin cậy
+        with requests.get(url, stream=True, timeout=_config.get('HTTP_TIMEOUT', 10),
+                          allow_redirects=False) as response:
+            response.raise_for_status()
+            if response.status_code != 200:
+                raise ImageVariantError(f'Không tải được ảnh gốc: HTTP {response.status_code}')
+            chunks, total = [], 0
+            for chunk in response.iter_content(64 * 1024):
+                total += len(chunk)
+                if total > MAX_SOURCE_BYTES:
+                    raise ImageVariantError('Ảnh gốc quá lớn')
+                chunks.append(chunk)
+    except requests.RequestException as e:
+        raise ImageVariantError(f'Không tải được ảnh gốc: {e}')
+    return b''.join(chunks)
+
+
+def _open_rgb(data):
+    image = Image.open(io.BytesIO(data))
+    # JPEG: giải mã thẳng ở tỉ lệ 1/2, 1/4, 1/8 nếu vẫn đủ cho cỡ lớn nhất
+    largest = max(SIZES.values())
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def ensure_variants(url, key=None):
+    """Tạo (nếu chưa có) mọi variant và blurhash của ảnh; trả về key."""
+    key = key or source_key(url)
+    directory = cache_dir(key)
+    wanted = [(size, fmt) for size in SIZES for fmt in FORMATS]
+    if os.path.isfile(os.path.join(directory, 'blurhash')) and all(
+            os.path.isfile(variant_path(key, size, fmt)) for size, fmt in wanted):
+        return key
+
+    try:
+        image = _open_rgb(_fetch(url))
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ImageVariantError(f'Không đọc được ảnh: {e}')
+
+    os.makedirs(directory, exist_ok=True)
+    for size, side in SIZES.items():
+        thumbnail = ImageOps.fit(image, (side, side), Image.Resampling.LANCZOS)
+        for fmt in FORMATS:
+            buffer = io.BytesIO()
+            if fmt == 'jpeg':
+                thumbnail.save(buffer, 'JPEG', quality=QUALITY, optimize=True, progressive=True)
+            else:
+                thumbnail.save(buffer, _PIL_FORMATS[fmt], quality=QUALITY, method=4)
+            _write(variant_path(key, size, fmt), buffer.getvalue())
+    placeholder = blurhash(image)
+    _write(os.path.join(directory, 'blurhash'), placeholder.encode())
+    _remember_placeholder(key, placeholder)
+    logger.debug("Đã tạo variant ảnh %s cho %s", key, url)
+    return key
+
+
+# ------------------------------------------------------------ background
+_placeholders = OrderedDict()
+_pending = set()
+_lock = threading.Lock()
+_executor = None
+
+
+def _remember_placeholder(key, value):
+    with _lock:
+        _placeholders[key] = value
+        _placeholders.move_to_end(key)
+        if len(_placeholders) > PLACEHOLDER_CACHE_SIZE:
+            _placeholders.popitem(last=False)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_config.get('WORKERS', 2),
+                    thread_name_prefix='image-variants',
+                )
+    return _executor
+
+
+def _warm(url, key):
+    try:
+        ensure_variants(url, key)
+    except Exception:
+        logger.exception("Không tạo được variant cho ảnh %s", url)
+    finally:
+        with _lock:
+            _pending.discard(key)
+
+
+def schedule_variants(url, key):
+    """Tạo variant nền; bỏ qua nếu đã có MAX_PENDING ảnh đang chờ."""
+    with _lock:
+        if key in _pending or len(_pending) >= MAX_PENDING:
+            return
+        _pending.add(key)
+    _get_executor().submit(_warm, url, key)
+
+
+def placeholder(url, key, warm=False):
+    """Blurhash đã tính của ảnh, None nếu chưa có (warm=True thì lên lịch tạo)."""
+    with _lock:
+        value = _placeholders.get(key)
+    if value is not None:
+        return value
+    try:
+        with open(os.path.join(cache_dir(key), 'blurhash')) as fileobj:
+            value = fileobj.read().strip()
+    except OSError:
+        if warm:
+            schedule_variants(url, key)
+        return None
+    _remember_placeholder(key, value)
+    return value
+
+
+# ------------------------------------------------------------ URLs
+def make_token(url, key):
+    return signing.dumps([url, key[:VERSION_CHARS]], salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token):
+    """(url, phần đầu của key) từ token, hoặc raise signing.BadSignature."""
+    data = signing.loads(token, salt=TOKEN_SALT)
+    if not isinstance(data, list) or len(data) != 2:
+        raise signing.BadSignature('Token ảnh sai định dạng')
+    return data[0], data[1]
+
+
+_templates = OrderedDict()
+
+
+def _url_template(url, key):
+    """URL mẫu của ảnh; nhớ theo (url, key) để list không ký token lại cho mỗi dòng."""
+    with _lock:
+        template = _templates.get((url, key))
+    if template is None:
+        path = reverse('spotify_app:image_variant', kwargs={'token': make_token(url, key), 'size': 'size', 'fmt': 'fmt'})
+        template = path[:-len('size.fmt')] + '{size}.{fmt}'
+        with _lock:
+            _templates[(url, key)] = template
+            if len(_templates) > PLACEHOLDER_CACHE_SIZE:
+                _templates.popitem(last=False)
+    return template
+
+
+def image_variants(url, warm=False):
+    """
+    {"url": "/spotify_app/images/<token>/{size}.{fmt}", "sizes": {"thumb": 64, ...},
+     "formats": ["webp", "jpeg"], "blurhash": str | None}
+    cho ảnh gốc `url`, None nếu không có ảnh hoặc nguồn không được phép.
+    Client thay {size}/{fmt} để ra URL variant. Không tải ảnh trong request;
+    warm=True (một object đơn lẻ) thì lên lịch tạo nền nếu chưa có blurhash.
+    """
+    if not url or not allowed_source(url):
+        return None
+    try:
+        key = source_key(url)
+    except OSError:
+        return None
+    return {
+        'url': _url_template(url, key),
+        'sizes': SIZES,
+        'formats': list(FORMATS),
+        'blurhash': placeholder(url, key, warm),
+    }
+
+
+class ImageVariantsField(serializers.Field):
+    """Field chỉ đọc: `cover_img_variants = ImageVariantsField(source='cover_img')`."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        # Trong list (many=True, kể cả ?stream=) chỉ trả URL, không lên lịch tạo ảnh
+        field, in_list = self, False
+        while field is not None and not in_list:
+            in_list = isinstance(field, serializers.ListSerializer)
+            field = field.parent
+        return image_variants(value, warm=not in_list)
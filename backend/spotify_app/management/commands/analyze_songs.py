@@ -0,0 +1,46 @@
+from bson import ObjectId
+from django.core.management.base import BaseCommand, CommandError
+
+from spotify_app.analysis import AnalysisError, analyze_song, ffmpeg_path
+from spotify_app.models import Song, SongAnalysis
+
+
+class Command(BaseCommand):
+    help = "Tính waveform peaks và loudness cho các bài hát chưa phân tích (hoặc đã đổi file âm thanh)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('song_ids', nargs='*', help='Chỉ phân tích các bài hát này')
+        parser.add_argument('--force', action='store_true', help='Phân tích lại cả bài hát đã có kết quả')
+        parser.add_argument('--limit', type=int, default=0, help='Số bài hát tối đa trong lần chạy')
+
+    def handle(self, *args, song_ids=(), force=False, limit=0, **options):
+        if ffmpeg_path() is None:
+            raise CommandError(
+                "Không tìm thấy ffmpeg. Cài ffmpeg (xem README) hoặc đặt AUDIO_ANALYSIS['FFMPEG'] trong settings."
+            )
+        songs = Song.objects.filter(audio_file__isnull=False)
+        if song_ids:
+            invalid = [song_id for song_id in song_ids if not ObjectId.is_valid(song_id)]
+            if invalid:
+                raise CommandError(f"Song ID không hợp lệ: {', '.join(invalid)}")
+            songs = songs.filter(_id__in=[ObjectId(song_id) for song_id in song_ids])
+
+        # Một truy vấn để biết bài nào đã phân tích với đúng file âm thanh hiện tại
+        analyzed = {} if force else dict(SongAnalysis.objects.values_list('song', 'source_url'))
+
+        done = failed = 0
+        for song in songs.order_by('_id').iterator(chunk_size=500):
+            if not song.audio_file or analyzed.get(song._id) == song.audio_file:
+                continue
+            if limit and done + failed >= limit:
+                break
+            try:
+                analysis = analyze_song(song)
+            except (AnalysisError, OSError) as e:
+                failed += 1
+                self.stderr.write(f"{song._id}: {e}")
+                continue
+            done += 1
+            self.stdout.write(f"{song._id}: {analysis.peak_count} peaks, loudness={analysis.loudness}")
+
+        self.stdout.write(self.style.SUCCESS(f"Đã phân tích {done} bài hát, lỗi {failed}"))
@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand, CommandError
+
+from spotify_app.analysis import ffmpeg_path
+from spotify_app.cache import catalog_cache
+from spotify_app.models import Song
+from spotify_app.tempo import tempo_job
+
+
+class Command(BaseCommand):
+    help = "Ước lượng BPM và key cho các bài hát, chạy song song trên nhiều core."
+
+    def add_arguments(self, parser):
+        parser.add_argument('song_ids', nargs='*', help='Chỉ phân tích các bài hát này')
+        parser.add_argument('--force', action='store_true', help='Phân tích lại cả bài hát đã có BPM')
+        parser.add_argument('--limit', type=int, default=0, help='Số bài hát tối đa trong lần chạy')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Số process song song')
+
+    def handle(self, *args, song_ids=(), force=False, limit=0, workers=1, **options):
+        if ffmpeg_path() is None:
+            raise CommandError(
+                "Không tìm thấy ffmpeg. Cài ffmpeg (xem README) hoặc đặt AUDIO_ANALYSIS['FFMPEG'] trong settings."
+            )
+
+        songs = Song.objects.filter(audio_file__isnull=False)
+        if song_ids:
+            invalid = [song_id for song_id in song_ids if not ObjectId.is_valid(song_id)]
+            if invalid:
+                raise CommandError(f"Song ID không hợp lệ: {', '.join(invalid)}")
+            songs = songs.filter(_id__in=[ObjectId(song_id) for song_id in song_ids])
+        if not force:
+            songs = songs.filter(bpm__isnull=True)
+        jobs = songs.order_by('_id').values_list('_id', 'audio_file')
+        if limit:
+            jobs = jobs[:limit]
+
+        done = failed = 0
+        # Process con chỉ giải mã + tính toán; process cha ghi kết quả vào DB.
+        # Giữ tối đa 2 job/worker đang chờ để không nạp hết catalog vào hàng đợi.
+        with ProcessPoolExecutor(max_workers=max(workers, 1)) as executor:
+            pending = set()
+            for song_id, audio_url in jobs.iterator(chunk_size=500):
+                if not audio_url:
+                    continue
+                pending.add(executor.submit(tempo_job, str(song_id), audio_url))
+                if len(pending) >= 2 * workers:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    done, failed = self._save(finished, done, failed)
+            done, failed = self._save(pending, done, failed)
+
+        self.stdout.write(self.style.SUCCESS(f"Đã phân tích {done} bài hát, lỗi {failed}"))
+
+    def _save(self, futures, done, failed):
+        for future in futures:
+            try:
+                song_id, result, error = future.result()
+            except Exception as e:
+                # Process con chết (BrokenProcessPool) hoặc lỗi ngoài dự kiến: tính là lỗi, chạy tiếp
+                failed += 1
+                self.stderr.write(f"Job lỗi: {e!r}")
+                continue
+            if error or result.bpm is None:
+                failed += 1
+                self.stderr.write(f"{song_id}: {error or 'không ước lượng được tempo'}")
+                continue
+            Song.objects.filter(_id=ObjectId(song_id)).update(bpm=result.bpm, musical_key=result.key)
+            # update() không phát post_save
+            catalog_cache.invalidate('song', song_id)
+            done += 1
+            self.stdout.write(f"{song_id}: {result.bpm} BPM, {result.key} (confidence {result.confidence})")
+        return done, failed
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from music_library import smart
+from music_library.models import SmartPlaylist
+
+
+class Command(BaseCommand):
+    help = "Tính lại toàn bộ danh sách bài hát của các smart playlist (sau khi ghi thẳng vào Mongo)."
+
+    def handle(self, *args, **options):
+        count = 0
+        for smart_playlist in SmartPlaylist.objects.all().iterator(chunk_size=500):
+            smart.build(smart_playlist)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Đã tính lại {count} smart playlist"))
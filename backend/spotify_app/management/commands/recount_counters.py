@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from music_library.models import PlaylistSong
+from spotify_app.cache import catalog_cache
+from spotify_app.counters import duration_seconds
+from spotify_app.models import Album, Playlist, Song
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Tính lại track_count/total_tracks và total_duration của playlist và album từ dữ liệu thật."
+
+    def handle(self, *args, **options):
+        # Một lượt đọc bài hát cho cả album lẫn thời lượng trong playlist
+        durations = {}
+        albums = {}
+        for song_id, album_id, duration in Song.objects.values_list('_id', 'album_id', 'duration').iterator(chunk_size=5000):
+            seconds = duration_seconds(duration)
+            durations[song_id] = seconds
+            if album_id is not None:
+                tracks, total = albums.get(album_id, (0, 0))
+                albums[album_id] = (tracks + 1, total + seconds)
+
+        playlists = {}
+        for playlist_id, song_id in PlaylistSong.objects.values_list('playlist', 'song').iterator(chunk_size=5000):
+            tracks, total = playlists.get(playlist_id, (0, 0))
+            playlists[playlist_id] = (tracks + 1, total + durations.get(song_id, 0))
+
+        album_count = self._write(Album, 'total_tracks', albums)
+        playlist_count = self._write(Playlist, 'track_count', playlists)
+        for album_id in Album.objects.values_list('_id', flat=True):
+            catalog_cache.invalidate('album', album_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã cập nhật {album_count} album và {playlist_count} playlist"
+        ))
+
+    def _write(self, model, count_field, totals):
+        """Ghi đè bộ đếm của mọi document (document không có bài nào về 0) bằng bulk_write."""
+        operations = []
+        modified = 0
+        for object_id in model.objects.values_list('_id', flat=True).iterator(chunk_size=5000):
+            tracks, seconds = totals.get(object_id, (0, 0))
+            operations.append(UpdateOne(
+                {'_id': object_id}, {'$set': {count_field: tracks, 'total_duration': seconds}}
+            ))
+            if len(operations) >= BATCH_SIZE:
+                modified += model.objects.mongo_bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            modified += model.objects.mongo_bulk_write(operations, ordered=False).modified_count
+        return modified
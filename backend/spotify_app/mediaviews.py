@@ -0,0 +1,144 @@
+"""
+Stream audio/video của bài hát từ MEDIA_ROOT với HTTP Range.
+
+Trình phát seek trong bài chỉ gửi một request Range nhỏ (206) thay vì tải lại
+từ đầu; file được gửi bằng FileResponse/sendfile (xem backend.mediafiles).
+Media không nằm trong MEDIA_ROOT (Cloudinary) thì redirect sang URL gốc, vốn
+đã hỗ trợ Range.
+
+image_variant: ảnh thu nhỏ của cover/avatar (spotify_app/images.py).
+
+song_hls_playlist/song_hls_segment: cùng audio đó dưới dạng playlist m3u8 và
+các segment MP3 ~6 giây (spotify_app/hls.py) cho client mạng chập chờn.
+
+Đây là các view Django thuần (không qua DRF) để header Accept của thẻ <audio>
+(audio/*) không bị content negotiation trả 406.
+"""
+import logging
+
+from bson import ObjectId
+from django.core import signing
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from backend.mediafiles import ranged_file_response
+from .audio import AudioProbeError, local_media_path
+from .cache import catalog_cache, missing_cache
+from .images import (
+    CONTENT_TYPES, FORMATS, SIZES, ImageVariantError, ensure_variants, read_token, source_key, variant_path,
+)
+from .hls import HLSError, media_version, render_playlist, segment_cache
+from .models import Song
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FIELDS = {'audio': 'audio_file', 'video': 'video_file'}
+PLAYLIST_CACHE_CONTROL = 'public, max-age=300'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def _song_media_url(song_id, field='audio_file'):
+    """URL media của bài hát, ưu tiên bản trong catalog_cache (None nếu không có bài)."""
+    data = catalog_cache.get('song', song_id)
+    if data is not None:
+        return data.get(field) or ''
+    row = Song.objects.filter(_id=ObjectId(song_id)).values(field).first()
+    if row is None:
+        missing_cache.set('song', song_id, True)
+        return None
+    return row[field] or ''
+
+
+def _song_media_or_error(song_id, kind='audio'):
+    """(url, None) hoặc (None, JsonResponse lỗi)."""
+    if not ObjectId.is_valid(song_id):
+        return None, JsonResponse({"error": "Song ID không hợp lệ"}, status=400)
+    if missing_cache.get('song', song_id):
+        return None, JsonResponse({"error": "Không tìm thấy bài hát"}, status=404)
+    url = _song_media_url(song_id, MEDIA_FIELDS[kind])
+    if url is None:
+        return None, JsonResponse({"error": "Không tìm thấy bài hát"}, status=404)
+    if not url:
+        return None, JsonResponse({"error": f"Bài hát không có file {kind}"}, status=404)
+    return url, None
+
+
+@require_http_methods(['GET', 'HEAD'])
+def stream_song(request, song_id, kind='audio'):
+    url, error = _song_media_or_error(song_id, kind)
+    if error:
+        return error
+    path = local_media_path(url)
+    if path is None:
+        logger.debug("Media của bài hát %s không ở local, redirect tới %s", song_id, url)
+        return HttpResponseRedirect(url)
+    return ranged_file_response(request, path)
+
+
+@require_http_methods(['GET', 'HEAD'])
+def song_hls_playlist(request, song_id):
+    url, error = _song_media_or_error(song_id)
+    if error:
+        return error
+    try:
+        version, segments = segment_cache.segments(song_id, url)
+    except HLSError as e:
+        return JsonResponse({"error": str(e)}, status=415)
+    except (AudioProbeError, OSError) as e:
+        logger.warning("Không đọc được audio của bài hát %s: %s", song_id, e)
+        return JsonResponse({"error": "Không đọc được file audio"}, status=502)
+
+    # URL segment tương đối với playlist và gắn version nên cache vĩnh viễn được
+    body = render_playlist(segments, lambda index: f'{version}/{index}.mp3')
+    response = HttpResponse(body, content_type='application/vnd.apple.mpegurl')
+    response['Cache-Control'] = PLAYLIST_CACHE_CONTROL
+    return response
+
+
+@require_http_methods(['GET', 'HEAD'])
+def song_hls_segment(request, song_id, version, index):
+    url, error = _song_media_or_error(song_id)
+    if error:
+        return error
+    if version != media_version(url):
+        # Playlist cũ trỏ tới file nguồn đã bị thay
+        return JsonResponse({"error": "Segment không còn tồn tại, hãy tải lại playlist"}, status=404)
+    for _ in range(2):
+        try:
+            _, path = segment_cache.segment_path(song_id, url, index)
+        except IndexError:
+            return JsonResponse({"error": "Segment không tồn tại"}, status=404)
+        except HLSError as e:
+            return JsonResponse({"error": str(e)}, status=415)
+        except (AudioProbeError, OSError) as e:
+            logger.warning("Không cắt được segment %s của bài hát %s: %s", index, song_id, e)
+            return JsonResponse({"error": "Không đọc được file audio"}, status=502)
+        try:
+            return ranged_file_response(request, path, content_type='audio/mpeg', cache_control=IMMUTABLE_CACHE_CONTROL)
+        except FileNotFoundError:
+            # evict() ở request khác vừa xóa thư mục của bài: cắt lại segment một lần
+            logger.debug("Segment %s của bài hát %s bị xóa trước khi gửi", index, song_id)
+    return JsonResponse({"error": "Segment không tồn tại"}, status=404)
+
+
+@require_http_methods(['GET', 'HEAD'])
+def image_variant(request, token, size, fmt):
+    if size not in SIZES or fmt not in FORMATS:
+        return JsonResponse({"error": "Kích thước hoặc định dạng ảnh không hỗ trợ"}, status=404)
+    try:
+        url, version = read_token(token)
+    except signing.BadSignature:
+        return JsonResponse({"error": "Token ảnh không hợp lệ"}, status=404)
+    try:
+        key = source_key(url)
+        if not key.startswith(version):
+            # Ảnh gốc local đã bị ghi đè sau khi URL variant được phát ra
+            return JsonResponse({"error": "Ảnh đã thay đổi, hãy tải lại dữ liệu"}, status=404)
+        ensure_variants(url, key)
+    except (ImageVariantError, OSError) as e:
+        logger.warning("Không tạo được variant ảnh %s: %s", url, e)
+        return JsonResponse({"error": "Không xử lý được ảnh gốc"}, status=502)
+    return ranged_file_response(
+        request, variant_path(key, size, fmt),
+        content_type=CONTENT_TYPES[fmt], cache_control=IMMUTABLE_CACHE_CONTROL,
+    )
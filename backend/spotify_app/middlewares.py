@@ -6,6 +6,9 @@ import uuid
 from rest_framework.exceptions import AuthenticationFailed
 from .models import User  
 from bson import ObjectId  
+import logging
+
+logger = logging.getLogger(__name__)
 
 class JWTAuthMiddleware:
 
@@ -24,7 +27,7 @@ class JWTAuthMiddleware:
             "email": user.email,
             "role": str(user.role),
         }
-        print("payload:", payload)
+        logger.debug("Issued access token for user %s (role=%s)", payload["_id"], payload["role"])
         
         access_token = jwt.encode(
             payload, 
@@ -91,17 +94,12 @@ class JWTAuthMiddleware:
 
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
             user = User.objects.get(_id=ObjectId(payload["_id"]))  # Sử dụng _id
-            print(f"User authenticated: {user}")  # In thông tin người dùng để kiểm tra
             user.role = payload.get("role")
             request.role = user.role  # Gán role cho request
             request.user = user
             request.auth = payload
             request.user.is_authenticated = True
-            print("request", request)  # In thông tin người dùng
-            print("request.user:", request.user)  # In thông tin người dùng trong request
-            print("request.role:", request.role) 
-            # Debug
-            print(f"Middleware - User role: {user.role}, Type: {type(user.role)}")
+            logger.debug("Authenticated user %s (role=%s) for %s %s", user._id, user.role, request.method, request.path)
 
         except jwt.ExpiredSignatureError:
             return JsonResponse({
@@ -4,7 +4,38 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 from user_management.models import User
 
-class Playlist(models.Model):
+
+class CatalogQuerySet(models.QuerySet):
+    """QuerySet dùng chung cho các model có cờ isHidden."""
+
+    def visible(self):
+        # Đẩy điều kiện isHidden xuống Mongo thay vì lọc trong Python
+        return self.filter(isHidden=False)
+
+
+class CounterFieldsModel(models.Model):
+    """
+    Model có field chỉ được cập nhật bằng $inc (COUNTER_FIELDS). save() của
+    object đã tồn tại bỏ qua các field này để không ghi đè giá trị mới nhất
+    trong DB bằng giá trị cũ đang nằm trong bộ nhớ.
+    """
+    COUNTER_FIELDS = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and self.COUNTER_FIELDS:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class Playlist(CounterFieldsModel):
+    COUNTER_FIELDS = ('track_count', 'total_duration', 'snapshot_id')
+
     _id = models.ObjectIdField(primary_key=True, auto_created=True)
     user_id = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
@@ -12,6 +43,14 @@ class Playlist(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     isfromDB = models.BooleanField(default=True)  
     isHidden = models.BooleanField(default=False)
+    # Bộ đếm denormalized, cập nhật bằng $inc (spotify_app/counters.py)
+    track_count = models.IntegerField(default=0)
+    total_duration = models.IntegerField(default=0)   # Giây
+    # Tăng mỗi lần thêm/xóa/đổi thứ tự bài hát hoặc sửa playlist (spotify_app/snapshots.py)
+    snapshot_id = models.IntegerField(default=0)
+
+    # DjongoManager để cập nhật bộ đếm bằng $inc (mongo_update_many)
+    objects = models.DjongoManager.from_queryset(CatalogQuerySet)()
 
     class Meta:
         db_table = "playlists"
@@ -27,22 +66,31 @@ class Artist(models.Model):
     isfromDB = models.BooleanField(default=True)
     isHidden = models.BooleanField(default=False)
 
+    objects = CatalogQuerySet.as_manager()
+
     class Meta:
         db_table = "artists"
     def __str__(self):
         return self.artist_name
     
-class Album(models.Model):
+class Album(CounterFieldsModel):
+    COUNTER_FIELDS = ('total_tracks', 'total_duration')
+
     _id = models.ObjectIdField(primary_key=True, auto_created=True)
     artist = models.ForeignKey(Artist, on_delete=models.CASCADE)
     album_name = models.CharField(max_length=255)
     artist_name = models.CharField(max_length=255)
     cover_img = models.URLField(blank=True, null=True)
     release_date = models.DateField()
-    total_tracks = models.IntegerField()
+    # Bộ đếm denormalized, cập nhật bằng $inc (spotify_app/counters.py)
+    total_tracks = models.IntegerField(default=0)
+    total_duration = models.IntegerField(default=0)   # Giây
     isfromDB = models.BooleanField(default=True)
     isHidden = models.BooleanField(default=False)
 
+    # DjongoManager để cập nhật bộ đếm bằng $inc (mongo_update_many)
+    objects = models.DjongoManager.from_queryset(CatalogQuerySet)()
+
     class Meta:
         db_table = "albums"
 
@@ -60,6 +108,12 @@ class Song(models.Model):
     isfromDB = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     isHidden = models.BooleanField(default=False)
+    # Điền bởi `manage.py analyze_tempo` (spotify_app/tempo.py)
+    bpm = models.FloatField(blank=True, null=True)  # Index tạo bởi signals.ensure_indexes
+    musical_key = models.CharField(max_length=16, blank=True, null=True)
+
+    # DjongoManager để tạo index/ghi trực tiếp qua pymongo khi cần (mongo_*)
+    objects = models.DjongoManager.from_queryset(CatalogQuerySet)()
 
     class Meta:
         db_table = "songs"
@@ -68,6 +122,24 @@ class Song(models.Model):
         return self.title
 
 
+class SongAnalysis(models.Model):
+    """Kết quả phân tích âm thanh của bài hát (spotify_app/analysis.py)."""
+    _id = models.ObjectIdField(primary_key=True, default=ObjectId, auto_created=True)
+    song = models.OneToOneField(Song, on_delete=models.CASCADE, related_name='analysis')
+    peaks = models.BinaryField()                   # Mảng float16 little-endian
+    peak_count = models.IntegerField()
+    loudness = models.FloatField(blank=True, null=True)  # Integrated loudness (LUFS)
+    peak_db = models.FloatField(blank=True, null=True)   # Sample peak (dBFS)
+    source_url = models.URLField(max_length=500)   # audio_file lúc phân tích, đổi file thì phân tích lại
+    analyzed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "song_analyses"
+
+    def __str__(self):
+        return f"Analysis of {self.song_id}"
+
+
 # Follow model
 class Follow(models.Model):
     """
@@ -1,4 +1,7 @@
 from rest_framework.permissions import BasePermission
+import logging
+
+logger = logging.getLogger(__name__)
 
 class IsAdminUser(BasePermission):
     """
@@ -6,7 +9,7 @@ class IsAdminUser(BasePermission):
     """
 
     def has_permission(self, request, view):
-        print("Request user role:", request.role)
+        logger.debug("Request user role: %s", request.role)
         # Kiểm tra role của người dùng trong cơ sở dữ liệu
         return request.role == "admin"
     
@@ -27,7 +30,7 @@ class IsAuthenticated(BasePermission):
     """
 
     def has_permission(self, request, view):
-        print("request.user.is_authenticated:", request.user.is_authenticated)
+        logger.debug("request.user.is_authenticated: %s", request.user.is_authenticated)
         # Kiểm tra xem người dùng đã đăng nhập chưa
         if request.user.is_authenticated:
             return True
@@ -3,12 +3,23 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from backend.mongo import insert_many_ignore_duplicates, write_error_message
 from .models import Playlist, Song
 from music_library.models import PlaylistSong
+from music_library.ordering import after_position, key_between, keys_after, last_position, position_cursor
 from .serializers import PlaylistSongSerializer
+from .images import image_variants
+from .counters import duration_seconds, inc_playlist
+from .snapshots import changes_since, playlist_etag, record_change, record_changes
 from django.utils.timezone import now
-import traceback
 from backend.utils import SchemaFactory
+import logging
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_BATCH_MAX = 1000
+PLAYLIST_WINDOW_MAX = 500
 
 # Thêm bài hát vào playlist
 @SchemaFactory.post_schema(
@@ -70,17 +81,18 @@ def add_songs_to_playlist(request, playlist_id):
     # Tạo dữ liệu PlaylistSong trước khi khởi tạo serializer
     playlist_song_data = {
         'playlist': playlist_id,
-        'song': song_id
+        'song': song_id,
+        'position': key_between(last_position(playlist_id), None),  # Thêm vào cuối playlist
     }
-    print(f"DEBUG: PlaylistSong data - {playlist_song_data}")
+    logger.debug("PlaylistSong data - %s", playlist_song_data)
     # Khởi tạo serializer với dữ liệu đã chuẩn bị
     serializer = PlaylistSongSerializer(data=playlist_song_data)
 
     # Kiểm tra tính hợp lệ của dữ liệu
     if serializer.is_valid():
         try:
-            print(f"DEBUG: Adding song ID - {song_id} to playlist ID - {playlist_id}")
-            print(f"DEBUG: serializer found - {serializer}")
+            logger.debug("Adding song ID - %s to playlist ID - %s", song_id, playlist_id)
+            logger.debug("serializer found - %s", serializer)
             # Lưu playlist song vào cơ sở dữ liệu
             playlist_song = serializer.save()
             return Response({
@@ -88,12 +100,12 @@ def add_songs_to_playlist(request, playlist_id):
                 "playlist_song": {
                     "playlist_id": str(playlist_song.playlist._id),
                     "song_id": str(playlist_song.song._id),
+                    "position": playlist_song.position,
                     "added_at": playlist_song.added_at
                 }
             }, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            
-            print(f"DEBUG: Error saving serializer: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error saving playlist song")
             return Response({"error": "Error saving playlist song."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     else:
@@ -101,6 +113,110 @@ def add_songs_to_playlist(request, playlist_id):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# Thêm nhiều bài hát vào playlist trong một request
+@SchemaFactory.post_schema(
+    request_example={
+        "song_ids": ["507f1f77bcf86cd799439011", "507f1f77bcf86cd799439013"]
+    },
+    success_response={
+        "message": "Added 1 songs to playlist",
+        "added": [{"song_id": "507f1f77bcf86cd799439011", "added_at": "2023-01-01T00:00:00Z"}],
+        "skipped": ["507f1f77bcf86cd799439013"],
+        "errors": []
+    },
+    error_responses=[
+        {
+            "name": "Thiếu song_ids",
+            "response": {"error": "song_ids must be a non-empty list."},
+            "status_code": 400
+        },
+        {
+            "name": "Không tìm thấy playlist",
+            "response": {"error": "Playlist not found."},
+            "status_code": 404
+        }
+    ],
+    description="Thêm nhiều bài hát vào playlist (ví dụ import playlist). Bài đã có trong playlist "
+                "được bỏ qua (skipped), ID lỗi hoặc không tồn tại được báo theo index.",
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def add_songs_to_playlist_batch(request, playlist_id):
+    song_ids = request.data.get('song_ids') if isinstance(request.data, dict) else None
+    if not isinstance(song_ids, list) or not song_ids:
+        return Response({"error": "song_ids must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(song_ids) > PLAYLIST_BATCH_MAX:
+        return Response(
+            {"error": f"At most {PLAYLIST_BATCH_MAX} songs per request."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not ObjectId.is_valid(playlist_id):
+        return Response({"error": "Invalid playlist ID format."}, status=status.HTTP_400_BAD_REQUEST)
+    playlist_id = ObjectId(playlist_id)
+    if not Playlist.objects.filter(_id=playlist_id).exists():
+        return Response({"error": "Playlist not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    # Giữ thứ tự gửi lên, bỏ ID trùng trong cùng request
+    candidates, errors, seen = [], [], set()
+    for index, song_id in enumerate(song_ids):
+        if not isinstance(song_id, str) or not ObjectId.is_valid(song_id):
+            errors.append({"index": index, "error": "Invalid Song ID format."})
+            continue
+        song_id = ObjectId(song_id)
+        if song_id not in seen:
+            seen.add(song_id)
+            candidates.append((index, song_id))
+
+    # Một truy vấn $in cho bài hát tồn tại, một truy vấn cho bài đã có trong playlist
+    ids = [song_id for _, song_id in candidates]
+    durations = dict(Song.objects.filter(_id__in=ids).values_list('_id', 'duration')) if ids else {}
+    existing = set(
+        PlaylistSong.objects.filter(playlist=playlist_id, song__in=ids).values_list('song', flat=True)
+    ) if ids else set()
+
+    added_at = now()
+    to_insert, skipped = [], []
+    for index, song_id in candidates:
+        if song_id not in durations:
+            errors.append({"index": index, "error": "Song not found."})
+        elif song_id in existing:
+            skipped.append(song_id)
+        else:
+            to_insert.append({'_id': ObjectId(), 'playlist_id': playlist_id, 'song_id': song_id, 'added_at': added_at})
+
+    # Thêm vào cuối playlist theo đúng thứ tự gửi lên
+    for doc, key in zip(to_insert, keys_after(last_position(playlist_id), len(to_insert))):
+        doc['position'] = key
+
+    # insert_many không theo thứ tự: unique index (playlist, song) loại các bài vừa
+    # được request khác thêm vào, các document còn lại vẫn được ghi
+    try:
+        duplicates = insert_many_ignore_duplicates(PlaylistSong.objects, to_insert)
+    except BulkWriteError as bwe:
+        logger.error("Bulk insert of playlist songs failed: %s", bwe.details)
+        return Response(
+            {"error": f"Database save failed: {write_error_message(bwe)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    added = [doc for i, doc in enumerate(to_insert) if i not in duplicates]
+    skipped.extend(to_insert[i]['song_id'] for i in sorted(duplicates))
+    # insert_many không phát post_save nên cập nhật bộ đếm và snapshot của playlist trực tiếp
+    inc_playlist(playlist_id, len(added), sum(duration_seconds(durations[doc['song_id']]) for doc in added))
+    record_changes(playlist_id, [('add', doc['song_id'], doc['position']) for doc in added])
+    errors.sort(key=lambda error: error["index"])
+
+    return Response({
+        "message": f"Added {len(added)} songs to playlist",
+        "added": [
+            {"song_id": str(doc['song_id']), "position": doc['position'], "added_at": doc['added_at']}
+            for doc in added
+        ],
+        "skipped": [str(song_id) for song_id in skipped],
+        "errors": errors
+    }, status=status.HTTP_201_CREATED if added else status.HTTP_200_OK)
+
+
 # Lấy danh sách bài hát trong playlist
 @SchemaFactory.retrieve_schema(
     item_id_param='playlist_id',
@@ -128,7 +244,8 @@ def add_songs_to_playlist(request, playlist_id):
             "status_code": 404
         }
     ],
-    description="Lấy tổng số bài hát trong playlist",
+    description="Lấy bài hát trong playlist theo thứ tự position. "
+                "?limit=N&after=<next_after>: chỉ lấy một đoạn N bài sau cursor (position, _id) của trang trước",
     serializer=PlaylistSongSerializer
 )
 @api_view(['GET'])
@@ -143,23 +260,48 @@ def get_songs_in_playlist(request, playlist_id):
 
         # Check if playlist exists
         playlist = Playlist.objects.get(_id=playlist_obj_id)
-        
-        # Get all songs in playlist
-        playlist_songs = PlaylistSong.objects.filter(playlist=playlist_obj_id).select_related('song')
-        total_songs = playlist_songs.count()
-        
+
+        # Không có thay đổi kể từ lần đọc trước của client: không đọc lại bài hát
+        etag = playlist_etag(playlist._id, playlist.snapshot_id)
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+        # Get all songs in playlist, theo index (playlist, position)
+        playlist_songs = (
+            PlaylistSong.objects.filter(playlist=playlist_obj_id).select_related('song').order_by('position', '_id')
+        )
+
+        # Một đoạn của playlist: range query trên position thay vì offset
+        limit = request.query_params.get('limit')
+        if limit is not None:
+            try:
+                limit = min(max(int(limit), 1), PLAYLIST_WINDOW_MAX)
+            except ValueError:
+                return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            after = request.query_params.get('after')
+            if after:
+                try:
+                    playlist_songs = after_position(playlist_songs, after)
+                except ValueError:
+                    return Response({"error": "Invalid after cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            playlist_songs = list(playlist_songs[:limit])
+
         # Prepare songs data
         songs_data = []
         for ps in playlist_songs:
             song = ps.song
             songs_data.append({
                 "_id": str(song._id),
+                "position": ps.position,
                 "album_id": str(song.album_id_id),
                 "title": song.title,
                 "duration": str(song.duration),
                 "video_file": str(song.video_file) if song.video_file else None,
                 "audio_file": str(song.audio_file) if song.audio_file else None,
                 "img": str(song.img) if song.img else None,
+                "img_variants": image_variants(song.img),
                 "isfromDB": song.isfromDB,
                 "created_at": song.created_at,
                 "isHidden": song.isHidden,
@@ -170,17 +312,165 @@ def get_songs_in_playlist(request, playlist_id):
             "user_id": str(playlist.user_id),
             "playlist_title": playlist.name,
             "image": str(playlist.cover_img),
-            "total_songs": total_songs,
+            "image_variants": image_variants(playlist.cover_img),
+            "total_songs": playlist.track_count,
+            "total_duration": playlist.total_duration,
             "songs": songs_data
         }
+        if limit is not None:
+            last = playlist_songs[-1] if len(playlist_songs) == limit else None
+            response_data["next_after"] = position_cursor(last.position, last._id) if last else None
+        response_data["snapshot_id"] = playlist.snapshot_id
 
-        return Response(response_data, status=status.HTTP_200_OK)
+        response = Response(response_data, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        return response
 
     except Playlist.DoesNotExist:
         return Response({"error": "Playlist not found"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.error("Error: %s", e)
         return Response(
             {"error": "An error occurred while processing your request"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+def _position_of(playlist_id, song_id):
+    return (
+        PlaylistSong.objects.filter(playlist=playlist_id, song=song_id)
+        .values_list('position', flat=True)
+        .first()
+    )
+
+
+# Đổi vị trí một bài hát trong playlist
+@SchemaFactory.post_schema(
+    request_example={
+        "after_song_id": "507f1f77bcf86cd799439013"
+    },
+    success_response={
+        "message": "Song moved",
+        "song_id": "507f1f77bcf86cd799439011",
+        "position": "a0V"
+    },
+    error_responses=[
+        {
+            "name": "Thiếu vị trí đích",
+            "response": {"error": "Provide exactly one of after_song_id, before_song_id or to."},
+            "status_code": 400
+        },
+        {
+            "name": "Bài hát không có trong playlist",
+            "response": {"error": "Song not found in playlist."},
+            "status_code": 404
+        }
+    ],
+    description="Chuyển bài hát tới ngay sau after_song_id, ngay trước before_song_id, "
+                "hoặc to=\"start\"/\"end\". Chỉ position của bài được chuyển bị ghi lại.",
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def move_song_in_playlist(request, playlist_id, song_id):
+    if not ObjectId.is_valid(playlist_id) or not ObjectId.is_valid(song_id):
+        return Response({"error": "Invalid playlist ID or song ID format."}, status=status.HTTP_400_BAD_REQUEST)
+    playlist_id, song_id = ObjectId(playlist_id), ObjectId(song_id)
+
+    after_id = request.data.get('after_song_id')
+    before_id = request.data.get('before_song_id')
+    to = request.data.get('to')
+    if len([value for value in (after_id, before_id, to) if value]) != 1:
+        return Response(
+            {"error": "Provide exactly one of after_song_id, before_song_id or to."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    anchor_id = after_id or before_id
+    if anchor_id and (not ObjectId.is_valid(anchor_id) or ObjectId(anchor_id) == song_id):
+        return Response({"error": "Invalid anchor song ID."}, status=status.HTTP_400_BAD_REQUEST)
+    if to and to not in ('start', 'end'):
+        return Response({"error": "to must be 'start' or 'end'."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Hai khóa kề vị trí đích (bỏ qua chính bài đang chuyển), mỗi khóa một truy vấn trên index
+    others = PlaylistSong.objects.filter(playlist=playlist_id).exclude(song=song_id).exclude(position='')
+    ascending = others.order_by('position').values_list('position', flat=True)
+    descending = others.order_by('-position').values_list('position', flat=True)
+    if to == 'start':
+        low, high = None, ascending.first()
+    elif to == 'end':
+        low, high = descending.first(), None
+    else:
+        anchor = _position_of(playlist_id, ObjectId(anchor_id))
+        if not anchor:
+            return Response({"error": "Anchor song not found in playlist."}, status=status.HTTP_404_NOT_FOUND)
+        if after_id:
+            low, high = anchor, ascending.filter(position__gt=anchor).first()
+        else:
+            low, high = descending.filter(position__lt=anchor).first(), anchor
+
+    position = key_between(low, high)
+    if not PlaylistSong.objects.filter(playlist=playlist_id, song=song_id).update(position=position):
+        return Response({"error": "Song not found in playlist."}, status=status.HTTP_404_NOT_FOUND)
+    snapshot_id = record_change(playlist_id, 'move', song_id, position)
+    return Response({"message": "Song moved", "song_id": str(song_id), "position": position, "snapshot_id": snapshot_id})
+
+
+# Các thay đổi của playlist kể từ một snapshot
+@SchemaFactory.retrieve_schema(
+    item_id_param='playlist_id',
+    success_response={
+        "playlist_id": "507f1f77bcf86cd799439012",
+        "since": 12,
+        "snapshot_id": 14,
+        "changes": [
+            {"version": 13, "op": "add", "song_id": "507f1f77bcf86cd799439011", "position": "a3",
+             "created_at": "2023-01-01T00:00:00Z"},
+            {"version": 14, "op": "move", "song_id": "507f1f77bcf86cd799439011", "position": "a0V",
+             "created_at": "2023-01-01T00:00:05Z"}
+        ]
+    },
+    error_responses=[
+        {
+            "name": "Thiếu since",
+            "response": {"error": "since must be a non-negative integer"},
+            "status_code": 400
+        },
+        {
+            "name": "Snapshot quá cũ",
+            "response": {"error": "Snapshot is too old, reload the playlist", "snapshot_id": 900},
+            "status_code": 410
+        }
+    ],
+    description="Thay đổi của playlist sau snapshot ?since= (op: add, remove, move, update). "
+                "snapshot_id trong kết quả là since cho lần hỏi tiếp theo; 410 nghĩa là cần tải lại toàn bộ playlist.",
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_playlist_changes(request, playlist_id):
+    if not ObjectId.is_valid(playlist_id):
+        return Response({"error": "Invalid playlist ID format"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        since = int(request.query_params.get('since', ''))
+        if since < 0:
+            raise ValueError
+    except ValueError:
+        return Response({"error": "since must be a non-negative integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    playlist_id = ObjectId(playlist_id)
+    current = Playlist.objects.filter(_id=playlist_id).values_list('snapshot_id', flat=True).first()
+    if current is None:
+        return Response({"error": "Playlist not found"}, status=status.HTTP_404_NOT_FOUND)
+    if since > current:
+        return Response({"error": "Unknown snapshot", "snapshot_id": current}, status=status.HTTP_400_BAD_REQUEST)
+
+    changes = changes_since(playlist_id, since, current)
+    if changes is None:
+        return Response(
+            {"error": "Snapshot is too old, reload the playlist", "snapshot_id": current},
+            status=status.HTTP_410_GONE
+        )
+    return Response({
+        "playlist_id": str(playlist_id),
+        "since": since,
+        "snapshot_id": changes[-1]['version'] if changes else since,
+        "changes": changes,
+    })
@@ -5,10 +5,19 @@ from rest_framework import status
 from .serializers import PlaylistSerializer
 from bson import ObjectId
 from bson.errors import InvalidId
+from django.utils.timezone import now
+from pymongo.errors import OperationFailure
 from user_management.models import User
 from spotify_app.models import Playlist
+from music_library.models import PlaylistSong
+from spotify_app.counters import recount_playlist
 from spotify_app.permissionsCustom import IsAdminUser, IsAuthenticated
 from backend.utils import SchemaFactory
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLONE_BATCH_SIZE = 1000
 
 # API để tạo playlist mới
 @SchemaFactory.post_schema(
@@ -51,7 +60,7 @@ from backend.utils import SchemaFactory
 def create_playlist(request):
     # Nhận dữ liệu từ yêu cầu POST
     user_id = request.data.get('user_id')
-    print(f"DEBUG: Received user_id - {user_id}")
+    logger.debug("Received user_id - %s", user_id)
     # Kiểm tra nếu user_id được cung cấp
     if not user_id:
         return Response({"error": "User ID is required."}, status=status.HTTP_400_BAD_REQUEST)
@@ -59,17 +68,17 @@ def create_playlist(request):
     # Chuyển user_id thành ObjectId
     try:
         user_id = ObjectId(user_id)  # Chuyển chuỗi thành ObjectId
-        print(f"DEBUG: Converted user_id to ObjectId - {user_id}")
+        logger.debug("Converted user_id to ObjectId - %s", user_id)
     except Exception as e:
         return Response({"error": f"Invalid user_id format: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
     # Kiểm tra sự tồn tại của người dùng trong cơ sở dữ liệu
     try:
         user = User.objects.get(_id=user_id)
-        print(f"DEBUG: User found - {user}")
+        logger.debug("User found - %s", user)
     except User.DoesNotExist:
         return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
-    print("user_id", user_id)  # In thông tin người dùng để kiểm tra
+    logger.debug("user_id %s", user_id)
     # Thêm user_id vào dữ liệu request trước khi serializer lưu
     request.data['user_id'] = user_id  # Gán user_id đã chuyển thành ObjectId
 
@@ -79,7 +88,7 @@ def create_playlist(request):
     # Kiểm tra tính hợp lệ của dữ liệu
     if serializer.is_valid():
         playlist = serializer.save()  # Lưu playlist vào cơ sở dữ liệu
-        print(f"Playlist created: {playlist}")
+        logger.debug("Playlist created: %s", playlist)
         # Chuyển ObjectId thành chuỗi trước khi trả về
         playlist_data = serializer.data
         playlist_data['user_id'] = str(playlist_data['user_id'])  # Chuyển ObjectId thành string
@@ -197,7 +206,8 @@ def get_alls_playlists_by_user(request, user_id):
                 'description': len(playlists_data),
                 'image': playlist.cover_img,
                 'user_id': str(playlist.user_id),
-                
+                'track_count': playlist.track_count,
+                'total_duration': playlist.total_duration,
             })
 
         return Response({
@@ -289,3 +299,107 @@ def delete_playlist(request, playlist_id):
         return Response({"message": "Playlist deleted successfully"}, status=204)
     except Playlist.DoesNotExist:
         return Response({"error": "Playlist not found"}, status=404)
+
+
+def _copy_playlist_songs(source_id, target_id):
+    """
+    Chép mọi PlaylistSong của source sang target ngay trong MongoDB: một
+    aggregate $match -> $project -> $merge, không đưa dữ liệu về Python.
+    Server không cho $merge vào chính collection đang đọc (MongoDB < 4.4) thì
+    đọc theo lô và ghi bằng insert_many.
+    """
+    # Thời điểm tính ở Python ($$NOW cần MongoDB 4.2)
+    added_at = now()
+    stages = [
+        {'$match': {'playlist_id': source_id}},
+        {'$project': {
+            '_id': 0,
+            'playlist_id': {'$literal': target_id},
+            'song_id': 1,
+            'position': 1,
+            'added_at': {'$literal': added_at},
+        }},
+    ]
+    try:
+        PlaylistSong.objects.mongo_aggregate(stages + [
+            {'$merge': {'into': PlaylistSong._meta.db_table, 'whenMatched': 'fail', 'whenNotMatched': 'insert'}},
+        ])
+        return
+    except OperationFailure as e:
+        logger.info("$merge không dùng được (%s), chép playlist theo lô", e)
+
+    batch = []
+    for document in PlaylistSong.objects.mongo_aggregate(stages):
+        document['_id'] = ObjectId()
+        batch.append(document)
+        if len(batch) >= CLONE_BATCH_SIZE:
+            PlaylistSong.objects.mongo_insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        PlaylistSong.objects.mongo_insert_many(batch, ordered=False)
+
+
+# API sao chép playlist (kể cả playlist của người khác đã lưu vào FavoritePlaylist)
+@SchemaFactory.post_schema(
+    item_id_param='playlist_id',
+    request_example={
+        "user_id": "681328a710b9a4734a894e64",
+        "name": "My copy"
+    },
+    success_response={
+        "message": "Playlist cloned successfully",
+        "playlist": {
+            "_id": "681531042ef7b7aa4f06830e",
+            "name": "My copy",
+            "user_id": "681328a710b9a4734a894e64",
+            "track_count": 1200,
+            "total_duration": 281400
+        }
+    },
+    error_responses=[
+        {
+            "name": "Không tìm thấy",
+            "response": {"error": "Playlist not found."},
+            "status_code": 404
+        }
+    ],
+    description="Sao chép playlist cùng toàn bộ bài hát (giữ nguyên thứ tự) cho user_id. "
+                "Bài hát được chép ngay trong database, không phụ thuộc độ dài playlist.",
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def clone_playlist(request, playlist_id):
+    user_id = request.data.get('user_id')
+    if not ObjectId.is_valid(playlist_id) or not ObjectId.is_valid(user_id):
+        return Response({"error": "Invalid playlist ID or user ID format."}, status=status.HTTP_400_BAD_REQUEST)
+    source = Playlist.objects.filter(_id=ObjectId(playlist_id)).first()
+    if source is None:
+        return Response({"error": "Playlist not found."}, status=status.HTTP_404_NOT_FOUND)
+    user = User.objects.filter(_id=ObjectId(user_id)).first()
+    if user is None:
+        return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    clone = Playlist.objects.create(
+        user_id=user,
+        name=request.data.get('name') or f"{source.name} (copy)",
+        cover_img=source.cover_img,
+    )
+    try:
+        _copy_playlist_songs(source._id, clone._id)
+        # Đếm từ các dòng vừa chép: bộ đếm của source có thể đã lệch
+        clone.track_count, clone.total_duration = recount_playlist(clone._id)
+    except Exception:
+        logger.exception("Lỗi chép bài hát từ playlist %s", source._id)
+        clone.delete()
+        return Response({"error": "Error cloning playlist."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({
+        "message": "Playlist cloned successfully",
+        "playlist": {
+            "_id": str(clone._id),
+            "name": clone.name,
+            "user_id": str(user._id),
+            "track_count": clone.track_count,
+            "total_duration": clone.total_duration,
+        }
+    }, status=status.HTTP_201_CREATED)
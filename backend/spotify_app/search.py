@@ -0,0 +1,430 @@
+"""
+Tìm kiếm full-text trong process cho bài hát, album và nghệ sĩ.
+
+- Chuẩn hóa bỏ dấu tiếng Việt: "son tung" khớp "Sơn Tùng".
+- Inverted index trong bộ nhớ, xếp hạng BM25, không regex scan trên Mongo.
+- Index được build lười ở truy vấn đầu tiên, cập nhật tăng dần qua
+  spotify_app.signals khi bài hát/album/nghệ sĩ được tạo, sửa, ẩn hoặc xóa.
+  Mỗi worker giữ index riêng nên index còn được build lại định kỳ (chạy nền)
+  để nhận các thay đổi từ worker khác.
+- Gợi ý theo tiền tố (autocomplete): top-k tính sẵn cho tiền tố ngắn, bucket
+  đã sắp xếp + bisect cho tiền tố dài, xếp hạng theo độ phổ biến (lượt thích, lượt follow, số playlist chứa bài hát).
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+
+from .models import Song, Album, Artist
+
+TOKEN_RE = re.compile(r'\w+')
+
+KINDS = ('song', 'album', 'artist')
+
+
+def fold(text):
+    """Chữ thường, bỏ dấu (kể cả đ -> d)."""
+    if not text:
+        return ''
+    text = text.lower().replace('đ', 'd')
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(ch for ch in decomposed if unicodedata.category(ch) != 'Mn')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(fold(text))
+
+
+# ---------------------------------------------------------------- documents
+def song_document(song):
+    return 'song', song._id, song.title, {
+        'title': song.title,
+        'img': song.img,
+        'duration': str(song.duration) if song.duration else None,
+        'album_id': str(song.album_id_id) if song.album_id_id else None,
+    }
+
+
+def album_document(album):
+    return 'album', album._id, f'{album.album_name} {album.artist_name}', {
+        'album_name': album.album_name,
+        'artist_name': album.artist_name,
+        'cover_img': album.cover_img,
+    }
+
+
+def artist_document(artist):
+    return 'artist', artist._id, artist.artist_name, {
+        'artist_name': artist.artist_name,
+        'profile_img': artist.profile_img,
+    }
+
+
+DOCUMENT_BUILDERS = {
+    Song: song_document,
+    Album: album_document,
+    Artist: artist_document,
+}
+
+
+def iter_catalog_documents(batch_size=2000):
+    for model, build in DOCUMENT_BUILDERS.items():
+        for obj in model.objects.visible().iterator(chunk_size=batch_size):
+            yield build(obj)
+
+
+def load_popularity():
+    """Độ phổ biến theo (kind, id): đếm trên các collection quan hệ, mỗi loại một truy vấn."""
+    from music_library.models import FavoriteSong, FavoriteAlbum, PlaylistSong
+    from .models import Follow
+
+    popularity = Counter()
+    sources = (
+        ('song', FavoriteSong.objects.values_list('song', flat=True)),
+        ('song', PlaylistSong.objects.values_list('song', flat=True)),
+        ('album', FavoriteAlbum.objects.values_list('album', flat=True)),
+        ('artist', Follow.objects.filter(target_artist__isnull=False).values_list('target_artist', flat=True)),
+    )
+    for kind, ids in sources:
+        for obj_id in ids.iterator(chunk_size=5000):
+            popularity[(kind, str(obj_id))] += 1
+    return popularity
+
+
+# ------------------------------------------------------------------- index
+class InvertedIndex:
+    """Inverted index + BM25. Không thread-safe, CatalogSearch lo phần khóa."""
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self.postings = {}   # term -> {doc_key: tf}
+        self.doc_len = {}    # doc_key -> số token
+        self.payloads = {}   # doc_key -> dữ liệu hiển thị
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, kind, obj_id, text, payload):
+        key = (kind, str(obj_id))
+        self.remove(kind, obj_id)
+        terms = Counter(tokenize(text))
+        if not terms:
+            return
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[key] = tf
+        length = sum(terms.values())
+        self.doc_len[key] = length
+        self.payloads[key] = (text, payload)
+        self.total_len += length
+
+    def remove(self, kind, obj_id):
+        key = (kind, str(obj_id))
+        length = self.doc_len.pop(key, None)
+        if length is None:
+            return
+        text, _ = self.payloads.pop(key)
+        self.total_len -= length
+        for term in set(tokenize(text)):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(key, None)
+                if not docs:
+                    del self.postings[term]
+
+    def search(self, query, kinds=None, limit=20):
+        terms = set(tokenize(query))
+        n_docs = len(self.doc_len)
+        if not terms or not n_docs:
+            return []
+        avg_len = self.total_len / n_docs
+        scores = {}
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for key, tf in docs.items():
+                if kinds and key[0] not in kinds:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[key] / avg_len)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [
+            {'type': kind, '_id': obj_id, 'score': round(score, 4), **self.payloads[(kind, obj_id)][1]}
+            for (kind, obj_id), score in best
+        ]
+
+
+class AutocompleteIndex:
+    """
+    Gợi ý theo tiền tố, xếp hạng theo độ phổ biến.
+
+    Mỗi document sinh một khóa cho mỗi vị trí đầu từ ("son tung", "tung") nên
+    gõ "tung" cũng ra "Sơn Tùng"; khóa bị cắt ở key_chars ký tự nên bộ nhớ tăng
+    tuyến tính theo số từ của tên.
+
+    - Tiền tố ngắn (tối đa short_prefix ký tự, tức các khoảng khớp lớn nhất):
+      bảng top-k theo kind tính sẵn lúc load, cập nhật tăng dần khi thêm/xóa.
+    - Tiền tố dài hơn: khóa được chia bucket theo short_prefix ký tự đầu, mỗi
+      bucket là một mảng nhỏ đã sắp xếp để bisect. Thêm/xóa chỉ dịch một bucket
+      và chỉ xóa kết quả đã nhớ của bucket đó.
+    """
+
+    short_prefix = 3
+    key_chars = 48
+    scan_limit = 2000
+    max_k = 20
+    # Bảng top-k giữ dư: xóa document đứng đầu hiếm khi phải tính lại từ bucket
+    top_depth = 2 * max_k
+
+    def __init__(self, popularity=None):
+        self.buckets = {}       # khóa[:short_prefix] -> [(khóa đã bỏ dấu, kind, id)] đã sắp xếp
+        self.top = {}           # tiền tố ngắn -> {kind: [(kind, id)] phổ biến nhất trước}
+        self.doc_entries = {}   # (kind, id) -> các entry của document
+        self.payloads = {}      # (kind, id) -> (tên hiển thị, payload)
+        self.popularity = popularity or Counter()
+        self._children = {}     # tiền tố ngắn -> các tiền tố dài hơn một ký tự
+        self._memo = {}         # bucket -> {(tiền tố, kinds): kết quả}
+
+    def _keys(self, text):
+        folded = ' '.join(tokenize(text))
+        starts = [0] + [i + 1 for i, char in enumerate(folded) if char == ' ']
+        return {folded[start:start + self.key_chars] for start in starts} if folded else set()
+
+    def _rank(self, doc):
+        return self.popularity[doc], doc
+
+    def _short_prefixes(self, entries):
+        return {key[:n] for key, _, _ in entries for n in range(1, min(len(key), self.short_prefix) + 1)}
+
+    def _link(self, prefixes):
+        for prefix in prefixes:
+            if len(prefix) > 1:
+                self._children.setdefault(prefix[:-1], set()).add(prefix)
+
+    def _entries(self, kind, obj_id, text, payload):
+        doc = (kind, str(obj_id))
+        entries = [(key, kind, doc[1]) for key in self._keys(text)]
+        if entries:
+            self.doc_entries[doc] = entries
+            self.payloads[doc] = (text, payload)
+        return doc, entries
+
+    def _compute_top(self, prefix):
+        """
+        Top-k theo kind của một tiền tố ngắn. Bucket cùng tên chứa các khóa bắt
+        đầu bằng tiền tố (độ dài short_prefix) hoặc đúng bằng tiền tố (ngắn
+        hơn); phần còn lại nằm trong top-k của các tiền tố con trực tiếp, vì
+        document thuộc top-k của cha thì cũng thuộc top-k của con chứa nó.
+        """
+        candidates = {}
+        for _, kind, obj_id in self.buckets.get(prefix, ()):
+            candidates.setdefault(kind, set()).add((kind, obj_id))
+        for child in self._children.get(prefix, ()):
+            for kind, docs in self.top.get(child, {}).items():
+                candidates.setdefault(kind, set()).update(docs)
+        return {kind: heapq.nlargest(self.top_depth, docs, key=self._rank) for kind, docs in candidates.items()}
+
+    def load(self, documents):
+        """Build một lần: gom rồi sort từng bucket, top-k tính từ tiền tố dài tới ngắn."""
+        for kind, obj_id, text, payload in documents:
+            _, entries = self._entries(kind, obj_id, text, payload)
+            for entry in entries:
+                self.buckets.setdefault(entry[0][:self.short_prefix], []).append(entry)
+        for bucket in self.buckets.values():
+            bucket.sort()
+        prefixes = {name[:n] for name in self.buckets for n in range(1, len(name) + 1)}
+        self._link(prefixes)
+        for prefix in sorted(prefixes, key=len, reverse=True):
+            self.top[prefix] = self._compute_top(prefix)
+        self._memo.clear()
+
+    def add(self, kind, obj_id, text, payload):
+        self.remove(kind, obj_id)
+        doc, entries = self._entries(kind, obj_id, text, payload)
+        for entry in entries:
+            name = entry[0][:self.short_prefix]
+            bisect.insort(self.buckets.setdefault(name, []), entry)
+            self._memo.pop(name, None)
+        prefixes = self._short_prefixes(entries)
+        self._link(prefixes)
+        rank = self._rank(doc)
+        for prefix in prefixes:
+            top = self.top.setdefault(prefix, {}).setdefault(kind, [])
+            if len(top) < self.top_depth or rank > self._rank(top[-1]):
+                top.append(doc)
+                top.sort(key=self._rank, reverse=True)
+                del top[self.top_depth:]
+
+    def remove(self, kind, obj_id):
+        doc = (kind, str(obj_id))
+        entries = self.doc_entries.pop(doc, None)
+        if entries is None:
+            return
+        self.payloads.pop(doc, None)
+        for entry in entries:
+            name = entry[0][:self.short_prefix]
+            bucket = self.buckets[name]
+            i = bisect.bisect_left(bucket, entry)
+            if i < len(bucket) and bucket[i] == entry:
+                del bucket[i]
+            if not bucket:
+                del self.buckets[name]
+            self._memo.pop(name, None)
+        # Tiền tố dài trước để top-k của con đã đúng khi tính lại cho cha
+        for prefix in sorted(self._short_prefixes(entries), key=len, reverse=True):
+            top = self.top[prefix][kind]
+            if doc not in top:
+                continue
+            top.remove(doc)
+            if len(top) == self.max_k - 1:
+                # Hết phần dư: có thể còn ứng viên ngoài bảng
+                top[:] = self._compute_top(prefix).get(kind, [])
+
+    def complete(self, prefix, kinds=None, limit=10):
+        prefix = ' '.join(tokenize(prefix))
+        if not prefix:
+            return []
+        limit = min(limit, self.max_k)
+        if len(prefix) <= self.short_prefix:
+            top = self.top.get(prefix, {})
+            best = heapq.nlargest(
+                self.max_k, (doc for kind in (kinds or KINDS) for doc in top.get(kind, ())), key=self._rank
+            )
+        else:
+            best = self._complete_long(prefix, kinds)
+        return [
+            {'type': kind, '_id': obj_id, 'text': self.payloads[(kind, obj_id)][0],
+             'popularity': self.popularity[(kind, obj_id)], **self.payloads[(kind, obj_id)][1]}
+            for kind, obj_id in best[:limit]
+        ]
+
+    def _complete_long(self, prefix, kinds):
+        name = prefix[:self.short_prefix]
+        memo_key = (prefix, tuple(sorted(kinds)) if kinds else None)
+        best = self._memo.get(name, {}).get(memo_key)
+        if best is not None:
+            return best
+        bucket = self.buckets.get(name, [])
+        # Khóa bị cắt ở key_chars ký tự: tiền tố dài hơn thì kiểm lại trên tên đầy đủ
+        key_prefix = prefix[:self.key_chars]
+        lo = bisect.bisect_left(bucket, (key_prefix,))
+        hi = bisect.bisect_left(bucket, (key_prefix + '\uffff',))
+        docs = {(kind, obj_id) for _, kind, obj_id in bucket[lo:hi] if not kinds or kind in kinds}
+        if len(prefix) > self.key_chars:
+            docs = {doc for doc in docs if ' ' + prefix in ' ' + ' '.join(tokenize(self.payloads[doc][0]))}
+        best = heapq.nlargest(self.max_k, docs, key=self._rank)
+        if hi - lo > self.scan_limit:
+            self._memo.setdefault(name, {})[memo_key] = best
+        return best
+
+
+class CatalogSearch:
+    """Giữ index của worker hiện tại: build lười, cập nhật tăng dần, build lại định kỳ."""
+
+    def __init__(self, rebuild_interval=900):
+        self.rebuild_interval = rebuild_interval
+        self._index = None
+        self._completions = None
+        self._built_at = 0.0
+        self._lock = threading.RLock()
+        self._rebuilding = False
+        # Các thay đổi xảy ra trong lúc build lại ở nền, sẽ phát lại lên index mới
+        self._pending = []
+
+    def search(self, query, kinds=None, limit=20):
+        self._ensure_ready()
+        with self._lock:
+            return self._index.search(query, kinds, limit)
+
+    def complete(self, prefix, kinds=None, limit=10):
+        self._ensure_ready()
+        with self._lock:
+            return self._completions.complete(prefix, kinds, limit)
+
+    def upsert(self, instance):
+        build = DOCUMENT_BUILDERS.get(type(instance))
+        if build is None:
+            return
+        kind, obj_id, text, payload = build(instance)
+        if instance.isHidden:
+            self._apply('remove', kind, obj_id)
+        else:
+            self._apply('add', kind, obj_id, text, payload)
+
+    def remove(self, instance):
+        build = DOCUMENT_BUILDERS.get(type(instance))
+        if build is None:
+            return
+        self._apply('remove', build(instance)[0], instance._id)
+
+    def reset(self):
+        with self._lock:
+            self._index = None
+            self._completions = None
+            self._pending = []
+
+    def _apply(self, op, *args):
+        with self._lock:
+            # Chưa build thì thôi, lần build đầu sẽ đọc dữ liệu mới nhất
+            if self._index is None:
+                return
+            getattr(self._index, op)(*args)
+            getattr(self._completions, op)(*args)
+            if self._rebuilding:
+                self._pending.append((op, args))
+
+    def _ensure_ready(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index, self._completions = self._build()
+                    self._built_at = time.monotonic()
+            return
+        if self.rebuild_interval and time.monotonic() - self._built_at > self.rebuild_interval:
+            with self._lock:
+                if self._rebuilding:
+                    return
+                self._rebuilding = True
+                self._pending = []
+            threading.Thread(target=self._rebuild, daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            index, completions = self._build()
+            with self._lock:
+                for op, args in self._pending:
+                    getattr(index, op)(*args)
+                    getattr(completions, op)(*args)
+                self._index, self._completions = index, completions
+        finally:
+            with self._lock:
+                # Lỗi thì giữ index cũ và chờ hết chu kỳ mới thử lại
+                self._built_at = time.monotonic()
+                self._rebuilding = False
+                self._pending = []
+
+    @staticmethod
+    def _build():
+        index = InvertedIndex()
+        documents = []
+        for document in iter_catalog_documents():
+            index.add(*document)
+            documents.append(document)
+        completions = AutocompleteIndex(load_popularity())
+        completions.load(documents)
+        return index, completions
+
+
+_config = getattr(settings, 'SEARCH_INDEX', {})
+
+catalog_search = CatalogSearch(rebuild_interval=_config.get('REBUILD_INTERVAL', 900))
@@ -0,0 +1,102 @@
+import time
+
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework import status
+
+from backend.utils import SchemaFactory
+from .search import catalog_search, KINDS
+
+MAX_LIMIT = 50
+MAX_COMPLETIONS = 20
+
+
+def parse_kinds(request):
+    """Đọc ?type=song,album,artist. Trả về (kinds, lỗi)."""
+    if not request.query_params.get('type'):
+        return None, None
+    kinds = {kind.strip() for kind in request.query_params['type'].split(',') if kind.strip()}
+    if not kinds.issubset(KINDS):
+        return None, f"type không hợp lệ, chỉ chấp nhận: {', '.join(KINDS)}"
+    return kinds, None
+
+
+# Tìm kiếm bài hát, album, nghệ sĩ (không dấu, xếp hạng BM25)
+@SchemaFactory.list_schema(
+    item_example={
+        "type": "artist",
+        "_id": "507f1f77bcf86cd799439011",
+        "score": 3.2145,
+        "artist_name": "Sơn Tùng M-TP",
+        "profile_img": "https://example.com/image.jpg"
+    },
+    search_fields=["q", "type"],
+    description="Tìm kiếm bài hát/album/nghệ sĩ. q: từ khóa (có dấu hoặc không), "
+                "type: song,album,artist (phân tách bằng dấu phẩy), limit: tối đa 50",
+    pagination=False
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search(request):
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({"error": "Thiếu từ khóa tìm kiếm (q)"}, status=status.HTTP_400_BAD_REQUEST)
+
+    kinds, error = parse_kinds(request)
+    if error:
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(int(request.query_params.get('limit', 20)), MAX_LIMIT)
+    except ValueError:
+        return Response({"error": "limit phải là số nguyên"}, status=status.HTTP_400_BAD_REQUEST)
+
+    started = time.perf_counter()
+    results = catalog_search.search(query, kinds=kinds, limit=max(limit, 1))
+    return Response({
+        "query": query,
+        "count": len(results),
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": results
+    })
+
+
+# Gợi ý khi gõ (typeahead), xếp hạng theo độ phổ biến
+@SchemaFactory.list_schema(
+    item_example={
+        "type": "song",
+        "_id": "507f1f77bcf86cd799439011",
+        "text": "Chúng Ta Của Hiện Tại",
+        "popularity": 1520,
+        "title": "Chúng Ta Của Hiện Tại",
+        "img": "https://example.com/image.jpg"
+    },
+    search_fields=["q", "type"],
+    description="Gợi ý theo tiền tố cho ô tìm kiếm. q: phần đã gõ, "
+                "type: song,album,artist, limit: tối đa 20",
+    pagination=False
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def autocomplete(request):
+    prefix = request.query_params.get('q', '')
+    if not prefix.strip():
+        return Response({"query": prefix, "results": []})
+
+    kinds, error = parse_kinds(request)
+    if error:
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), MAX_COMPLETIONS)
+    except ValueError:
+        return Response({"error": "limit phải là số nguyên"}, status=status.HTTP_400_BAD_REQUEST)
+
+    started = time.perf_counter()
+    results = catalog_search.complete(prefix, kinds=kinds, limit=max(limit, 1))
+    return Response({
+        "query": prefix,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": results
+    })
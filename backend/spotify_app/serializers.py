@@ -2,11 +2,18 @@ from rest_framework import serializers
 from .models import Song, Album, Artist, Playlist, Follow
 from music_library.models import PlaylistSong
 from bson import ObjectId
+from .images import ImageVariantsField
+import logging
+
+logger = logging.getLogger(__name__)
 
 class PlaylistSerializer(serializers.ModelSerializer):
+    cover_img_variants = ImageVariantsField(source='cover_img')
+
     class Meta:
         model = Playlist
         fields = '__all__'
+        read_only_fields = ('track_count', 'total_duration', 'snapshot_id')
 
 class PlaylistCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,82 +24,81 @@ class AlbumSerializer(serializers.ModelSerializer):
     artist = serializers.CharField()  # Nhận chuỗi ObjectId
     release_date = serializers.DateField(format='%Y-%m-%d', input_formats=['%Y-%m-%d'])
     cover_img = serializers.URLField(allow_blank=True, allow_null=True)
+    cover_img_variants = ImageVariantsField(source='cover_img')
 
     class Meta:
         model = Album
         fields = ['_id', 'artist', 'album_name', 'artist_name', 'release_date', 
-                 'total_tracks', 'isfromDB', 'isHidden', 'cover_img']
-        read_only_fields = ['_id', 'artist_name']
+                 'total_tracks', 'total_duration', 'isfromDB', 'isHidden', 'cover_img', 'cover_img_variants']
+        read_only_fields = ['_id', 'artist_name', 'total_tracks', 'total_duration']
 
     def validate_artist(self, value):
-        print(f"DEBUG: Validating artist: {value}, type: {type(value)}")
+        logger.debug("Validating artist: %s, type: %s", value, type(value))
         if not isinstance(value, str):
             raise serializers.ValidationError("Artist ID must be a string.")
         try:
             artist = Artist.objects.get(_id=ObjectId(value))
             return artist
         except Artist.DoesNotExist:
-            print(f"DEBUG: Artist with ID {value} not found")
+            logger.debug("Artist with ID %s not found", value)
             raise serializers.ValidationError("Invalid or non-existent artist ID.")
         except ValueError:
-            print(f"DEBUG: Invalid ObjectId format for artist ID: {value}")
+            logger.debug("Invalid ObjectId format for artist ID: %s", value)
             raise serializers.ValidationError("Artist ID must be a valid ObjectId.")
 
     def validate_release_date(self, value):
-        print(f"DEBUG: Validating release_date: {value}, type: {type(value)}")
-        return value
-
-    def validate_total_tracks(self, value):
-        print(f"DEBUG: Validating total_tracks: {value}, type: {type(value)}")
-        if value < 0:
-            raise serializers.ValidationError("Total tracks cannot be negative.")
+        logger.debug("Validating release_date: %s, type: %s", value, type(value))
         return value
 
     def create(self, validated_data):
         artist = validated_data['artist']
         validated_data['artist_name'] = artist.artist_name
-        print(f"DEBUG: Creating album with validated_data: {validated_data}")
+        logger.debug("Creating album with validated_data: %s", validated_data)
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
         artist = validated_data.get('artist', instance.artist)
         validated_data['artist_name'] = artist.artist_name
-        print(f"DEBUG: Updating album with validated_data: {validated_data}")
+        logger.debug("Updating album with validated_data: %s", validated_data)
         return super().update(instance, validated_data)
 
+def validate_cloudinary_audio_url(value):
+    if not value:
+        raise serializers.ValidationError("URL file âm thanh là bắt buộc")
+    if not value.startswith("https://res.cloudinary.com/"):
+        raise serializers.ValidationError("URL âm thanh phải từ Cloudinary")
+    return value
+
+
 class SongSerializer(serializers.ModelSerializer):
     album = AlbumSerializer(read_only=True, source='album_id')
     album_id = serializers.CharField(write_only=True, required=False, allow_null=True, allow_blank=True)
     audio_file = serializers.URLField(required=True)  # Bắt buộc, phải là URL
     video_file = serializers.URLField(required=False, allow_blank=True, allow_null=True)
     duration = serializers.TimeField(required=False, allow_null=True)  # Tùy chọn
+    img_variants = ImageVariantsField(source='img')
 
     class Meta:
         model = Song
         fields = '__all__'
+        read_only_fields = ('bpm', 'musical_key')
 
     def validate_audio_file(self, value):
-        if not value:
-            raise serializers.ValidationError("URL file âm thanh là bắt buộc")
-        if not value.startswith("https://res.cloudinary.com/"):
-            raise serializers.ValidationError("URL âm thanh phải từ Cloudinary")
-        return value
+        return validate_cloudinary_audio_url(value)
 
     def validate_album_id(self, value):
-        print(f"DEBUG: Validating album_id: {value}")
+        logger.debug("Validating album_id: %s", value)
         if value:
             try:
                 object_id = ObjectId(value)
                 album = Album.objects.get(_id=object_id)
-                print(f"DEBUG: Found album: {album}, album_name: {album.album_name}")
+                logger.debug("Found album: %s, album_name: %s", album, album.album_name)
                 return value
             except Album.DoesNotExist:
-                print(f"DEBUG: Album with ID {value} not found")
-                all_albums = Album.objects.all()
-                print(f"DEBUG: All albums: {[str(album._id) for album in all_albums]}")
+                logger.debug("Album with ID %s not found", value)
                 raise serializers.ValidationError(f"Album with ID {value} does not exist")
             except ValueError:
-                print(f"DEBUG: Invalid ObjectId format for album_id: {value}")
+                logger.debug("Invalid ObjectId format for album_id: %s", value)
                 raise serializers.ValidationError("album_id must be a valid ObjectId")
         return value
 
@@ -105,11 +111,11 @@ class SongSerializer(serializers.ModelSerializer):
                 album = Album.objects.get(_id=ObjectId(album_id))
                 validated_data['album_id'] = album
             except (Album.DoesNotExist, ValueError):
-                print(f"DEBUG: Invalid or non-existent album_id: {album_id}")
+                logger.debug("Invalid or non-existent album_id: %s", album_id)
                 validated_data['album_id'] = None
         else:
             validated_data['album_id'] = None
-        print(f"DEBUG: Creating song with validated_data: {log_data}")
+        logger.debug("Creating song with validated_data: %s", log_data)
         return Song.objects.create(**validated_data)
 
     def update(self, instance, validated_data):
@@ -119,19 +125,43 @@ class SongSerializer(serializers.ModelSerializer):
                 album = Album.objects.get(_id=ObjectId(album_id))
                 validated_data['album_id'] = album
             except (Album.DoesNotExist, ValueError):
-                print(f"DEBUG: Invalid or non-existent album_id: {album_id}")
+                logger.debug("Invalid or non-existent album_id: %s", album_id)
                 validated_data['album_id'] = instance.album_id
         else:
             validated_data['album_id'] = instance.album_id
-        print(f"DEBUG: Updating song with validated_data: {validated_data}")
+        logger.debug("Updating song with validated_data: %s", validated_data)
         return super().update(instance, validated_data)
 
+# Dùng cho upload hàng loạt: chỉ kiểm tra định dạng, album được resolve
+# một lần cho cả lô ở view (không truy vấn theo từng dòng như SongSerializer)
+class SongBulkItemSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=255)
+    audio_file = serializers.URLField(max_length=500)
+    video_file = serializers.URLField(max_length=500, required=False, allow_blank=True, allow_null=True)
+    img = serializers.URLField(required=False, allow_blank=True, allow_null=True)
+    duration = serializers.TimeField(required=False, allow_null=True)
+    album_id = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    isHidden = serializers.BooleanField(required=False, default=False)
+
+    def validate_audio_file(self, value):
+        return validate_cloudinary_audio_url(value)
+
+    def validate_album_id(self, value):
+        if not value:
+            return None
+        if not ObjectId.is_valid(value):
+            raise serializers.ValidationError("album_id must be a valid ObjectId")
+        return ObjectId(value)
+
+
 class PlaylistSongSerializer(serializers.ModelSerializer):
     class Meta:
         model = PlaylistSong
         fields = '__all__'
 
 class ArtistSerializer(serializers.ModelSerializer):
+    profile_img_variants = ImageVariantsField(source='profile_img')
+
     class Meta:
         model = Artist
         fields = '__all__'
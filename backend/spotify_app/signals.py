@@ -0,0 +1,241 @@
+import threading
+
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from music_library import smart
+from music_library.models import ArtistPerform, FavoriteSong, PlaylistChange, PlaylistSong
+from .cache import catalog_cache, missing_cache, liked_songs, album_song_key
+from .counters import duration_seconds, inc_album, inc_each_playlist, inc_playlist, inc_playlists
+from .models import Song, Album, Artist, Follow, Playlist
+from .search import catalog_search
+from .snapshots import record_change, record_changes_many
+
+
+# Mọi thay đổi qua save()/delete() (update_song, hide_song, update_album,
+# hide_artist, ...) đều xóa entry tương ứng trong catalog cache
+@receiver([post_save, post_delete], sender=Song)
+def invalidate_song_cache(sender, instance, **kwargs):
+    catalog_cache.invalidate('song', instance._id)
+
+
+# Cache âm: bài hát vừa lưu thì không còn "không tồn tại", vừa xóa thì nhớ là
+# không tồn tại để các request lặp lại id đó trả 404 ngay
+@receiver(post_save, sender=Song)
+def forget_missing_song(sender, instance, **kwargs):
+    missing_cache.invalidate('song', instance._id)
+    missing_cache.invalidate('album_song', album_song_key(instance.album_id_id, instance._id))
+
+
+@receiver(post_delete, sender=Song)
+def remember_deleted_song(sender, instance, **kwargs):
+    missing_cache.set('song', instance._id, True)
+
+
+# Tập bài hát đã thích của user (create_favorite_songs, delete_favorite_song,
+# xóa dây chuyền khi xóa bài hát/user)
+@receiver(post_save, sender=FavoriteSong)
+def add_liked_song(sender, instance, created, **kwargs):
+    if created:
+        liked_songs.add(instance.user_id, instance.song_id)
+
+
+@receiver(post_delete, sender=FavoriteSong)
+def remove_liked_song(sender, instance, **kwargs):
+    liked_songs.remove(instance.user_id, instance.song_id)
+
+
+@receiver([post_save, post_delete], sender=Album)
+def invalidate_album_cache(sender, instance, **kwargs):
+    # Bài hát nhúng dữ liệu album nên cũng bị xóa theo
+    catalog_cache.invalidate('album', instance._id)
+
+
+@receiver([post_save, post_delete], sender=Artist)
+def invalidate_artist_cache(sender, instance, **kwargs):
+    catalog_cache.invalidate('artist', instance._id)
+
+
+# Cập nhật tăng dần index tìm kiếm (ẩn = xóa khỏi index)
+@receiver(post_save, sender=Song)
+@receiver(post_save, sender=Album)
+@receiver(post_save, sender=Artist)
+def update_search_index(sender, instance, **kwargs):
+    catalog_search.upsert(instance)
+
+
+@receiver(post_delete, sender=Song)
+@receiver(post_delete, sender=Album)
+@receiver(post_delete, sender=Artist)
+def remove_from_search_index(sender, instance, **kwargs):
+    catalog_search.remove(instance)
+
+
+# Bộ đếm track/thời lượng của album và playlist (spotify_app/counters.py).
+# Nhớ album và thời lượng lúc nạp để post_save biết cần $inc bao nhiêu; đọc
+# thẳng __dict__ để không kích hoạt truy vấn khi field bị defer (.only()).
+@receiver(post_init, sender=Song)
+def remember_song_counters(sender, instance, **kwargs):
+    values = instance.__dict__
+    if 'album_id_id' in values and 'duration' in values:
+        instance._counted = (values['album_id_id'], duration_seconds(values['duration']))
+
+
+@receiver(post_save, sender=Song)
+def update_song_counters(sender, instance, created, **kwargs):
+    album_id, seconds = instance.album_id_id, duration_seconds(instance.duration)
+    if created:
+        inc_album(album_id, 1, seconds)
+    elif hasattr(instance, '_counted'):
+        old_album_id, old_seconds = instance._counted
+        if old_album_id != album_id:
+            inc_album(old_album_id, -1, -old_seconds)
+            inc_album(album_id, 1, seconds)
+        elif old_seconds != seconds:
+            inc_album(album_id, 0, seconds - old_seconds)
+        if old_seconds != seconds:
+            playlist_ids = list(PlaylistSong.objects.filter(song=instance._id).values_list('playlist', flat=True))
+            inc_playlists(playlist_ids, 0, seconds - old_seconds)
+    instance._counted = (album_id, seconds)
+
+
+@receiver(post_delete, sender=Song)
+def decrement_album_counters(sender, instance, **kwargs):
+    # Playlist được trừ ở flush_removed_playlist_songs
+    inc_album(instance.album_id_id, -1, -duration_seconds(instance.duration))
+
+
+# Xóa dây chuyền: Collector gửi pre_delete cho mọi đối tượng trước, rồi xóa các
+# PlaylistSong trước Song/Playlist cha của chúng. Cha được đánh dấu ở pre_delete
+# để post_delete của từng PlaylistSong không tốn vài lệnh ghi mỗi dòng: playlist
+# đang bị xóa thì bỏ qua bộ đếm và nhật ký, bài hát đang bị xóa thì gom theo
+# playlist rồi ghi một lần ở post_delete của Song.
+_cascade = threading.local()
+
+
+def _cascade_state():
+    if not hasattr(_cascade, 'playlists'):
+        _cascade.playlists = set()  # id playlist đang bị xóa
+        _cascade.songs = {}         # id bài hát đang bị xóa -> số giây
+        _cascade.removed = {}       # playlist_id -> [song_id] chờ ghi
+    return _cascade
+
+
+@receiver(pre_delete, sender=Playlist)
+def mark_deleted_playlist(sender, instance, **kwargs):
+    _cascade_state().playlists.add(instance._id)
+
+
+@receiver(pre_delete, sender=Song)
+def mark_deleted_song(sender, instance, **kwargs):
+    _cascade_state().songs[instance._id] = duration_seconds(instance.duration)
+
+
+def _removed_by_cascade(instance):
+    """True nếu dòng PlaylistSong bị xóa theo playlist/bài hát cha (đã được xử lý gộp)."""
+    state = _cascade_state()
+    return instance.playlist_id in state.playlists or instance.song_id in state.songs
+
+
+@receiver(post_delete, sender=Song)
+def flush_removed_playlist_songs(sender, instance, **kwargs):
+    # Mọi PlaylistSong đã bị xóa trước Song đầu tiên, nên lần gọi đầu ghi hết
+    state = _cascade_state()
+    removed, state.removed = state.removed, {}
+    if removed:
+        inc_each_playlist({
+            playlist_id: (-len(song_ids), -sum(state.songs.get(song_id, 0) for song_id in song_ids))
+            for playlist_id, song_ids in removed.items()
+        })
+        record_changes_many({
+            playlist_id: [('remove', song_id, None) for song_id in song_ids]
+            for playlist_id, song_ids in removed.items()
+        })
+    state.songs.pop(instance._id, None)
+
+
+@receiver(post_save, sender=PlaylistSong)
+def increment_playlist_counters(sender, instance, created, **kwargs):
+    if created:
+        inc_playlist(instance.playlist_id, 1, duration_seconds(instance.song.duration))
+
+
+@receiver(post_delete, sender=PlaylistSong)
+def decrement_playlist_counters(sender, instance, **kwargs):
+    state = _cascade_state()
+    if instance.playlist_id in state.playlists:
+        return
+    if instance.song_id in state.songs:
+        state.removed.setdefault(instance.playlist_id, []).append(instance.song_id)
+        return
+    duration = Song.objects.filter(_id=instance.song_id).values_list('duration', flat=True).first()
+    inc_playlist(instance.playlist_id, -1, -duration_seconds(duration))
+
+
+# Snapshot playlist (spotify_app/snapshots.py): mỗi thay đổi qua ORM tăng snapshot_id
+@receiver(post_save, sender=PlaylistSong)
+def record_playlist_song_added(sender, instance, created, **kwargs):
+    if created:
+        record_change(instance.playlist_id, 'add', instance.song_id, instance.position)
+
+
+@receiver(post_delete, sender=PlaylistSong)
+def record_playlist_song_removed(sender, instance, **kwargs):
+    if not _removed_by_cascade(instance):
+        record_change(instance.playlist_id, 'remove', instance.song_id)
+
+
+@receiver(post_save, sender=Playlist)
+def record_playlist_updated(sender, instance, created, **kwargs):
+    if not created:
+        record_change(instance._id, 'update')
+
+
+@receiver(post_delete, sender=Playlist)
+def drop_playlist_changes(sender, instance, **kwargs):
+    _cascade_state().playlists.discard(instance._id)
+    PlaylistChange.objects.mongo_delete_many({'playlist_id': instance._id})
+
+
+# Smart playlist (music_library/smart.py): cập nhật tăng dần danh sách đã tính sẵn
+@receiver(post_save, sender=FavoriteSong)
+def smart_playlist_favorite_added(sender, instance, created, **kwargs):
+    if created:
+        smart.favorite_added(instance.user_id, instance.song_id, instance.added_at)
+
+
+@receiver(post_delete, sender=FavoriteSong)
+def smart_playlist_favorite_removed(sender, instance, **kwargs):
+    smart.favorite_removed(instance.user_id, instance.song_id)
+
+
+@receiver(post_save, sender=Follow)
+def smart_playlist_follow_added(sender, instance, created, **kwargs):
+    if created and instance.target_artist_id is not None:
+        smart.follow_added(instance.follower_id, instance.target_artist_id)
+
+
+@receiver(post_delete, sender=Follow)
+def smart_playlist_follow_removed(sender, instance, **kwargs):
+    if instance.target_artist_id is not None:
+        smart.follow_removed(instance.follower_id, instance.target_artist_id)
+
+
+@receiver(post_save, sender=ArtistPerform)
+def smart_playlist_performance_added(sender, instance, created, **kwargs):
+    if created:
+        smart.performances_added([(instance.artist_id, instance.song_id)])
+
+
+@receiver(post_delete, sender=ArtistPerform)
+def smart_playlist_performance_removed(sender, instance, **kwargs):
+    smart.performances_removed([(instance.artist_id, instance.song_id)])
+
+
+# spotify_app không có migration nên db_index trên model không tạo index nào;
+# AppConfig.ready nối hàm này vào post_migrate (run_app.py luôn chạy migrate).
+# create_index không làm gì nếu index đã có.
+def ensure_indexes(sender, **kwargs):
+    Song.objects.mongo_create_index('bpm')
+    # Smart playlist recent_releases (music_library/smart.py)
+    Song.objects.mongo_create_index([('created_at', 1), ('_id', 1)])
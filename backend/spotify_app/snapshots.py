@@ -0,0 +1,104 @@
+"""
+Snapshot của playlist: Playlist.snapshot_id tăng ở mỗi lần thêm, xóa, đổi thứ
+tự bài hát hoặc sửa thông tin playlist, kèm nhật ký PlaylistChange.
+
+- record_changes() tăng snapshot_id bằng một lệnh $inc nguyên tử (nhiều thay
+  đổi trong một request chiếm một dải version liên tiếp) rồi ghi nhật ký bằng
+  insert_many; chỉ giữ CHANGE_LOG_MAX thay đổi gần nhất mỗi playlist.
+  record_changes_many() làm việc đó cho nhiều playlist cùng lúc (xóa bài hát
+  khỏi mọi playlist chứa nó).
+- get_songs_in_playlist trả ETag theo snapshot_id: client gửi If-None-Match
+  và nhận 304 mà không phải đọc/serialize lại các bài hát.
+- get_playlist_changes trả các thay đổi sau một snapshot; snapshot đã cũ hơn
+  phần nhật ký còn giữ thì trả 410 để client tải lại toàn bộ.
+"""
+from bson import ObjectId
+from django.utils.timezone import now
+from pymongo import ReturnDocument
+
+from music_library.models import PlaylistChange
+from .models import Playlist
+
+CHANGE_LOG_MAX = 500
+
+
+def playlist_etag(playlist_id, snapshot_id):
+    # ETag yếu: nội dung bài hát (tên, ảnh...) có thể đổi mà snapshot không đổi
+    return f'W/"{playlist_id}:{snapshot_id}"'
+
+
+def record_changes_many(changes_by_playlist):
+    """
+    {playlist_id: danh sách (op, song_id, position)} -> {playlist_id: snapshot_id
+    mới}, bỏ qua playlist không còn tồn tại. Mỗi playlist cần một $inc nguyên tử
+    riêng để biết dải version của mình; nhật ký của mọi playlist được ghi bằng
+    một insert_many và cắt bớt bằng một delete_many.
+    """
+    versions, documents, expired = {}, [], []
+    created_at = now()
+    for playlist_id, changes in changes_by_playlist.items():
+        if not changes:
+            continue
+        playlist_id = ObjectId(playlist_id)
+        document = Playlist.objects.mongo_find_one_and_update(
+            {'_id': playlist_id},
+            {'$inc': {'snapshot_id': len(changes)}},
+            projection={'snapshot_id': True},
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            continue
+        version = versions[playlist_id] = document['snapshot_id']
+        first = version - len(changes) + 1
+        documents.extend(
+            {
+                '_id': ObjectId(),
+                'playlist_id': playlist_id,
+                'version': first + offset,
+                'op': op,
+                'song_id': str(song_id) if song_id else None,
+                'position': position or '',
+                'created_at': created_at,
+            }
+            for offset, (op, song_id, position) in enumerate(changes)
+        )
+        if version > CHANGE_LOG_MAX:
+            expired.append({'playlist_id': playlist_id, 'version': {'$lte': version - CHANGE_LOG_MAX}})
+    if documents:
+        PlaylistChange.objects.mongo_insert_many(documents, ordered=False)
+    if expired:
+        PlaylistChange.objects.mongo_delete_many({'$or': expired})
+    return versions
+
+
+def record_changes(playlist_id, changes):
+    """
+    changes: danh sách (op, song_id, position). Trả về snapshot_id mới, hoặc
+    None nếu playlist không còn tồn tại.
+    """
+    if not changes:
+        return None
+    return record_changes_many({playlist_id: changes}).get(ObjectId(playlist_id))
+
+
+def record_change(playlist_id, op, song_id=None, position=None):
+    return record_changes(playlist_id, [(op, song_id, position)])
+
+
+def changes_since(playlist_id, since, current):
+    """
+    Các thay đổi liên tiếp sau `since` (tối đa tới `current`), hoặc None nếu
+    nhật ký đã bị cắt qua khỏi `since`. Request song song có thể ghi nhật ký
+    lệch thứ tự nên chỉ trả phần liên tục, phần còn lại client hỏi lại sau.
+    """
+    if since < current - CHANGE_LOG_MAX:
+        return None
+    rows = PlaylistChange.objects.filter(
+        playlist=playlist_id, version__gt=since, version__lte=current
+    ).order_by('version').values('version', 'op', 'song_id', 'position', 'created_at')
+    changes = []
+    for row in rows:
+        if row['version'] != since + len(changes) + 1:
+            break
+        changes.append(row)
+    return changes
@@ -1,15 +1,32 @@
 from rest_framework.decorators import api_view, parser_classes, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Song, Album, Playlist
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.utils.urls import replace_query_param
+from .models import Song, Album, Playlist, SongAnalysis
 from music_library.models import PlaylistSong
-from .serializers import SongSerializer
-from mutagen.mp3 import MP3
+from music_library.ordering import after_position, position_cursor
+from .serializers import SongSerializer, SongBulkItemSerializer
+from .cache import catalog_cache, missing_cache, album_song_key
+from .search import catalog_search
+from .counters import duration_seconds, inc_album
+from backend.parsers import NDJSONParser, InvalidLine
+from .audio import probe_upload, schedule_song_metadata
+from .analysis import downsample_peaks
+import numpy as np
 from bson import ObjectId
 import datetime
-from io import BytesIO
 from backend.utils import SchemaFactory
+from backend.pagination import ObjectIdCursorPagination
+from backend.streaming import StreamingJSONResponse, wants_stream, wants_ndjson
+from rest_framework.exceptions import NotFound
+import logging
+
+logger = logging.getLogger(__name__)
 
 def format_duration(seconds):
     if seconds:
@@ -20,11 +37,10 @@ def get_audio_duration(audio_file):
     if not audio_file:
         return None
     try:
-        file_stream = BytesIO(audio_file.read())  # Convert to in-memory stream
-        audio = MP3(file_stream)  # Load MP3 without saving
-        return round(audio.info.length)  # Return duration in seconds
+        # Chỉ đọc header, không nạp cả file vào bộ nhớ
+        return round(probe_upload(audio_file).duration)
     except Exception as e:
-        print(f"DEBUG: Lỗi lấy độ dài âm thanh: {str(e)}")
+        logger.warning("Lỗi lấy độ dài âm thanh: %s", e)
         return None
 
 # 1. Upload Song API
@@ -63,8 +79,8 @@ def get_audio_duration(audio_file):
 @permission_classes([AllowAny])
 @parser_classes([MultiPartParser, FormParser])
 def upload_song(request):
-    print(f"DEBUG: Nhận dữ liệu yêu cầu - {request.data}")
-    print(f"DEBUG: Nhận file - {request.FILES}")
+    logger.debug("Nhận dữ liệu yêu cầu - %s", request.data)
+    logger.debug("Nhận file - %s", request.FILES)
 
     song_data = {
         'title': request.data.get('title'),
@@ -78,16 +94,159 @@ def upload_song(request):
     if not song_data['audio_file']:
         return Response({"error": "Không nhận được URL file âm thanh"}, status=400)
 
-    print(f"DEBUG: Dữ liệu bài hát = {song_data}")
+    logger.debug("Dữ liệu bài hát = %s", song_data)
     serializer = SongSerializer(data=song_data, context={'request': request})
     if serializer.is_valid():
         song = serializer.save()
-        print(f"DEBUG: Đã tải bài hát, _id = {song._id}")
+        logger.debug("Đã tải bài hát, _id = %s", song._id)
+        if not request.data.get('duration'):
+            # Đọc thời lượng từ header file âm thanh ở nền rồi ghi lại vào bài hát
+            schedule_song_metadata(song._id, song.audio_file)
         return Response({"message": "Tải bài hát thành công!", "data": serializer.data}, status=201)
     
-    print(f"DEBUG: Lỗi xác thực - {serializer.errors}")
+    logger.debug("Lỗi xác thực - %s", serializer.errors)
     return Response({"error": "Dữ liệu không hợp lệ", "details": serializer.errors}, status=400)
 
+# 1b. Bulk Upload Songs API
+BULK_UPLOAD_MAX_ROWS = 10000
+BULK_BATCH_SIZE = 500
+
+
+@SchemaFactory.post_schema(
+    item_id_param=None,
+    request_example=[
+        {
+            "title": "Bài hát 1",
+            "audio_file": "https://res.cloudinary.com/demo/video/upload/song1.mp3",
+            "img": "https://example.com/image.jpg",
+            "duration": "00:03:45",
+            "album_id": "507f1f77bcf86cd799439011"
+        },
+        {
+            "title": "Bài hát 2",
+            "audio_file": "https://res.cloudinary.com/demo/video/upload/song2.mp3"
+        }
+    ],
+    success_response={
+        "message": "Đã tạo 1/2 bài hát",
+        "created": 1,
+        "failed": 1,
+        "results": [{"index": 0, "_id": "507f1f77bcf86cd799439012"}],
+        "errors": [{"index": 1, "errors": {"audio_file": ["URL âm thanh phải từ Cloudinary"]}}]
+    },
+    error_responses=[
+        {
+            "name": "Dữ liệu rỗng",
+            "response": {"error": "Cần một mảng JSON hoặc NDJSON các bài hát"},
+            "status_code": 400
+        }
+    ],
+    description="Tải lên hàng loạt bài hát (mảng JSON hoặc application/x-ndjson, tối đa 10000 dòng). "
+                "Dòng lỗi được báo theo index, không làm hủy các dòng hợp lệ. "
+                "Trả về 201 nếu tất cả thành công, 207 nếu một phần thất bại."
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@parser_classes([JSONParser, NDJSONParser])
+def bulk_upload_songs(request):
+    rows = request.data
+    if isinstance(rows, dict):
+        rows = rows.get('songs')
+    if not isinstance(rows, list) or not rows:
+        return Response({"error": "Cần một mảng JSON hoặc NDJSON các bài hát"}, status=400)
+    if len(rows) > BULK_UPLOAD_MAX_ROWS:
+        return Response({"error": f"Tối đa {BULK_UPLOAD_MAX_ROWS} bài hát mỗi request"}, status=400)
+
+    errors = []
+    valid = []
+
+    # 1. Validate theo lô, chỉ kiểm tra định dạng, không truy vấn DB theo từng dòng
+    validator = SongBulkItemSerializer()
+    for start in range(0, len(rows), BULK_BATCH_SIZE):
+        for index, row in enumerate(rows[start:start + BULK_BATCH_SIZE], start=start):
+            if isinstance(row, InvalidLine):
+                errors.append({"index": index, "errors": {"non_field_errors": [row.error]}})
+                continue
+            if not isinstance(row, dict):
+                errors.append({"index": index, "errors": {"non_field_errors": ["Mỗi bài hát phải là một object JSON"]}})
+                continue
+            try:
+                valid.append((index, dict(validator.run_validation(row))))
+            except ValidationError as exc:
+                errors.append({"index": index, "errors": exc.detail})
+
+    # 2. Resolve tất cả album được tham chiếu bằng một truy vấn $in
+    album_ids = {data['album_id'] for _, data in valid if data.get('album_id')}
+    albums = Album.objects.in_bulk(list(album_ids)) if album_ids else {}
+
+    pending = []
+    unprobed = set()
+    for index, data in valid:
+        album_id = data.pop('album_id', None)
+        if album_id and album_id not in albums:
+            errors.append({"index": index, "errors": {"album_id": [f"Album with ID {album_id} does not exist"]}})
+            continue
+        song = Song(album_id=albums.get(album_id), **data)
+        if not data.get('duration'):
+            song.duration = datetime.time(0, 0, 0)
+            unprobed.add(song._id)
+        pending.append((index, song))
+
+    # 3. Ghi theo lô (bulk_create -> insert_many), lô lỗi không làm hủy các lô khác
+    created = []
+    for start in range(0, len(pending), BULK_BATCH_SIZE):
+        chunk = pending[start:start + BULK_BATCH_SIZE]
+        try:
+            Song.objects.bulk_create([song for _, song in chunk])
+        except Exception as e:
+            logger.exception("Lỗi ghi lô bài hát bắt đầu từ index %s", chunk[0][0])
+            errors.extend(
+                {"index": index, "errors": {"non_field_errors": [f"Lỗi ghi dữ liệu: {str(e)}"]}}
+                for index, _ in chunk
+            )
+            continue
+        created.extend(chunk)
+
+    # bulk_create không phát post_save nên cập nhật index tìm kiếm và bộ đếm album trực tiếp
+    album_totals = {}
+    for _, song in created:
+        catalog_search.upsert(song)
+        if song._id in unprobed:
+            schedule_song_metadata(song._id, song.audio_file)
+        if song.album_id_id is not None:
+            tracks, seconds = album_totals.get(song.album_id_id, (0, 0))
+            album_totals[song.album_id_id] = (tracks + 1, seconds + duration_seconds(song.duration))
+    for album_id, (tracks, seconds) in album_totals.items():
+        inc_album(album_id, tracks, seconds)
+
+    errors.sort(key=lambda error: error["index"])
+    if not created:
+        status_code = 400
+    elif errors:
+        status_code = 207
+    else:
+        status_code = 201
+    return Response({
+        "message": f"Đã tạo {len(created)}/{len(rows)} bài hát",
+        "created": len(created),
+        "failed": len(errors),
+        "results": [{"index": index, "_id": str(song._id)} for index, song in created],
+        "errors": errors
+    }, status=status_code)
+
+def filter_bpm(songs, request):
+    """Lọc theo ?bpm_min=&bpm_max= (dùng index bpm). Trả về (queryset, lỗi)."""
+    bounds = {}
+    for param, lookup in (('bpm_min', 'bpm__gte'), ('bpm_max', 'bpm__lte')):
+        value = request.query_params.get(param)
+        if value in (None, ''):
+            continue
+        try:
+            bounds[lookup] = float(value)
+        except ValueError:
+            return songs, f"{param} phải là số"
+    return (songs.filter(**bounds) if bounds else songs), None
+
 # 2. List Songs API
 @SchemaFactory.list_schema(
     item_example={
@@ -100,22 +259,32 @@ def upload_song(request):
         "album_id": "507f1f77bcf86cd799439011",
         "isHidden": False
     },
-    description="Lấy danh sách tất cả bài hát (công khai)"
+    search_fields=["bpm_min", "bpm_max"],
+    description="Lấy danh sách tất cả bài hát (công khai). bpm_min/bpm_max: lọc theo tempo",
+    pagination='cursor'
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def list_songs(request):
-    print("DEBUG: Đang lấy tất cả bài hát")
+    logger.debug("Đang lấy tất cả bài hát")
     try:
-        # Tạm thời lấy tất cả bài hát và lọc isHidden trong Python
-        songs = Song.objects.all()
-        # Lọc các bài hát không ẩn
-        visible_songs = [song for song in songs if not song.isHidden]
-        serializer = SongSerializer(visible_songs, many=True)
-        print(f"DEBUG: Dữ liệu bài hát = {serializer.data}")
-        return Response(serializer.data)
+        # Lọc isHidden và phân trang keyset ngay trong Mongo
+        songs, error = filter_bpm(Song.objects.visible().select_related('album_id'), request)
+        if error:
+            return Response({"error": error}, status=400)
+        if wants_stream(request):
+            # Stream toàn bộ danh sách theo lô, không giữ cả list trong bộ nhớ
+            return StreamingJSONResponse(songs.order_by('_id'), SongSerializer, ndjson=wants_ndjson(request))
+
+        paginator = ObjectIdCursorPagination()
+        page = paginator.paginate_queryset(songs, request)
+        serializer = SongSerializer(page, many=True)
+        logger.debug("Số bài hát trả về = %s", len(serializer.data))
+        return paginator.get_paginated_response(serializer.data)
+    except NotFound as e:
+        return Response({"error": str(e.detail)}, status=404)
     except Exception as e:
-        print(f"DEBUG: Lỗi khi lấy danh sách bài hát: {str(e)}")
+        logger.error("Lỗi khi lấy danh sách bài hát: %s", e)
         return Response({"error": "Lỗi khi lấy danh sách bài hát", "details": str(e)}, status=500)
 
 # 3. Get Song Detail API
@@ -136,21 +305,30 @@ def list_songs(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_song(request, song_id):
-    print(f"DEBUG: Đang lấy bài hát với _id = {song_id}")
+    logger.debug("Đang lấy bài hát với _id = %s", song_id)
     if not song_id or song_id == "undefined":
-        print(f"DEBUG: Song_id không hợp lệ: {song_id}")
+        logger.debug("Song_id không hợp lệ: %s", song_id)
+        return Response({"error": "Song ID không hợp lệ"}, status=400)
+    if not ObjectId.is_valid(song_id):
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
         return Response({"error": "Song ID không hợp lệ"}, status=400)
+    if missing_cache.get('song', song_id):
+        return Response({"error": "Không tìm thấy bài hát"}, status=404)
     try:
-        song = Song.objects.get(_id=ObjectId(song_id))
-        serializer = SongSerializer(song)
-        print(f"DEBUG: Dữ liệu bài hát = {serializer.data}")
-        return Response(serializer.data)
+        data = catalog_cache.get('song', song_id)
+        if data is None:
+            token = catalog_cache.begin('song', song_id)
+            song = Song.objects.select_related('album_id').get(_id=ObjectId(song_id))
+            data = SongSerializer(song).data
+            catalog_cache.set('song', song._id, data, depends_on=[('album', song.album_id_id)], token=token)
+        logger.debug("Dữ liệu bài hát = %s", data)
+        return Response(data)
     except Song.DoesNotExist:
-        print(f"DEBUG: Không tìm thấy bài hát với _id = {song_id}")
-        print(f"DEBUG: Tất cả ID bài hát: {[str(song._id) for song in Song.objects.all()]}")
+        logger.debug("Không tìm thấy bài hát với _id = %s", song_id)
+        missing_cache.set('song', song_id, True)
         return Response({"error": "Không tìm thấy bài hát"}, status=404)
     except ValueError:
-        print(f"DEBUG: Định dạng ObjectId không hợp lệ cho {song_id}")
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
         return Response({"error": "Song ID không hợp lệ"}, status=400)
 
 # 4. Get Songs by Album API
@@ -162,33 +340,37 @@ def get_song(request, song_id):
         "audio_file": "https://cloudinary.com/audio.mp3",
         "album_id": "60d5ec9cf8a1b4626e7d4e92"
     },
-    description="Lấy tất cả bài hát thuộc một album cụ thể",
+    search_fields=["bpm_min", "bpm_max"],
+    description="Lấy tất cả bài hát thuộc một album cụ thể. bpm_min/bpm_max: lọc theo tempo",
     pagination=True
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_songs_by_album(request, album_id):
-    print(f"DEBUG: Đang lấy bài hát cho album_id = {album_id}")
+    logger.debug("Đang lấy bài hát cho album_id = %s", album_id)
     try:
-        # Lọc trong Python thay vì dùng isHidden=False
-        songs = Song.objects.filter(album_id=ObjectId(album_id))
-        visible_songs = [song for song in songs if not song.isHidden]
-        serializer = SongSerializer(visible_songs, many=True)
-        print(f"DEBUG: Bài hát trong album = {serializer.data}")
-        return Response({
-            "results": serializer.data,
-            "count": len(serializer.data),
-            "next": None,
-            "previous": None
-        })
+        songs, error = filter_bpm(
+            Song.objects.visible()
+            .filter(album_id=ObjectId(album_id))
+            .select_related('album_id')
+            .order_by('_id'),
+            request
+        )
+        if error:
+            return Response({"error": error}, status=400)
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(songs, request)
+        serializer = SongSerializer(page, many=True)
+        logger.debug("Số bài hát trong album = %s", len(serializer.data))
+        return paginator.get_paginated_response(serializer.data)
     except Album.DoesNotExist:
-        print(f"DEBUG: Không tìm thấy album với _id = {album_id}")
+        logger.debug("Không tìm thấy album với _id = %s", album_id)
         return Response({"error": "Không tìm thấy album"}, status=404)
     except ValueError:
-        print(f"DEBUG: Định dạng ObjectId không hợp lệ cho {album_id}")
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", album_id)
         return Response({"error": "Album ID không hợp lệ"}, status=400)
     except Exception as e:
-        print(f"DEBUG: Lỗi khi lấy bài hát cho album: {str(e)}")
+        logger.error("Lỗi khi lấy bài hát cho album: %s", e)
         return Response({"error": str(e)}, status=400)
 
 # 5. Update Song API
@@ -220,8 +402,13 @@ def get_songs_by_album(request, album_id):
 @parser_classes([MultiPartParser, FormParser])
 @permission_classes([AllowAny])
 def update_song(request, song_id):
-    print(f"DEBUG: Đang cập nhật bài hát với _id = {song_id}")
-    print(f"DEBUG: Dữ liệu yêu cầu = {request.data}")
+    logger.debug("Đang cập nhật bài hát với _id = %s", song_id)
+    logger.debug("Dữ liệu yêu cầu = %s", request.data)
+    if not ObjectId.is_valid(song_id):
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
+        return Response({"error": "Song ID không hợp lệ"}, status=400)
+    if missing_cache.get('song', song_id):
+        return Response({"error": "Không tìm thấy bài hát"}, status=404)
     try:
         song = Song.objects.get(_id=ObjectId(song_id))
         audio_blob = request.FILES.get('audio_file')
@@ -231,20 +418,22 @@ def update_song(request, song_id):
             request.data['duration'] = song_duration
         serializer = SongSerializer(song, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
-            print(f"DEBUG: Đã cập nhật bài hát với _id = {song_id}, dữ liệu = {serializer.data}")
+            song = serializer.save()
+            if not audio_blob and 'audio_file' in request.data and not request.data.get('duration'):
+                schedule_song_metadata(song._id, song.audio_file)
+            logger.debug("Đã cập nhật bài hát với _id = %s, dữ liệu = %s", song_id, serializer.data)
             return Response({"message": "Cập nhật bài hát thành công!", "data": serializer.data}, status=200)
-        print(f"DEBUG: Lỗi xác thực = {serializer.errors}")
+        logger.debug("Lỗi xác thực = %s", serializer.errors)
         return Response({"error": "Dữ liệu không hợp lệ", "details": serializer.errors}, status=400)
     except Song.DoesNotExist:
-        print(f"DEBUG: Không tìm thấy bài hát với _id = {song_id}")
-        print(f"DEBUG: Tất cả ID bài hát: {[str(song._id) for song in Song.objects.all()]}")
+        logger.debug("Không tìm thấy bài hát với _id = %s", song_id)
+        missing_cache.set('song', song_id, True)
         return Response({"error": "Không tìm thấy bài hát"}, status=404)
     except ValueError:
-        print(f"DEBUG: Định dạng ObjectId không hợp lệ cho {song_id}")
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
         return Response({"error": "Song ID không hợp lệ"}, status=400)
     except Exception as e:
-        print(f"DEBUG: Lỗi khi cập nhật bài hát: {str(e)}")
+        logger.error("Lỗi khi cập nhật bài hát: %s", e)
         return Response({"error": str(e)}, status=500)
 
 # 6. Delete Song API
@@ -259,62 +448,77 @@ def update_song(request, song_id):
 @api_view(['DELETE'])
 @permission_classes([AllowAny])
 def delete_song(request, song_id):
-    print(f"DEBUG: Đang cố xóa bài hát với _id = {song_id}")
+    logger.debug("Đang cố xóa bài hát với _id = %s", song_id)
+    if not ObjectId.is_valid(song_id):
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
+        return Response({"error": "Song ID không hợp lệ"}, status=400)
+    if missing_cache.get('song', song_id):
+        return Response({"error": "Không tìm thấy bài hát"}, status=404)
     try:
         song = Song.objects.get(_id=ObjectId(song_id))
         song.delete()
-        print(f"DEBUG: Đã xóa bài hát với _id = {song_id}")
+        logger.debug("Đã xóa bài hát với _id = %s", song_id)
         return Response({"message": "Xóa bài hát thành công!", "deleted_id": str(song_id)})
     except Song.DoesNotExist:
-        print(f"DEBUG: Không tìm thấy bài hát với _id = {song_id}")
-        print(f"DEBUG: Tất cả ID bài hát: {[str(song._id) for song in Song.objects.all()]}")
+        logger.debug("Không tìm thấy bài hát với _id = %s", song_id)
+        missing_cache.set('song', song_id, True)
         return Response({"error": "Không tìm thấy bài hát"}, status=404)
     except ValueError:
-        print(f"DEBUG: Định dạng ObjectId không hợp lệ cho {song_id}")
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
         return Response({"error": "Song ID không hợp lệ"}, status=400)
 
 # 7. Hide Song API
 @api_view(['PUT'])
 @permission_classes([AllowAny])
 def hide_song(request, song_id):
-    print(f"DEBUG: Đang ẩn bài hát với _id = {song_id}")
+    logger.debug("Đang ẩn bài hát với _id = %s", song_id)
+    if not ObjectId.is_valid(song_id):
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
+        return Response({"error": "Song ID không hợp lệ"}, status=400)
+    if missing_cache.get('song', song_id):
+        return Response({"error": "Không tìm thấy bài hát"}, status=404)
     try:
         song = Song.objects.get(_id=ObjectId(song_id))
         song.isHidden = True
         song.save()
-        print(f"DEBUG: Đã ẩn bài hát, _id = {song_id}, isHidden = {song.isHidden}")
+        logger.debug("Đã ẩn bài hát, _id = %s, isHidden = %s", song_id, song.isHidden)
         return Response({
             "message": "Ẩn bài hát thành công!",
             "data": {"song_id": str(song._id), "isHidden": song.isHidden}
         }, status=200)
     except Song.DoesNotExist:
-        print(f"DEBUG: Không tìm thấy bài hát với _id = {song_id}")
-        print(f"DEBUG: Tất cả ID bài hát: {[str(song._id) for song in Song.objects.all()]}")
+        logger.debug("Không tìm thấy bài hát với _id = %s", song_id)
+        missing_cache.set('song', song_id, True)
         return Response({"error": "Không tìm thấy bài hát"}, status=404)
     except ValueError:
-        print(f"DEBUG: Định dạng ObjectId không hợp lệ cho {song_id}")
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
         return Response({"error": "Song ID không hợp lệ"}, status=400)
 
 # 8. Unhide Song API
 @api_view(['PUT'])
 @permission_classes([AllowAny])
 def unhide_song(request, song_id):
-    print(f"DEBUG: Đang bỏ ẩn bài hát với _id = {song_id}")
+    logger.debug("Đang bỏ ẩn bài hát với _id = %s", song_id)
+    if not ObjectId.is_valid(song_id):
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
+        return Response({"error": "Song ID không hợp lệ"}, status=400)
+    if missing_cache.get('song', song_id):
+        return Response({"error": "Không tìm thấy bài hát"}, status=404)
     try:
         song = Song.objects.get(_id=ObjectId(song_id))
         song.isHidden = False
         song.save()
-        print(f"DEBUG: Đã bỏ ẩn bài hát, _id = {song_id}, isHidden = {song.isHidden}")
+        logger.debug("Đã bỏ ẩn bài hát, _id = %s, isHidden = %s", song_id, song.isHidden)
         return Response({
             "message": "Bỏ ẩn bài hát thành công!",
             "data": {"song_id": str(song._id), "isHidden": song.isHidden}
         }, status=200)
     except Song.DoesNotExist:
-        print(f"DEBUG: Không tìm thấy bài hát với _id = {song_id}")
-        print(f"DEBUG: Tất cả ID bài hát: {[str(song._id) for song in Song.objects.all()]}")
+        logger.debug("Không tìm thấy bài hát với _id = %s", song_id)
+        missing_cache.set('song', song_id, True)
         return Response({"error": "Không tìm thấy bài hát"}, status=404)
     except ValueError:
-        print(f"DEBUG: Định dạng ObjectId không hợp lệ cho {song_id}")
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", song_id)
         return Response({"error": "Song ID không hợp lệ"}, status=400)
 
 # 9. Delete Song in Album API
@@ -342,22 +546,27 @@ def unhide_song(request, song_id):
 @api_view(['DELETE'])
 @permission_classes([AllowAny])
 def delete_song_inAlbum(request, album_id, song_id):
-    print(f"DEBUG: Đang cố xóa bài hát với _id = {song_id} trong album = {album_id}")
+    logger.debug("Đang cố xóa bài hát với _id = %s trong album = %s", song_id, album_id)
+    if not ObjectId.is_valid(song_id) or not ObjectId.is_valid(album_id):
+        logger.debug("Định dạng ObjectId không hợp lệ cho song_id = %s hoặc album_id = %s", song_id, album_id)
+        return Response({"error": "Định dạng song_id hoặc album_id không hợp lệ"}, status=400)
+    if missing_cache.get('song', song_id) or missing_cache.get('album_song', album_song_key(album_id, song_id)):
+        return Response({"error": "Không tìm thấy bài hát trong album chỉ định"}, status=404)
     try:
         song = Song.objects.get(_id=ObjectId(song_id), album_id=ObjectId(album_id))
         song.delete()
-        print(f"DEBUG: Đã xóa bài hát với _id = {song_id} trong album = {album_id}")
+        logger.debug("Đã xóa bài hát với _id = %s trong album = %s", song_id, album_id)
         return Response({
             "message": "Xóa bài hát thành công!",
             "deleted_id": song_id,
             "album_id": album_id
         })
     except Song.DoesNotExist:
-        print(f"DEBUG: Không tìm thấy bài hát với _id = {song_id} trong album = {album_id}")
-        print(f"DEBUG: Tất cả ID bài hát: {[str(song._id) for song in Song.objects.all()]}")
+        logger.debug("Không tìm thấy bài hát với _id = %s trong album = %s", song_id, album_id)
+        missing_cache.set('album_song', album_song_key(album_id, song_id), True)
         return Response({"error": "Không tìm thấy bài hát trong album chỉ định"}, status=404)
     except ValueError:
-        print(f"DEBUG: Định dạng ObjectId không hợp lệ cho song_id = {song_id} hoặc album_id = {album_id}")
+        logger.debug("Định dạng ObjectId không hợp lệ cho song_id = %s hoặc album_id = %s", song_id, album_id)
         return Response({"error": "Định dạng song_id hoặc album_id không hợp lệ"}, status=400)
 
 # 10. Get Playlist Songs API (Lưu ý: Có thể không được sử dụng do urls.py ánh xạ đến playlist_songviews)
@@ -372,27 +581,110 @@ def delete_song_inAlbum(request, album_id, song_id):
         "album_id": "507f1f77bcf86cd799439011",
         "isHidden": False
     },
-    description="Lấy tất cả bài hát trong một playlist cụ thể"
+    description="Lấy bài hát trong một playlist theo thứ tự position. "
+                "Phân trang bằng ?limit= và link `next` (?after=<position>.<_id>); bài hát ẩn bị bỏ khỏi trang."
 )
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_playlist_songs(request, playlist_id):
-    print(f"DEBUG: Đang lấy bài hát cho playlist_id = {playlist_id}")
+    logger.debug("Đang lấy bài hát cho playlist_id = %s", playlist_id)
     if not playlist_id or playlist_id == "undefined":
-        print(f"DEBUG: Playlist_id không hợp lệ: {playlist_id}")
+        logger.debug("Playlist_id không hợp lệ: %s", playlist_id)
         return Response({"error": "Playlist ID không hợp lệ"}, status=400)
     try:
         playlist = Playlist.objects.get(_id=ObjectId(playlist_id))
-        playlist_songs = PlaylistSong.objects.filter(playlist=playlist)
-        songs = [ps.song for ps in playlist_songs]
-        # Lọc bài hát không ẩn
-        visible_songs = [song for song in songs if not song.isHidden]
-        serializer = SongSerializer(visible_songs, many=True)
-        print(f"DEBUG: Bài hát trong playlist = {serializer.data}")
-        return Response(serializer.data)
+        limit = ObjectIdCursorPagination().get_limit(request)
+        # Chỉ đọc một trang PlaylistSong theo index (playlist, position), không nạp cả playlist
+        rows = PlaylistSong.objects.filter(playlist=playlist._id).order_by('position', '_id')
+        after = request.query_params.get('after')
+        if after:
+            try:
+                rows = after_position(rows, after)
+            except ValueError:
+                return Response({"error": "Cursor after không hợp lệ"}, status=400)
+        rows = list(rows.values_list('_id', 'position', 'song')[:limit + 1])
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        # Một truy vấn $in cho bài hát của trang, lọc bài hát ẩn ngay trong Mongo
+        songs = Song.objects.visible().select_related('album_id').in_bulk([song_id for _, _, song_id in rows])
+        serializer = SongSerializer([songs[song_id] for _, _, song_id in rows if song_id in songs], many=True)
+        logger.debug("Số bài hát trong trang playlist = %s", len(serializer.data))
+        next_link = None
+        if has_next:
+            row_id, position, _ = rows[-1]
+            next_link = replace_query_param(request.build_absolute_uri(), 'after', position_cursor(position, row_id))
+        return Response({'next': next_link, 'previous': None, 'results': serializer.data})
     except Playlist.DoesNotExist:
-        print(f"DEBUG: Không tìm thấy playlist với _id = {playlist_id}")
+        logger.debug("Không tìm thấy playlist với _id = %s", playlist_id)
         return Response({"error": "Không tìm thấy playlist"}, status=404)
     except ValueError:
-        print(f"DEBUG: Định dạng ObjectId không hợp lệ cho {playlist_id}")
-        return Response({"error": "Playlist ID không hợp lệ"}, status=400)
\ No newline at end of file
+        logger.debug("Định dạng ObjectId không hợp lệ cho %s", playlist_id)
+        return Response({"error": "Playlist ID không hợp lệ"}, status=400)
+
+# 11. Song Waveform API
+WAVEFORM_MAX_POINTS = 4000
+
+
+@SchemaFactory.retrieve_schema(
+    item_id_param="song_id",
+    success_response={
+        "song_id": "507f1f77bcf86cd799439011",
+        "points": 4,
+        "peaks": [0.0123, 0.4512, 0.9021, 0.3310],
+        "loudness": -9.82,
+        "peak_db": -0.3,
+        "gain_db": -4.18
+    },
+    error_responses=[
+        {
+            "name": "Chưa phân tích",
+            "response": {"error": "Bài hát chưa được phân tích"},
+            "status_code": 404
+        }
+    ],
+    description="Waveform peaks (0..1) và loudness (LUFS) đã tính sẵn của bài hát. "
+                "points: gộp còn tối đa N điểm; raw=1: trả mảng float16 little-endian "
+                "(application/octet-stream), loudness nằm trong header X-Loudness. "
+                "gain_db: mức chỉnh để đạt loudness chuẩn khi phát."
+)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def get_song_waveform(request, song_id):
+    if not ObjectId.is_valid(song_id):
+        return Response({"error": "Song ID không hợp lệ"}, status=400)
+    if missing_cache.get('song', song_id):
+        return Response({"error": "Không tìm thấy bài hát"}, status=404)
+
+    analysis = SongAnalysis.objects.filter(song=ObjectId(song_id)).first()
+    if analysis is None:
+        return Response({"error": "Bài hát chưa được phân tích"}, status=404)
+
+    peaks = np.frombuffer(analysis.peaks, dtype='<f2')
+    points = request.query_params.get('points')
+    if points:
+        try:
+            peaks = downsample_peaks(peaks, min(int(points), WAVEFORM_MAX_POINTS))
+        except ValueError:
+            return Response({"error": "points phải là số nguyên"}, status=400)
+
+    target = settings.AUDIO_ANALYSIS.get('TARGET_LOUDNESS', -14.0)
+    gain_db = round(target - analysis.loudness, 2) if analysis.loudness is not None else None
+
+    if request.query_params.get('raw', '').lower() in ('1', 'true', 'yes'):
+        response = HttpResponse(peaks.astype('<f2').tobytes(), content_type='application/octet-stream')
+        response['X-Peak-Count'] = str(len(peaks))
+        if analysis.loudness is not None:
+            response['X-Loudness'] = f'{analysis.loudness:.2f}'
+            response['X-Gain-Db'] = f'{gain_db:.2f}'
+    else:
+        response = Response({
+            "song_id": song_id,
+            "points": len(peaks),
+            "peaks": np.round(peaks.astype(np.float32), 4).tolist(),
+            "loudness": round(analysis.loudness, 2) if analysis.loudness is not None else None,
+            "peak_db": round(analysis.peak_db, 2) if analysis.peak_db is not None else None,
+            "gain_db": gain_db
+        })
+    # Chỉ đổi khi bài hát được phân tích lại
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
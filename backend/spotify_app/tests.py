@@ -1,3 +1,1453 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from bson import ObjectId
+from django.core import signing
+from django.core.cache import caches
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.request import Request
+
+from backend.mediafiles import FileSlice, parse_range, ranged_file_response
+from backend.log import JSONFormatter, QueueStreamHandler, SamplingFilter, parse_levels
+from backend.parsers import InvalidLine, NDJSONParser
+from backend.pagination import ObjectIdCursorPagination
+from backend.streaming import StreamingJSONResponse, iter_batches
+
+from spotify_app import (
+    albumviews, analysis, audio, counters, hls, images, mediaviews, playlist_songviews, playlistviews, signals,
+    snapshots, songviews, tempo,
+)
+from redis.exceptions import ConnectionError as RedisConnectionError, WatchError
+
+from spotify_app.cache import CatalogCache, MemberSetCache
+from spotify_app.management.commands import analyze_tempo
+from spotify_app.search import AutocompleteIndex, InvertedIndex, fold, tokenize
+from music_library.models import FavoriteSong, PlaylistSong
+from spotify_app.models import Album, Artist, Playlist, Song
+
+
+def where_lookups(queryset):
+    """[(field, lookup, value)] của mệnh đề WHERE (chỉ dựng query, không chạm DB)."""
+    return [
+        (child.lhs.target.name, child.lookup_name, child.rhs)
+        for child in queryset.query.where.children
+    ]
+
+
+class VisibleQuerySetTests(SimpleTestCase):
+    def test_visible_filters_hidden_in_query(self):
+        for model in (Song, Album, Artist, Playlist):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(where_lookups(model.objects.visible()), [('isHidden', 'exact', False)])
+
+
+class PlaylistSongsPageTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.playlist = Playlist(_id=ObjectId(), name='p')
+        self.songs = [
+            Song(_id=ObjectId(), title=f'song {i}', duration=datetime.time(0, 3), audio_file='https://x/a.mp3')
+            for i in range(3)
+        ]
+        self.rows = [(ObjectId(), f'a{i}', song._id) for i, song in enumerate(self.songs)]
+
+    def get(self, query, rows, visible):
+        playlist_songs = mock.MagicMock()
+        playlist_songs.filter.return_value.order_by.return_value = playlist_songs.page
+        playlist_songs.page.filter.return_value = playlist_songs.page
+        playlist_songs.page.values_list.return_value.__getitem__.return_value = rows
+        songs = mock.MagicMock()
+        songs.visible.return_value.select_related.return_value.in_bulk.return_value = {
+            song._id: song for song in visible
+        }
+        with mock.patch.object(songviews.Playlist.objects, 'get', return_value=self.playlist), \
+                mock.patch.object(songviews.PlaylistSong, 'objects', playlist_songs), \
+                mock.patch.object(songviews.Song, 'objects', songs):
+            response = songviews.get_playlist_songs(
+                self.factory.get(f'/playlists/{self.playlist._id}/songs/{query}'), str(self.playlist._id)
+            )
+        return response, playlist_songs, songs
+
+    def test_reads_one_page_in_position_order(self):
+        response, playlist_songs, songs = self.get('?limit=2', self.rows, self.songs)
+        self.assertEqual(response.status_code, 200)
+        playlist_songs.filter.return_value.order_by.assert_called_once_with('position', '_id')
+        # limit + 1 dòng để biết còn trang sau, không nạp cả playlist
+        playlist_songs.page.values_list.return_value.__getitem__.assert_called_once_with(slice(None, 3))
+        songs.visible.return_value.select_related.return_value.in_bulk.assert_called_once_with(
+            [song._id for song in self.songs[:2]]
+        )
+        self.assertEqual([song['title'] for song in response.data['results']], ['song 0', 'song 1'])
+        self.assertIn(f'after=a1.{self.rows[1][0]}', response.data['next'])
+
+    def test_hidden_songs_are_dropped_and_last_page_has_no_next(self):
+        response, _, _ = self.get('?limit=5', self.rows, [self.songs[0], self.songs[2]])
+        self.assertEqual([song['title'] for song in response.data['results']], ['song 0', 'song 2'])
+        self.assertIsNone(response.data['next'])
+
+    def test_after_cursor_filters_by_position_and_id(self):
+        response, playlist_songs, _ = self.get(f'?limit=2&after=a1.{self.rows[1][0]}', self.rows[2:], self.songs)
+        self.assertEqual(response.status_code, 200)
+        playlist_songs.page.filter.assert_called_once()
+
+    def test_invalid_after_cursor(self):
+        response, _, _ = self.get('?after=a1.nope', self.rows, self.songs)
+        self.assertEqual(response.status_code, 400)
+
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'catalog': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog-tests'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['catalog'].clear()
+        # Hai process dùng chung backend: mỗi process có object CatalogCache riêng
+        self.web = CatalogCache('catalog')
+        self.asgi = CatalogCache('catalog')
+
+    def test_invalidate_from_another_process(self):
+        self.web.set('song', 'x', {'isHidden': False})
+        self.assertEqual(self.asgi.get('song', 'x'), {'isHidden': False})
+        self.asgi.invalidate('song', 'x')
+        self.assertIsNone(self.web.get('song', 'x'))
+
+    def test_parent_invalidation_expires_dependents(self):
+        self.web.set('album', 'a', {'name': 'old'})
+        self.web.set('song', 's', {'album': 'old'}, depends_on=[('album', 'a')])
+        self.web.set('song', 't', {'album': None}, depends_on=[('album', None)])
+        self.asgi.invalidate('album', 'a')
+        self.assertIsNone(self.web.get('song', 's'))
+        self.assertEqual(self.web.get('song', 't'), {'album': None})
+        # Ghi lại sau khi album đổi thì dùng được cho tới lần invalidate tiếp theo
+        self.web.set('song', 's', {'album': 'new'}, depends_on=[('album', 'a')])
+        self.assertEqual(self.asgi.get('song', 's'), {'album': 'new'})
+        self.web.invalidate('album', 'a')
+        self.assertIsNone(self.asgi.get('song', 's'))
+
+    def test_invalidate_between_read_and_set_is_not_lost(self):
+        # web đọc bài hát từ DB, asgi ẩn bài hát (invalidate), rồi web mới ghi dữ liệu cũ
+        token = self.web.begin('song', 'x')
+        self.asgi.invalidate('song', 'x')
+        self.web.set('song', 'x', {'isHidden': False}, token=token)
+        self.assertIsNone(self.asgi.get('song', 'x'))
+        # Lần đọc sau bắt đầu sau invalidate thì được ghi
+        token = self.web.begin('song', 'x')
+        self.web.set('song', 'x', {'isHidden': True}, token=token)
+        self.assertEqual(self.asgi.get('song', 'x'), {'isHidden': True})
+
+    def test_entry_keeps_own_version_from_before_read(self):
+        token = self.web.begin('song', 'x')
+        self.web.set('song', 'x', {'isHidden': False}, token=token)
+        self.asgi.invalidate('song', 'x')
+        self.assertIsNone(self.web.get('song', 'x'))
+
+    def test_parent_invalidated_during_read_is_not_cached(self):
+        self.web.invalidate('album', 'a')
+        with mock.patch('spotify_app.cache.time.time', return_value=time.time() + 5):
+            token = self.web.begin('song', 's')
+        self.web.set('song', 's', {'album': 'before'}, depends_on=[('album', 'a')], token=token)
+        self.assertEqual(self.web.get('song', 's'), {'album': 'before'})
+        token = self.web.begin('song', 't')
+        self.asgi.invalidate('album', 'a')
+        self.web.set('song', 't', {'album': 'old'}, depends_on=[('album', 'a')], token=token)
+        self.assertIsNone(self.web.get('song', 't'))
+
+    def test_namespaces_are_separate(self):
+        missing = CatalogCache('missing', track_dependents=False)
+        missing.set('song', 'x', True)
+        self.assertIsNone(self.web.get('song', 'x'))
+        self.assertTrue(missing.get('song', 'x'))
+
+
+class FakeQuerySet:
+    """Queryset tối thiểu cho pagination: ghi lại filter/order_by, cắt theo slice."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.ordering = None
+
+    def filter(self, **lookups):
+        self.filters.append(lookups)
+        return self
+
+    def order_by(self, ordering):
+        self.ordering = ordering
+        return self
+
+    def __getitem__(self, item):
+        return self.rows[item]
+
+
+class ObjectIdCursorPaginationTests(SimpleTestCase):
+    def paginate(self, query, rows, ordering='_id'):
+        paginator = ObjectIdCursorPagination()
+        paginator.ordering = ordering
+        queryset = FakeQuerySet(rows)
+        request = Request(RequestFactory().get(f'/songs/{query}'))
+        return paginator, queryset, paginator.paginate_queryset(queryset, request)
+
+    def test_first_page_fetches_one_extra_row(self):
+        rows = [mock.Mock(_id=ObjectId()) for _ in range(3)]
+        paginator, queryset, page = self.paginate('?limit=2', rows)
+        self.assertEqual(page, rows[:2])
+        self.assertEqual(queryset.filters, [])
+        self.assertEqual(queryset.ordering, '_id')
+        self.assertIn(f'cursor={rows[1]._id}', paginator.get_next_link())
+
+    def test_cursor_continues_after_id(self):
+        cursor = ObjectId()
+        _, queryset, _ = self.paginate(f'?cursor={cursor}', [])
+        self.assertEqual(queryset.filters, [{'_id__gt': cursor}])
+        _, queryset, _ = self.paginate(f'?cursor={cursor}', [], ordering='-_id')
+        self.assertEqual(queryset.filters, [{'_id__lt': cursor}])
+
+    def test_last_page_has_no_next(self):
+        rows = [mock.Mock(_id=ObjectId())]
+        paginator, _, page = self.paginate('?limit=2', rows)
+        self.assertEqual(page, rows)
+        self.assertIsNone(paginator.get_next_link())
+
+    def test_limit_bounds(self):
+        paginator = ObjectIdCursorPagination()
+        for query, expected in (('', paginator.default_limit), ('?limit=abc', paginator.default_limit),
+                                ('?limit=0', paginator.default_limit), ('?limit=1000', paginator.max_limit)):
+            with self.subTest(query=query):
+                self.assertEqual(paginator.get_limit(Request(RequestFactory().get(f'/{query}'))), expected)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self.paginate('?cursor=nope', [])
+
+
+class IteratorQuerySet:
+    """Queryset chỉ hỗ trợ iterator(chunk_size) như khi stream, ghi lại chunk_size đã dùng."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.chunk_sizes = []
+
+    def iterator(self, chunk_size):
+        self.chunk_sizes.append(chunk_size)
+        return iter(self.rows)
+
+
+class RowSerializer(serializers.Serializer):
+    _id = serializers.SerializerMethodField()
+    title = serializers.CharField()
+
+    def get__id(self, obj):
+        return obj['_id']
+
+
+class StreamingJSONResponseTests(SimpleTestCase):
+    def setUp(self):
+        self.rows = [{'_id': ObjectId(), 'title': f'Bài {i}'} for i in range(5)]
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_batches(self):
+        queryset = IteratorQuerySet(self.rows)
+        self.assertEqual([len(batch) for batch in iter_batches(queryset, 2)], [2, 2, 1])
+        self.assertEqual(queryset.chunk_sizes, [2])
+
+    def test_json_array(self):
+        response = StreamingJSONResponse(IteratorQuerySet(self.rows), RowSerializer, batch_size=2)
+        self.assertEqual(response['Content-Type'], 'application/json; charset=utf-8')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        data = json.loads(self.content(response))
+        self.assertEqual([row['_id'] for row in data], [str(row['_id']) for row in self.rows])
+        self.assertEqual(data[0]['title'], 'Bài 0')
+
+    def test_empty_array(self):
+        self.assertEqual(self.content(StreamingJSONResponse(IteratorQuerySet([]), RowSerializer)), '[]')
+
+    def test_ndjson(self):
+        response = StreamingJSONResponse(IteratorQuerySet(self.rows), RowSerializer, batch_size=2, ndjson=True)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = self.content(response).splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], [row['title'] for row in self.rows])
+
+
+class FoldTests(SimpleTestCase):
+    def test_fold_removes_vietnamese_diacritics(self):
+        self.assertEqual(fold('Sơn Tùng M-TP'), 'son tung m-tp')
+        self.assertEqual(fold('Đen Vâu'), 'den vau')
+        self.assertEqual(fold(None), '')
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('Chúng Ta Của Hiện Tại!'), ['chung', 'ta', 'cua', 'hien', 'tai'])
+
+
+class InvertedIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.add('artist', 'a1', 'Sơn Tùng M-TP', {'artist_name': 'Sơn Tùng M-TP'})
+        self.index.add('song', 's1', 'Chúng Ta Của Hiện Tại', {'title': 'Chúng Ta Của Hiện Tại'})
+        self.index.add('song', 's2', 'Nơi Này Có Anh', {'title': 'Nơi Này Có Anh'})
+        self.index.add('album', 'b1', 'Sky Tour Sơn Tùng M-TP', {'album_name': 'Sky Tour'})
+
+    def ids(self, results):
+        return [result['_id'] for result in results]
+
+    def test_accent_insensitive_match(self):
+        self.assertEqual(self.ids(self.index.search('son tung')), ['a1', 'b1'])
+        self.assertEqual(self.ids(self.index.search('NƠI NÀY')), ['s2'])
+
+    def test_kinds_filter(self):
+        self.assertEqual(self.ids(self.index.search('son tung', kinds={'album'})), ['b1'])
+
+    def test_shorter_document_ranks_higher(self):
+        results = self.index.search('tung')
+        self.assertGreater(results[0]['score'], results[1]['score'])
+        self.assertEqual(results[0]['type'], 'artist')
+
+    def test_update_and_remove(self):
+        self.index.add('song', 's2', 'Lạc Trôi', {'title': 'Lạc Trôi'})
+        self.assertEqual(self.index.search('noi nay'), [])
+        self.assertEqual(self.ids(self.index.search('lac troi')), ['s2'])
+        self.index.remove('song', 's2')
+        self.assertEqual(self.index.search('lac troi'), [])
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn('lac', self.index.postings)
+
+
+class AutocompleteIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.popularity = Counter({('artist', 'a1'): 50, ('song', 's1'): 30, ('song', 's2'): 10, ('album', 'b1'): 20})
+        self.index = AutocompleteIndex(self.popularity)
+        self.index.load([
+            ('artist', 'a1', 'Sơn Tùng M-TP', {}),
+            ('song', 's1', 'Chúng Ta Của Hiện Tại', {}),
+            ('song', 's2', 'Nơi Này Có Anh', {}),
+            ('album', 'b1', 'Sky Tour', {}),
+        ])
+
+    def ids(self, prefix, kinds=None, limit=10):
+        return [result['_id'] for result in self.index.complete(prefix, kinds, limit)]
+
+    def test_short_and_long_prefixes_rank_by_popularity(self):
+        self.assertEqual(self.ids('s'), ['a1', 'b1'])
+        self.assertEqual(self.ids('sơn tù'), ['a1'])
+        self.assertEqual(self.ids('c'), ['s1', 's2'])
+        self.assertEqual(self.ids('co anh'), ['s2'])
+
+    def test_matches_word_inside_title(self):
+        self.assertEqual(self.ids('tung'), ['a1'])
+        self.assertEqual(self.ids('hien tai'), ['s1'])
+
+    def test_kinds_and_limit(self):
+        self.assertEqual(self.ids('s', kinds={'album'}), ['b1'])
+        self.assertEqual(self.ids('c', limit=1), ['s1'])
+
+    def test_add_and_remove_update_short_prefix_table(self):
+        self.popularity[('song', 's3')] = 100
+        self.index.add('song', 's3', 'Sóng Gió', {})
+        self.assertEqual(self.ids('s'), ['s3', 'a1', 'b1'])
+        self.assertEqual(self.ids('song g'), ['s3'])
+        self.index.remove('song', 's3')
+        self.assertEqual(self.ids('s'), ['a1', 'b1'])
+        self.assertEqual(self.ids('song g'), [])
+
+    def test_remove_refills_truncated_table(self):
+        index = AutocompleteIndex(Counter({('song', str(i)): i for i in range(60)}))
+        index.load(('song', str(i), f'Bài {i}', {}) for i in range(60))
+        for i in range(59, 20, -1):
+            index.remove('song', str(i))
+        results = index.complete('b', limit=20)
+        self.assertEqual([result['_id'] for result in results], [str(i) for i in range(20, 0, -1)])
+
+    def test_prefix_longer_than_key(self):
+        title = ' '.join(['dai'] * 20) + ' het'
+        self.index.add('song', 's4', title, {})
+        self.assertEqual(self.ids(title), ['s4'])
+        self.assertEqual(self.ids(' '.join(['dai'] * 20) + ' khac'), [])
+
+
+class AlbumDetailTests(SimpleTestCase):
+    def test_loads_tracks_and_artists_with_one_query_each(self):
+        album_id = ObjectId()
+        songs = [Song(_id=ObjectId(), title=f'song {i}', audio_file='https://x/a.mp3') for i in range(2)]
+        artists = [Artist(_id=ObjectId(), artist_name=f'artist {i}') for i in range(2)]
+        hidden_artist = ObjectId()
+        song_objects, perform_objects, artist_objects = mock.MagicMock(), mock.MagicMock(), mock.MagicMock()
+        song_objects.visible.return_value.filter.return_value.order_by.return_value = songs
+        perform_objects.filter.return_value.values_list.return_value = [
+            (songs[0]._id, artists[0]._id), (songs[0]._id, artists[1]._id),
+            (songs[1]._id, artists[1]._id), (songs[1]._id, hidden_artist),
+        ]
+        artist_objects.visible.return_value.filter.return_value = artists
+        with mock.patch.object(albumviews.catalog_cache, 'get', return_value={'_id': str(album_id), 'album_name': 'a'}), \
+                mock.patch.object(albumviews.Song, 'objects', song_objects), \
+                mock.patch.object(albumviews.ArtistPerform, 'objects', perform_objects), \
+                mock.patch.object(albumviews.Artist, 'objects', artist_objects):
+            response = albumviews.get_album_detail(
+                RequestFactory().get(f'/albums/{album_id}/detail/'), str(album_id)
+            )
+
+        self.assertEqual(response.status_code, 200)
+        song_objects.visible.return_value.filter.assert_called_once_with(album_id=album_id)
+        perform_objects.filter.assert_called_once_with(song__in=[song._id for song in songs])
+        artist_objects.visible.return_value.filter.assert_called_once_with(
+            _id__in={artists[0]._id, artists[1]._id, hidden_artist}
+        )
+        self.assertEqual(response.data['album_name'], 'a')
+        self.assertEqual(
+            [[artist['artist_name'] for artist in song['artists']] for song in response.data['songs']],
+            [['artist 0', 'artist 1'], ['artist 1']],
+        )
+
+    def test_invalid_id(self):
+        response = albumviews.get_album_detail(RequestFactory().get('/albums/x/detail/'), 'x')
+        self.assertEqual(response.status_code, 400)
+
+
+class NDJSONParserTests(SimpleTestCase):
+    def test_one_object_per_line_and_invalid_lines_are_kept(self):
+        rows = NDJSONParser().parse(io.BytesIO(b'{"title": "a"}\n\n{"title": \n{"title": "c"}\n'))
+        self.assertEqual(rows[0], {'title': 'a'})
+        self.assertIsInstance(rows[1], InvalidLine)
+        self.assertEqual(rows[2], {'title': 'c'})
+        self.assertEqual(len(rows), 3)
+
+    def test_undecodable_body(self):
+        with self.assertRaises(ParseError):
+            NDJSONParser().parse(io.BytesIO(b'{"title": "\xff"}\n'))
+
+
+class BulkUploadSongsTests(SimpleTestCase):
+    def test_bad_rows_are_reported_per_index(self):
+        album_id = ObjectId()
+        lines = [
+            {'title': 'ok', 'audio_file': 'https://res.cloudinary.com/demo/a.mp3', 'duration': '00:03:00'},
+            '{broken',
+            {'title': 'no album', 'audio_file': 'https://res.cloudinary.com/demo/b.mp3', 'album_id': str(album_id)},
+            {'title': 'not cloudinary', 'audio_file': 'https://example.com/c.mp3'},
+            [1, 2],
+        ]
+        body = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+        request = RequestFactory().post('/songs/bulk_upload/', body, content_type='application/x-ndjson')
+        with mock.patch.object(songviews.Album.objects, 'in_bulk', return_value={}) as in_bulk, \
+                mock.patch.object(songviews.Song.objects, 'bulk_create') as bulk_create, \
+                mock.patch.object(songviews, 'catalog_search'):
+            response = songviews.bulk_upload_songs(request)
+
+        self.assertEqual(response.status_code, 207)
+        in_bulk.assert_called_once_with([album_id])
+        bulk_create.assert_called_once()
+        self.assertEqual([song.title for song in bulk_create.call_args[0][0]], ['ok'])
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3, 4])
+        self.assertIn('album_id', response.data['errors'][1]['errors'])
+        self.assertIn('audio_file', response.data['errors'][2]['errors'])
+
+    def test_empty_body(self):
+        request = RequestFactory().post('/songs/bulk_upload/', '[]', content_type='application/json')
+        self.assertEqual(songviews.bulk_upload_songs(request).status_code, 400)
+
+
+class LoggingTests(SimpleTestCase):
+    def record(self, level, msg='m', args=(), **extra):
+        record = logging.LogRecord('spotify_app.test', level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_parse_levels(self):
+        self.assertEqual(
+            parse_levels(' spotify_app.middlewares=debug, payment=INFO,bad,x=LOUD,=WARNING'),
+            {'spotify_app.middlewares': 'DEBUG', 'payment': 'INFO'},
+        )
+        self.assertEqual(parse_levels(None), {})
+
+    def test_sampling_keeps_warnings(self):
+        sampler = SamplingFilter(rate=0)
+        self.assertFalse(sampler.filter(self.record(logging.INFO)))
+        self.assertTrue(sampler.filter(self.record(logging.WARNING)))
+        self.assertTrue(SamplingFilter(rate=1).filter(self.record(logging.DEBUG)))
+
+    def test_json_formatter_includes_extra(self):
+        line = JSONFormatter().format(self.record(logging.INFO, 'xin %s', ('chào',), path='/a'))
+        data = json.loads(line)
+        self.assertEqual((data['message'], data['level'], data['path']), ('xin chào', 'INFO', '/a'))
+
+    def test_full_queue_drops_records(self):
+        handler = QueueStreamHandler(stream=io.StringIO())
+        with mock.patch.object(handler.queue, 'put_nowait', side_effect=queue.Full):
+            handler.handle(self.record(logging.INFO))
+        self.assertEqual(handler.dropped, 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MissingSongCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['catalog'].clear()
+        self.song_id = ObjectId()
+
+    def get_song(self, song_objects):
+        with mock.patch.object(songviews.Song, 'objects', song_objects):
+            return songviews.get_song(RequestFactory().get(f'/songs/{self.song_id}/'), str(self.song_id))
+
+    def test_repeated_miss_does_not_query(self):
+        song_objects = mock.MagicMock()
+        song_objects.select_related.return_value.get.side_effect = Song.DoesNotExist
+        self.assertEqual(self.get_song(song_objects).status_code, 404)
+        self.assertEqual(self.get_song(song_objects).status_code, 404)
+        song_objects.select_related.return_value.get.assert_called_once()
+
+    def test_saved_song_is_no_longer_missing(self):
+        song = Song(_id=self.song_id, title='t', audio_file='https://res.cloudinary.com/demo/a.mp3')
+        signals.remember_deleted_song(Song, song)
+        self.assertEqual(self.get_song(mock.MagicMock()).status_code, 404)
+        signals.forget_missing_song(Song, song)
+        song_objects = mock.MagicMock()
+        song_objects.select_related.return_value.get.return_value = song
+        response = self.get_song(song_objects)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 't')
+
+
+def mp3_header(delay, padding, id3_size=0):
+    """Frame MP3 đầu tiên với tag Info + LAME (có thể kèm tag ID3v2 phía trước)."""
+    frame = b'\xff\xfb\x90\x00' + b'\x00' * 32 + b'Info' + b'\x00' * 4 + b'LAME' + b'\x00' * 17
+    frame += bytes([delay >> 4, ((delay & 0x0F) << 4) | (padding >> 8), padding & 0xFF]) + b'\x00' * 64
+    if not id3_size:
+        return frame
+    size = bytes([(id3_size >> shift) & 0x7F for shift in (21, 14, 7, 0)])
+    return b'ID3\x03\x00\x00' + size + b'\x00' * id3_size + frame
+
+
+class AudioHeaderTests(SimpleTestCase):
+    def test_lame_gapless(self):
+        self.assertEqual(audio.read_lame_gapless(io.BytesIO(mp3_header(576, 1152))), (576, 1152))
+
+    def test_lame_gapless_after_id3(self):
+        self.assertEqual(audio.read_lame_gapless(io.BytesIO(mp3_header(529, 1000, id3_size=300))), (529, 1000))
+
+    def test_no_lame_tag(self):
+        self.assertEqual(audio.read_lame_gapless(io.BytesIO(b'\x00' * 200)), (None, None))
+
+    def test_seconds_to_time(self):
+        self.assertEqual(audio.seconds_to_time(225.6), datetime.time(0, 3, 46))
+        self.assertEqual(audio.seconds_to_time(30 * 3600), datetime.time(23, 0, 0))
+
+
+class FakeRangeSession:
+    def __init__(self, data, status_code=206):
+        self.data = data
+        self.status_code = status_code
+        self.ranges = []
+
+    def get(self, url, headers, timeout, stream):
+        start, end = map(int, headers['Range'][len('bytes='):].split('-'))
+        self.ranges.append((start, end))
+        return mock.Mock(
+            status_code=self.status_code,
+            headers={'Content-Range': f'bytes {start}-{end}/{len(self.data)}'},
+            content=self.data[start:end + 1],
+        )
+
+
+class HTTPRangeReaderTests(SimpleTestCase):
+    def test_reads_only_needed_blocks(self):
+        data = bytes(range(256)) * 40
+        session = FakeRangeSession(data)
+        reader = audio.HTTPRangeReader('https://res.cloudinary.com/a.mp3', block_size=1024, session=session)
+        self.assertEqual(reader.size, len(data))
+        self.assertEqual(reader.read(10), data[:10])
+        reader.seek(-20, io.SEEK_END)
+        self.assertEqual(reader.read(), data[-20:])
+        reader.seek(1020)
+        self.assertEqual(reader.read(10), data[1020:1030])
+        self.assertEqual(session.ranges, [(0, 0), (0, 1023), (9216, 10239), (1024, 2047)])
+
+    def test_server_without_range_support(self):
+        with self.assertRaises(audio.AudioProbeError):
+            audio.HTTPRangeReader('https://example.com/a.mp3', session=FakeRangeSession(b'x', status_code=200))
+
+
+class WaveformAnalysisTests(SimpleTestCase):
+    def sine(self, seconds, dbfs, frequency=997):
+        t = np.arange(int(seconds * analysis.SAMPLE_RATE)) / analysis.SAMPLE_RATE
+        wave = (10 ** (dbfs / 20) * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+        return np.stack([wave, wave], axis=1)
+
+    def test_downsample_peaks_keeps_maximum(self):
+        peaks = np.array([0.1, 0.5, 0.2, 0.9, 0.3], dtype=np.float32)
+        self.assertEqual(list(analysis.downsample_peaks(peaks, 2)), [np.float32(0.5), np.float32(0.9)])
+        self.assertIs(analysis.downsample_peaks(peaks, 10), peaks)
+
+    def test_loudness_of_reference_sine(self):
+        analyzer = analysis.WaveformAnalyzer(peak_count=100)
+        frames = self.sine(3.05, -20)
+        # Khối không thẳng hàng với 100 ms để kiểm tra phần carry
+        analyzer.feed(frames[:12345])
+        analyzer.feed(frames[12345:])
+        result = analyzer.result()
+        self.assertAlmostEqual(result.loudness, -20, delta=0.1)
+        self.assertAlmostEqual(result.peak_db, -20, delta=0.1)
+        self.assertAlmostEqual(result.duration, 3.05)
+        self.assertEqual(len(result.peaks), 100)
+
+    def test_silence_has_no_loudness(self):
+        self.assertIsNone(analysis.integrated_loudness(np.zeros(10)))
+        self.assertIsNone(analysis.integrated_loudness(np.ones(3)))
+
+    def test_decode_survives_flood_on_stderr(self):
+        # ffmpeg giả: ghi lỗi theo từng frame (vượt xa buffer pipe) trước khi ghi PCM
+        script = (
+            "import sys\n"
+            "for i in range(20000): sys.stderr.write('Header missing in frame %d\\n' % i)\n"
+            "sys.stderr.flush()\n"
+            "sys.stdout.buffer.write(bytes(8 * 4800))\n"
+            "sys.exit(1)\n"
+        )
+        popen = subprocess.Popen
+
+        def fake_ffmpeg(command, **kwargs):
+            return popen([sys.executable, '-c', script], **kwargs)
+
+        outcome = {}
+
+        def decode():
+            try:
+                outcome['frames'] = sum(len(chunk) for chunk in analysis.decode_pcm('a.mp3'))
+            except analysis.AnalysisError as e:
+                outcome['error'] = str(e)
+
+        with mock.patch.object(analysis.subprocess, 'Popen', side_effect=fake_ffmpeg):
+            worker = threading.Thread(target=decode, daemon=True)
+            worker.start()
+            worker.join(timeout=30)
+        self.assertFalse(worker.is_alive(), 'decode_pcm bị treo')
+        self.assertTrue(outcome['error'].endswith('Header missing in frame 19999'))
+        self.assertLessEqual(len(outcome['error']), analysis.ERROR_TAIL)
+
+
+class AudioSourceTests(SimpleTestCase):
+    def test_only_media_root_and_trusted_hosts(self):
+        url = 'https://res.cloudinary.com/demo/video/upload/a.mp3'
+        self.assertEqual(analysis.audio_source(url), url)
+        for url in ('http://res.cloudinary.com/a.mp3', 'https://169.254.169.254/latest',
+                    'https://res.cloudinary.com@evil.example/a.mp3', 'file:///etc/passwd', 'concat:a|b'):
+            with self.subTest(url=url), self.assertRaises(analysis.AnalysisError):
+                analysis.audio_source(url)
+
+    def test_command_requires_ffmpeg(self):
+        with mock.patch('spotify_app.management.commands.analyze_songs.ffmpeg_path', return_value=None), \
+                self.assertRaisesMessage(CommandError, 'ffmpeg'):
+            call_command('analyze_songs')
+
+
+class TempoTests(SimpleTestCase):
+    def clicks(self, bpm, seconds=12):
+        samples = np.zeros(int(seconds * tempo.SAMPLE_RATE), dtype=np.float32)
+        t = np.arange(400) / tempo.SAMPLE_RATE
+        click = (np.sin(2 * np.pi * 1000 * t) * np.exp(-t * 200)).astype(np.float32)
+        for start in np.arange(0, seconds - 0.1, 60 / bpm):
+            index = int(start * tempo.SAMPLE_RATE)
+            samples[index:index + len(click)] += click
+        return samples
+
+    def test_click_track_tempo(self):
+        for bpm in (90, 128):
+            with self.subTest(bpm=bpm):
+                analyzer = tempo.TempoAnalyzer()
+                samples = self.clicks(bpm)
+                for start in range(0, len(samples), 30000):
+                    analyzer.feed(samples[start:start + 30000])
+                self.assertAlmostEqual(analyzer.result().bpm, bpm, delta=1.5)
+
+    def test_too_short(self):
+        self.assertEqual(tempo.estimate_bpm(np.ones(10)), (None, 0.0))
+
+    def test_key_from_chroma(self):
+        chroma = np.zeros(12)
+        chroma[[0, 4, 7]] = 1   # C, E, G
+        self.assertEqual(tempo.estimate_key(chroma), 'C major')
+        chroma = np.zeros(12)
+        chroma[[9, 0, 4]] = 1   # A, C, E
+        self.assertEqual(tempo.estimate_key(chroma), 'A minor')
+        self.assertIsNone(tempo.estimate_key(np.zeros(12)))
+
+
+class AnalyzeTempoCommandTests(SimpleTestCase):
+    def test_failed_future_is_counted(self):
+        command = analyze_tempo.Command(stdout=io.StringIO(), stderr=io.StringIO())
+        broken, empty = mock.Mock(), mock.Mock()
+        broken.result.side_effect = RuntimeError('worker died')
+        empty.result.return_value = ('s1', None, 'ffmpeg exit 1')
+        self.assertEqual(command._save([broken, empty], 0, 0), (0, 2))
+
+    def test_ensure_indexes_creates_bpm_index(self):
+        with mock.patch.object(signals.Song, 'objects') as song_objects:
+            signals.ensure_indexes(sender=apps.get_app_config('spotify_app'))
+        song_objects.mongo_create_index.assert_any_call('bpm')
+        song_objects.mongo_create_index.assert_any_call([('created_at', 1), ('_id', 1)])
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+        self.assertEqual(parse_range('bytes=990-5000', 1000), (990, 999))
+
+    def test_whole_file(self):
+        for header in (None, '', 'bytes=-', 'bytes=0-1,5-6', 'items=0-1'):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=1000-', 'bytes=5-1', 'bytes=-0'):
+            with self.subTest(header=header):
+                self.assertIs(parse_range(header, 1000), False)
+        self.assertIs(parse_range('bytes=-10', 0), False)
+
+
+class RangedFileResponseTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.mp3')
+        os.write(handle, bytes(range(256)) * 4)
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.factory = RequestFactory()
+
+    def body(self, response):
+        data = b''.join(response.streaming_content)
+        response.close()
+        return data
+
+    def test_partial_content(self):
+        response = ranged_file_response(self.factory.get('/', HTTP_RANGE='bytes=10-19'), self.path)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.body(response), bytes(range(10, 20)))
+
+    def test_etag_and_if_range(self):
+        response = ranged_file_response(self.factory.get('/'), self.path)
+        etag = response['ETag']
+        self.assertEqual(len(self.body(response)), 1024)
+        not_modified = ranged_file_response(self.factory.get('/', HTTP_IF_NONE_MATCH=f'W/{etag}'), self.path)
+        self.assertEqual(not_modified.status_code, 304)
+        stale = ranged_file_response(self.factory.get('/', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"'), self.path)
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(len(self.body(stale)), 1024)
+
+    def test_unsatisfiable_range(self):
+        response = ranged_file_response(self.factory.get('/', HTTP_RANGE='bytes=2000-'), self.path)
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_file_slice_stops_at_length(self):
+        with open(self.path, 'rb') as fileobj:
+            part = FileSlice(fileobj, 1000, 30)
+            self.assertEqual(part.read(8), bytes(range(232, 240)))
+            self.assertEqual(len(part.read()), 16)
+            self.assertEqual(part.read(), b'')
+
+
+def mp3_frame(padding=0):
+    """Frame MPEG-1 Layer III, 128 kbps, 44.1 kHz (417 byte, 418 nếu có padding)."""
+    header = bytes([0xFF, 0xFB, 0x90 | (padding << 1), 0x00])
+    return header + b'\x00' * (417 + padding - 4)
+
+
+class HLSTests(SimpleTestCase):
+    def test_parse_frame_header(self):
+        self.assertEqual(hls.parse_frame_header(b'\xff\xfb\x90\x00'), (417, 1152, 44100, 3, 3))
+        self.assertEqual(hls.parse_frame_header(b'\xff\xfb\x92\x00')[0], 418)
+        # MPEG-2 Layer III 64 kbps 22.05 kHz: 576 sample/frame
+        self.assertEqual(hls.parse_frame_header(b'\xff\xf3\x80\x00'), (208, 576, 22050, 2, 3))
+        for header in (b'\x00\xfb\x90\x00', b'\xff\xfb\xf0\x00', b'\xff\xfb\x9c\x00', b'\xff\xfb'):
+            with self.subTest(header=header):
+                self.assertIsNone(hls.parse_frame_header(header))
+
+    def test_frames_skip_info_frame_and_garbage(self):
+        info = bytearray(mp3_frame())
+        info[36:40] = b'Info'
+        data = bytes(info) + mp3_frame() + mp3_frame(padding=1) + b'junk' + mp3_frame()
+        frames = list(hls.iter_frames(io.BytesIO(data)))
+        self.assertEqual([(frame.offset, frame.length) for frame in frames], [(417, 417), (834, 418), (1256, 417)])
+
+    def test_segments_split_on_duration_and_gaps(self):
+        frames = [hls.Frame(i * 417, 417, 1152, 44100) for i in range(5)]
+        frames.append(hls.Frame(5 * 417 + 10, 417, 1152, 44100))
+        segments = hls.build_segments(frames, target_seconds=0.05)
+        self.assertEqual([(s.start, s.end) for s in segments], [(0, 834), (834, 1668), (1668, 2085), (2095, 2512)])
+        self.assertEqual([s.start_sample for s in segments], [0, 2304, 4608, 5760])
+
+    def test_evict_skips_directory_removed_mid_scan(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = hls.SegmentCache(root, max_bytes=10)
+            for song_id in ('a', 'b'):
+                os.makedirs(os.path.join(root, song_id, 'v1'))
+                with open(os.path.join(root, song_id, 'v1', '0.mp3'), 'wb') as fileobj:
+                    fileobj.write(b'x' * 100)
+            scandir = os.scandir
+            gone = os.path.join(root, 'a', 'v1')
+
+            def racing_scandir(path):
+                # Thư mục bị worker khác rmtree giữa lúc liệt kê và lúc đọc
+                if path == gone:
+                    raise FileNotFoundError(path)
+                return scandir(path)
+
+            with mock.patch.object(hls.os, 'scandir', side_effect=racing_scandir):
+                cache.evict()
+            self.assertFalse(os.path.exists(os.path.join(root, 'b')))
+            self.assertTrue(os.path.exists(gone))
+
+    def test_render_playlist(self):
+        segments = [hls.Segment(0, 10, 6.02, 0, 44100), hls.Segment(10, 20, 3.5, 265482, 44100)]
+        body = hls.render_playlist(segments, lambda index: f'v1/{index}.mp3')
+        self.assertIn('#EXT-X-TARGETDURATION:7\n', body)
+        self.assertIn('#EXTINF:6.020,\nv1/0.mp3\n#EXTINF:3.500,\nv1/1.mp3\n#EXT-X-ENDLIST\n', body)
+
+
+class HLSSegmentViewTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.mp3')
+        os.write(handle, mp3_frame())
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.song_id = str(ObjectId())
+
+    def get(self, paths):
+        with mock.patch.object(mediaviews, '_song_media_or_error', return_value=('https://res.cloudinary.com/a.mp3', None)), \
+                mock.patch.object(mediaviews, 'media_version', return_value='v1'), \
+                mock.patch.object(mediaviews.segment_cache, 'segment_path', side_effect=paths) as segment_path:
+            response = mediaviews.song_hls_segment(RequestFactory().get('/'), self.song_id, 'v1', 0)
+        return response, segment_path
+
+    def test_segment_evicted_before_send_is_cut_again(self):
+        response, segment_path = self.get([('v1', self.path + '.evicted'), ('v1', self.path)])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(segment_path.call_count, 2)
+        response.close()
+
+    def test_segment_evicted_twice(self):
+        response, _ = self.get([('v1', self.path + '.evicted')] * 2)
+        self.assertEqual(response.status_code, 404)
+
+
+class ImageVariantsTests(SimpleTestCase):
+    url = 'https://res.cloudinary.com/demo/image/upload/v1714123456/albums/cover.jpg'
+
+    def test_one_url_template_per_image(self):
+        with mock.patch.object(images, 'placeholder', return_value='LKO2?U%2Tw=w') as placeholder:
+            data = images.image_variants(self.url)
+        placeholder.assert_called_once_with(self.url, images.source_key(self.url), False)
+        self.assertTrue(data['url'].endswith('/{size}.{fmt}'))
+        self.assertEqual(data['sizes'], images.SIZES)
+        token = data['url'].split('/')[-2]
+        self.assertEqual(images.read_token(token), (self.url, images.source_key(self.url)[:images.VERSION_CHARS]))
+        self.assertLess(len(json.dumps(data)), 500)
+
+    def test_untrusted_sources_get_no_variants(self):
+        with mock.patch.object(images, 'placeholder') as placeholder:
+            for url in ('http://169.254.169.254/latest/meta-data', 'https://example.com/a.jpg', 'file:///etc/passwd'):
+                with self.subTest(url=url):
+                    self.assertIsNone(images.image_variants(url))
+        placeholder.assert_not_called()
+        with mock.patch.object(images.requests, 'get') as get, self.assertRaises(images.ImageVariantError):
+            images._fetch('https://example.com/a.jpg')
+        get.assert_not_called()
+
+    def test_invalid_tokens(self):
+        old_format = signing.dumps({'u': self.url, 'k': 'x'}, salt=images.TOKEN_SALT)
+        for token in (old_format, images.make_token(self.url, 'abc') + 'x'):
+            with self.subTest(token=token), self.assertRaises(signing.BadSignature):
+                images.read_token(token)
+        response = mediaviews.image_variant(RequestFactory().get('/'), old_format, 'thumb', 'webp')
+        self.assertEqual(response.status_code, 404)
+
+    def serialize(self, urls, many):
+        class CoverSerializer(serializers.Serializer):
+            cover_img_variants = images.ImageVariantsField(source='cover_img')
+
+        rows = [{'cover_img': url} for url in urls]
+        with mock.patch.object(images, '_get_executor') as executor, \
+                mock.patch.object(images, '_pending', set()), \
+                mock.patch.object(images, 'cache_dir', return_value=os.path.join(tempfile.gettempdir(), 'no-variants')):
+            data = CoverSerializer(rows, many=True).data if many else CoverSerializer(rows[0]).data
+        return data, executor.return_value.submit
+
+    def test_lists_never_schedule_warming(self):
+        urls = [self.url.replace('cover', f'cover{i}') for i in range(5)]
+        data, submit = self.serialize(urls, many=True)
+        self.assertEqual(len(data), 5)
+        self.assertIsNone(data[0]['cover_img_variants']['blurhash'])
+        submit.assert_not_called()
+
+    def test_single_object_schedules_warming(self):
+        _, submit = self.serialize([self.url], many=False)
+        submit.assert_called_once_with(images._warm, self.url, images.source_key(self.url))
+
+    def test_pending_queue_is_bounded(self):
+        with mock.patch.object(images, '_get_executor') as executor, \
+                mock.patch.object(images, '_pending', set()), \
+                mock.patch.object(images, 'MAX_PENDING', 3):
+            for i in range(10):
+                images.schedule_variants(f'{self.url}?{i}', f'key{i}')
+            self.assertEqual(len(images._pending), 3)
+        self.assertEqual(executor.return_value.submit.call_count, 3)
+
+    def test_url_template_is_signed_once(self):
+        with mock.patch.object(images, 'placeholder', return_value=None), \
+                mock.patch.object(images, '_templates', OrderedDict()), \
+                mock.patch.object(images, 'make_token', wraps=images.make_token) as make_token:
+            first = images.image_variants(self.url)
+            second = images.image_variants(self.url)
+        self.assertEqual(first, second)
+        make_token.assert_called_once()
+
+    def test_stale_version_is_rejected_before_fetching(self):
+        token = images.make_token(self.url, '0' * 64)
+        with mock.patch.object(mediaviews, 'ensure_variants') as ensure_variants:
+            response = mediaviews.image_variant(RequestFactory().get('/'), token, 'thumb', 'webp')
+        self.assertEqual(response.status_code, 404)
+        ensure_variants.assert_not_called()
+
+
+class PlaylistBatchAddTests(SimpleTestCase):
+    def setUp(self):
+        self.playlist_id = ObjectId()
+        self.songs = [ObjectId() for _ in range(4)]
+
+    def post(self, body, existing=(), duplicates=()):
+        view = playlist_songviews
+        playlist_objects, song_objects, playlist_song_objects = mock.MagicMock(), mock.MagicMock(), mock.MagicMock()
+        playlist_objects.filter.return_value.exists.return_value = True
+        song_objects.filter.return_value.values_list.return_value = [
+            (song_id, datetime.time(0, 3)) for song_id in self.songs[:3]
+        ]
+        playlist_song_objects.filter.return_value.values_list.return_value = list(existing)
+        with mock.patch.object(view.Playlist, 'objects', playlist_objects), \
+                mock.patch.object(view.Song, 'objects', song_objects), \
+                mock.patch.object(view.PlaylistSong, 'objects', playlist_song_objects), \
+                mock.patch.object(view, 'last_position', return_value='a5'), \
+                mock.patch.object(view, 'insert_many_ignore_duplicates', return_value=set(duplicates)) as insert, \
+                mock.patch.object(view, 'inc_playlist') as inc_playlist, \
+                mock.patch.object(view, 'record_changes'):
+            response = view.add_songs_to_playlist_batch(
+                RequestFactory().post('/', body, content_type='application/json'), str(self.playlist_id)
+            )
+        return response, insert, inc_playlist
+
+    def test_appends_new_songs_in_request_order(self):
+        ids = [str(song_id) for song_id in self.songs]
+        response, insert, inc_playlist = self.post(
+            {'song_ids': [ids[2], 'bad', ids[0], ids[2], ids[1], ids[3]]}, existing=[self.songs[1]],
+        )
+        self.assertEqual(response.status_code, 201)
+        docs = insert.call_args[0][1]
+        self.assertEqual([doc['song_id'] for doc in docs], [self.songs[2], self.songs[0]])
+        self.assertTrue('a5' < docs[0]['position'] < docs[1]['position'])
+        self.assertEqual(response.data['skipped'], [ids[1]])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 5])
+        inc_playlist.assert_called_once_with(self.playlist_id, 2, 360)
+
+    def test_concurrent_duplicates_are_skipped(self):
+        ids = [str(song_id) for song_id in self.songs[:2]]
+        response, _, inc_playlist = self.post({'song_ids': ids}, duplicates={1})
+        self.assertEqual([song['song_id'] for song in response.data['added']], ids[:1])
+        self.assertEqual(response.data['skipped'], ids[1:])
+        inc_playlist.assert_called_once_with(self.playlist_id, 1, 180)
+
+    def test_body_must_be_an_object(self):
+        response, insert, _ = self.post([str(self.songs[0])])
+        self.assertEqual(response.status_code, 400)
+        insert.assert_not_called()
+
+
+class CountersTests(SimpleTestCase):
+    def test_duration_seconds(self):
+        self.assertEqual(counters.duration_seconds(datetime.time(1, 2, 3)), 3723)
+        self.assertEqual(counters.duration_seconds(None), 0)
+
+    def test_inc_is_one_atomic_update(self):
+        ids = [ObjectId(), ObjectId()]
+        with mock.patch.object(counters.Playlist, 'objects') as objects:
+            counters.inc_playlists(ids + [None], tracks=-1, seconds=-200)
+        objects.mongo_update_many.assert_called_once_with(
+            {'_id': {'$in': ids}}, {'$inc': {'track_count': -1, 'total_duration': -200}}
+        )
+
+    def test_zero_changes_are_skipped(self):
+        with mock.patch.object(counters.Playlist, 'objects') as objects:
+            counters.inc_playlist(ObjectId(), tracks=0, seconds=0)
+            counters.inc_playlist(None, tracks=1)
+        objects.mongo_update_many.assert_not_called()
+        album_id = ObjectId()
+        with mock.patch.object(counters.Album, 'objects') as objects, \
+                mock.patch.object(counters, 'catalog_cache') as cache:
+            counters.inc_album(album_id, tracks=1)
+        objects.mongo_update_many.assert_called_once_with({'_id': {'$in': [album_id]}}, {'$inc': {'total_tracks': 1}})
+        cache.invalidate.assert_called_once_with('album', album_id)
+
+    def test_recount_playlist_sets_counters_from_rows(self):
+        playlist_id, song_ids = ObjectId(), [ObjectId(), ObjectId()]
+        with mock.patch.object(counters.PlaylistSong, 'objects') as rows, \
+                mock.patch.object(counters.Song, 'objects') as songs, \
+                mock.patch.object(counters.Playlist, 'objects') as playlists:
+            rows.filter.return_value.values_list.return_value = song_ids
+            songs.filter.return_value.values_list.return_value = [datetime.time(0, 3, 0), None]
+            self.assertEqual(counters.recount_playlist(playlist_id), (2, 180))
+        songs.filter.assert_called_once_with(_id__in=song_ids)
+        playlists.mongo_update_one.assert_called_once_with(
+            {'_id': playlist_id}, {'$set': {'track_count': 2, 'total_duration': 180}}
+        )
+
+
+class SnapshotTests(SimpleTestCase):
+    def changes(self, rows):
+        objects = mock.Mock()
+        objects.filter.return_value.order_by.return_value.values.return_value = rows
+        return mock.patch.object(snapshots.PlaylistChange, 'objects', objects)
+
+    def test_playlist_etag(self):
+        playlist_id = ObjectId()
+        self.assertEqual(snapshots.playlist_etag(playlist_id, 7), f'W/"{playlist_id}:7"')
+
+    def test_changes_since_returns_contiguous_run(self):
+        rows = [{'version': 4, 'op': 'add'}, {'version': 5, 'op': 'remove'}, {'version': 7, 'op': 'add'}]
+        with self.changes(rows):
+            changes = snapshots.changes_since(ObjectId(), 3, 7)
+        self.assertEqual([row['version'] for row in changes], [4, 5])
+
+    def test_changes_since_starts_at_gap(self):
+        with self.changes([{'version': 5, 'op': 'add'}]):
+            self.assertEqual(snapshots.changes_since(ObjectId(), 3, 5), [])
+
+    def test_changes_since_truncated_log(self):
+        with self.changes([]) as objects:
+            self.assertIsNone(snapshots.changes_since(ObjectId(), 1, 2 + snapshots.CHANGE_LOG_MAX))
+        objects.filter.assert_not_called()
+
+    def test_record_changes_many_writes_log_once(self):
+        first, second, gone = ObjectId(), ObjectId(), ObjectId()
+        versions = {first: 3, second: snapshots.CHANGE_LOG_MAX + 2}
+        with mock.patch.object(snapshots.Playlist, 'objects') as playlists, \
+                mock.patch.object(snapshots.PlaylistChange, 'objects') as changes:
+            playlists.mongo_find_one_and_update.side_effect = (
+                lambda query, *args, **kwargs: {'snapshot_id': versions[query['_id']]} if query['_id'] in versions else None
+            )
+            result = snapshots.record_changes_many({
+                first: [('remove', 'a', None), ('remove', 'b', None)],
+                second: [('remove', 'a', None)],
+                gone: [('remove', 'a', None)],
+            })
+        self.assertEqual(result, versions)
+        documents = changes.mongo_insert_many.call_args[0][0]
+        self.assertEqual(
+            [(doc['playlist_id'], doc['version'], doc['song_id']) for doc in documents],
+            [(first, 2, 'a'), (first, 3, 'b'), (second, snapshots.CHANGE_LOG_MAX + 2, 'a')],
+        )
+        changes.mongo_delete_many.assert_called_once_with(
+            {'$or': [{'playlist_id': second, 'version': {'$lte': 2}}]}
+        )
+
+
+class CascadeDeleteTests(SimpleTestCase):
+    def setUp(self):
+        patches = {name: mock.patch.object(signals, name) for name in (
+            'inc_playlist', 'inc_each_playlist', 'record_change', 'record_changes_many', 'inc_album',
+        )}
+        self.mocks = {name: patch.start() for name, patch in patches.items()}
+        self.addCleanup(mock.patch.stopall)
+
+    def remove_rows(self, rows):
+        for playlist_id, song_id in rows:
+            row = PlaylistSong(playlist_id=playlist_id, song_id=song_id)
+            signals.decrement_playlist_counters(PlaylistSong, row)
+            signals.record_playlist_song_removed(PlaylistSong, row)
+
+    def test_playlist_delete_skips_rows(self):
+        playlist = Playlist(_id=ObjectId())
+        signals.mark_deleted_playlist(Playlist, playlist)
+        with mock.patch.object(signals.PlaylistChange, 'objects'):
+            self.remove_rows([(playlist._id, ObjectId()), (playlist._id, ObjectId())])
+            signals.drop_playlist_changes(Playlist, playlist)
+        self.mocks['inc_playlist'].assert_not_called()
+        self.mocks['record_change'].assert_not_called()
+        self.assertNotIn(playlist._id, signals._cascade_state().playlists)
+
+    def test_song_delete_groups_per_playlist(self):
+        first = Song(_id=ObjectId(), duration=datetime.time(0, 3, 0))
+        second = Song(_id=ObjectId(), duration=datetime.time(0, 2, 0))
+        playlist_a, playlist_b = ObjectId(), ObjectId()
+        for song in (first, second):
+            signals.mark_deleted_song(Song, song)
+        self.remove_rows([(playlist_a, first._id), (playlist_a, second._id), (playlist_b, first._id)])
+        for song in (first, second):
+            signals.flush_removed_playlist_songs(Song, song)
+        self.mocks['inc_playlist'].assert_not_called()
+        self.mocks['record_change'].assert_not_called()
+        self.mocks['inc_each_playlist'].assert_called_once_with({playlist_a: (-2, -300), playlist_b: (-1, -180)})
+        self.mocks['record_changes_many'].assert_called_once_with({
+            playlist_a: [('remove', first._id, None), ('remove', second._id, None)],
+            playlist_b: [('remove', first._id, None)],
+        })
+        self.assertEqual(signals._cascade_state().songs, {})
+
+    def test_single_row_delete_is_unchanged(self):
+        playlist_id, song_id = ObjectId(), ObjectId()
+        with mock.patch.object(signals.Song, 'objects') as objects:
+            objects.filter.return_value.values_list.return_value.first.return_value = datetime.time(0, 1, 0)
+            self.remove_rows([(playlist_id, song_id)])
+        self.mocks['inc_playlist'].assert_called_once_with(playlist_id, -1, -60)
+        self.mocks['record_change'].assert_called_once_with(playlist_id, 'remove', song_id)
+
+    def test_inc_each_playlist_is_one_bulk_write(self):
+        playlist_a, playlist_b = ObjectId(), ObjectId()
+        with mock.patch.object(counters.Playlist, 'objects') as objects:
+            counters.inc_each_playlist({playlist_a: (-2, -300), playlist_b: (0, 0), None: (-1, -1)})
+        operations = objects.mongo_bulk_write.call_args[0][0]
+        self.assertEqual(
+            [(op._filter, op._doc) for op in operations],
+            [({'_id': playlist_a}, {'$inc': {'track_count': -2, 'total_duration': -300}})],
+        )
+
+
+class ClonePlaylistTests(SimpleTestCase):
+    def setUp(self):
+        self.source = Playlist(_id=ObjectId(), name='Mix', track_count=99, total_duration=9999)
+        self.user = mock.Mock(_id=ObjectId())
+        self.clone = mock.MagicMock(_id=ObjectId(), track_count=0, total_duration=0)
+        self.clone.name = 'Mix (copy)'
+
+    def post(self, copy_error=None):
+        view = playlistviews
+        playlist_objects, user_objects = mock.MagicMock(), mock.MagicMock()
+        playlist_objects.filter.return_value.first.return_value = self.source
+        playlist_objects.create.return_value = self.clone
+        user_objects.filter.return_value.first.return_value = self.user
+        with mock.patch.object(view.Playlist, 'objects', playlist_objects), \
+                mock.patch.object(view.User, 'objects', user_objects), \
+                mock.patch.object(view, '_copy_playlist_songs', side_effect=copy_error) as copy, \
+                mock.patch.object(view, 'recount_playlist', return_value=(3, 540)) as recount:
+            response = view.clone_playlist(
+                RequestFactory().post('/', {'user_id': str(self.user._id)}, content_type='application/json'),
+                str(self.source._id),
+            )
+        return response, playlist_objects, copy, recount
+
+    def test_counters_come_from_copied_rows(self):
+        response, playlist_objects, copy, recount = self.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('track_count', playlist_objects.create.call_args[1])
+        copy.assert_called_once_with(self.source._id, self.clone._id)
+        recount.assert_called_once_with(self.clone._id)
+        self.assertEqual((response.data['playlist']['track_count'], response.data['playlist']['total_duration']), (3, 540))
+
+    def test_failed_copy_deletes_clone(self):
+        with self.assertLogs('spotify_app.playlistviews', 'ERROR'):
+            response, _, _, recount = self.post(copy_error=RuntimeError('boom'))
+        self.assertEqual(response.status_code, 500)
+        self.clone.delete.assert_called_once_with()
+        recount.assert_not_called()
+
+    def test_copy_uses_python_timestamp(self):
+        source_id, target_id = ObjectId(), ObjectId()
+        with mock.patch.object(playlistviews.PlaylistSong, 'objects') as objects:
+            playlistviews._copy_playlist_songs(source_id, target_id)
+        stages = objects.mongo_aggregate.call_args[0][0]
+        added_at = stages[1]['$project']['added_at']['$literal']
+        self.assertIsInstance(added_at, datetime.datetime)
+        self.assertNotIn('$$NOW', json.dumps(stages, default=str))
+        self.assertIn('$merge', stages[-1])
+
+    def test_copy_falls_back_to_batches(self):
+        rows = [{'playlist_id': ObjectId(), 'song_id': ObjectId(), 'position': 'a'} for _ in range(3)]
+        with mock.patch.object(playlistviews.PlaylistSong, 'objects') as objects, \
+                mock.patch.object(playlistviews, 'CLONE_BATCH_SIZE', 2):
+            objects.mongo_aggregate.side_effect = [playlistviews.OperationFailure('no $merge'), iter(rows)]
+            playlistviews._copy_playlist_songs(ObjectId(), ObjectId())
+        batches = [call[0][0] for call in objects.mongo_insert_many.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertTrue(all(isinstance(doc['_id'], ObjectId) for batch in batches for doc in batch))
+
+
+class FakeSetRedis:
+    """Redis tối thiểu cho MemberSetCache: set, chuỗi, TTL, pipeline và WATCH."""
+
+    def __init__(self):
+        self.sets = {}
+        self.values = {}
+        self.ttls = {}
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def delete(self, *keys):
+        if self.down:
+            raise RedisConnectionError('down')
+        for key in keys:
+            self.sets.pop(key, None)
+            self.values.pop(key, None)
+            self.ttls.pop(key, None)
+
+    def get(self, key):
+        if self.down:
+            raise RedisConnectionError('down')
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+
+    def srem(self, key, *members):
+        self.sets.get(key, set()).difference_update(members)
+
+    def sismember(self, key, member):
+        return member in self.sets.get(key, ())
+
+    def expire(self, key, ttl):
+        if key in self.sets or key in self.values:
+            self.ttls[key] = ttl
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+        self.watched = {}
+        self.immediate = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, command):
+        return lambda *args: self.calls.append((command, args))
+
+    def watch(self, *keys):
+        self.watched = {key: self.redis.get(key) for key in keys}
+        self.immediate = True
+
+    def get(self, key):
+        if self.immediate:
+            return self.redis.get(key)
+        self.calls.append(('get', (key,)))
+
+    def multi(self):
+        self.immediate = False
+
+    def execute(self):
+        if self.redis.down:
+            raise RedisConnectionError('down')
+        if any(self.redis.values.get(key) != value for key, value in self.watched.items()):
+            raise WatchError('watched key changed')
+        return [getattr(FakeSetRedis, command)(self.redis, *args) for command, args in self.calls]
+
+
+class MemberSetCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = FakeSetRedis()
+        patcher = mock.patch('spotify_app.cache.get_redis_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.liked = MemberSetCache('liked_songs', ttl=60)
+        self.user_id, self.songs = ObjectId(), [ObjectId() for _ in range(3)]
+
+    def fill(self, members):
+        return self.liked.load(self.user_id, members, self.liked.begin(self.user_id))
+
+    def test_unloaded_until_load(self):
+        self.assertIsNone(self.liked.contains(self.user_id, self.songs))
+        self.fill([])
+        self.assertEqual(self.liked.contains(self.user_id, self.songs), [False] * 3)
+        self.fill(self.songs[:1])
+        self.assertEqual(self.liked.contains(self.user_id, self.songs), [True, False, False])
+        self.assertEqual(list(self.redis.ttls.values()), [60])
+
+    def test_add_and_remove_update_loaded_set(self):
+        self.fill(self.songs[:1])
+        self.liked.add(self.user_id, self.songs[2])
+        self.liked.remove(self.user_id, self.songs[0])
+        self.assertEqual(self.liked.contains(self.user_id, self.songs), [False, False, True])
+
+    def test_like_between_db_read_and_load_is_not_lost(self):
+        token = self.liked.begin(self.user_id)
+        # Ảnh chụp DB chưa có songs[0]; user thích bài đó trước khi load()
+        self.liked.add(self.user_id, self.songs[0])
+        self.assertFalse(self.liked.load(self.user_id, [], token))
+        self.assertIsNone(self.liked.contains(self.user_id, self.songs))
+        self.assertTrue(self.fill(self.songs[:1]))
+        self.assertEqual(self.liked.contains(self.user_id, self.songs), [True, False, False])
+
+    def test_unlike_between_db_read_and_load_is_not_lost(self):
+        token = self.liked.begin(self.user_id)
+        self.liked.remove(self.user_id, self.songs[0])
+        self.assertFalse(self.liked.load(self.user_id, self.songs[:1], token))
+        self.assertIsNone(self.liked.contains(self.user_id, self.songs))
+
+    def test_add_to_unloaded_set_stays_unloaded(self):
+        self.liked.add(self.user_id, self.songs[0])
+        self.assertIsNone(self.liked.contains(self.user_id, self.songs))
+
+    def test_redis_errors_act_as_empty_cache(self):
+        self.fill(self.songs)
+        self.redis.down = True
+        with self.assertLogs('spotify_app.cache', 'WARNING'):
+            self.assertIsNone(self.liked.contains(self.user_id, self.songs))
+            self.fill([])
+            self.liked.remove(self.user_id, self.songs[0])
+
+    def test_signals_update_set(self):
+        self.fill([])
+        favorite = FavoriteSong(user_id=self.user_id, song_id=self.songs[1])
+        with mock.patch.object(signals, 'liked_songs', self.liked):
+            signals.add_liked_song(FavoriteSong, favorite, created=True)
+            self.assertEqual(self.liked.contains(self.user_id, self.songs), [False, True, False])
+            signals.remove_liked_song(FavoriteSong, favorite)
+        self.assertEqual(self.liked.contains(self.user_id, self.songs), [False] * 3)
+
+
+class PlaylistMoveTests(SimpleTestCase):
+    def setUp(self):
+        self.playlist_id = ObjectId()
+        self.first, self.second, self.moving = ObjectId(), ObjectId(), ObjectId()
+        self.positions = {self.first: 'a0', self.second: 'a1', self.moving: 'a2'}
+        self.updates = []
+
+    def rows(self):
+        others = sorted(position for song_id, position in self.positions.items() if song_id != self.moving)
+
+        def first(value):
+            return mock.Mock(first=mock.Mock(return_value=value))
+
+        ascending, descending = mock.MagicMock(), mock.MagicMock()
+        ascending.first.return_value = others[0]
+        ascending.filter.side_effect = lambda position__gt: first(next((p for p in others if p > position__gt), None))
+        descending.first.return_value = others[-1]
+        descending.filter.side_effect = lambda position__lt: first(max((p for p in others if p < position__lt), default=None))
+        playlist_rows = mock.MagicMock()
+        ordered = {'position': ascending, '-position': descending}
+        playlist_rows.exclude.return_value.exclude.return_value.order_by.side_effect = (
+            lambda field: mock.Mock(values_list=mock.Mock(return_value=ordered[field]))
+        )
+
+        def filter_rows(playlist, song=None):
+            if song is None:
+                return playlist_rows
+            row = mock.MagicMock()
+            row.values_list.return_value.first.return_value = self.positions.get(song)
+            row.update.side_effect = lambda position: self.updates.append((song, position)) or 1
+            return row
+
+        objects = mock.MagicMock()
+        objects.filter.side_effect = filter_rows
+        return objects
+
+    def move(self, body):
+        view = playlist_songviews
+        with mock.patch.object(view.PlaylistSong, 'objects', self.rows()), \
+                mock.patch.object(view, 'record_change', return_value=8) as record_change:
+            response = view.move_song_in_playlist(
+                RequestFactory().post('/', body, content_type='application/json'),
+                str(self.playlist_id), str(self.moving),
+            )
+        return response, record_change
+
+    def assert_moved_between(self, response, low, high):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.updates), 1)
+        song_id, position = self.updates[0]
+        self.assertEqual(song_id, self.moving)
+        self.assertEqual(response.data['position'], position)
+        self.assertTrue((low is None or low < position) and (high is None or position < high))
+
+    def test_after_song(self):
+        response, record_change = self.move({'after_song_id': str(self.first)})
+        self.assert_moved_between(response, 'a0', 'a1')
+        record_change.assert_called_once_with(self.playlist_id, 'move', self.moving, response.data['position'])
+
+    def test_before_song(self):
+        response, _ = self.move({'before_song_id': str(self.first)})
+        self.assert_moved_between(response, None, 'a0')
+
+    def test_to_start_and_end(self):
+        response, _ = self.move({'to': 'start'})
+        self.assert_moved_between(response, None, 'a0')
+        self.updates = []
+        response, _ = self.move({'to': 'end'})
+        self.assert_moved_between(response, 'a1', None)
+
+    def test_missing_anchor(self):
+        response, record_change = self.move({'after_song_id': str(ObjectId())})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.updates, [])
+        record_change.assert_not_called()
+
+
+class PlaylistSnapshotViewTests(SimpleTestCase):
+    def setUp(self):
+        self.playlist = Playlist(_id=ObjectId(), snapshot_id=7)
+
+    def test_matching_etag_returns_304_without_reading_songs(self):
+        view = playlist_songviews
+        etag = f'W/"{self.playlist._id}:7"'
+        with mock.patch.object(view.Playlist, 'objects') as playlists, \
+                mock.patch.object(view.PlaylistSong, 'objects') as rows:
+            playlists.get.return_value = self.playlist
+            request = RequestFactory().get('/', HTTP_IF_NONE_MATCH=f'W/"other:1", {etag}')
+            response = view.get_songs_in_playlist(request, str(self.playlist._id))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(rows.mock_calls)
+
+    def changes(self, since, log=()):
+        view = playlist_songviews
+        with mock.patch.object(view.Playlist, 'objects') as playlists, \
+                mock.patch.object(view, 'changes_since', return_value=log) as changes_since:
+            playlists.filter.return_value.values_list.return_value.first.return_value = self.playlist.snapshot_id
+            response = view.get_playlist_changes(
+                RequestFactory().get('/', {'since': since}), str(self.playlist._id)
+            )
+        return response, changes_since
+
+    def test_since_ahead_of_current(self):
+        response, changes_since = self.changes(8)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['snapshot_id'], 7)
+        changes_since.assert_not_called()
+
+    def test_truncated_log(self):
+        response, _ = self.changes(1, log=None)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.data['snapshot_id'], 7)
+
+    def test_changes_after_since(self):
+        response, changes_since = self.changes(5, log=[{'version': 6, 'op': 'add'}])
+        changes_since.assert_called_once_with(self.playlist._id, 5, 7)
+        self.assertEqual((response.data['since'], response.data['snapshot_id']), (5, 6))
@@ -5,23 +5,34 @@ from . import playlistviews
 from . import playlist_songviews
 from . import artistviews
 from . import followviews
+from . import searchviews
+from . import mediaviews
 app_name = 'spotify_app'
 urlpatterns = [
     # SONG
     path('songs/', songviews.list_songs, name='list_songs'),
     path('songs/upload/', songviews.upload_song, name='upload_song'),
+    path('songs/bulk_upload/', songviews.bulk_upload_songs, name='bulk_upload_songs'),
     path('songs/<str:song_id>/', songviews.get_song, name='get_song'),
     path('songs/<str:song_id>/update/', songviews.update_song, name='update_song'),
     path('songs/<str:song_id>/delete/', songviews.delete_song, name='delete_song'),
     path('songs/<str:song_id>/hide/', songviews.hide_song, name='hide_song'),
     path('songs/<str:song_id>/unhide/', songviews.unhide_song, name='unhide_song'),
+    path('songs/<str:song_id>/waveform/', songviews.get_song_waveform, name='get_song_waveform'),
+    path('songs/<str:song_id>/stream/', mediaviews.stream_song, name='stream_song'),
+    path('songs/<str:song_id>/stream/video/', mediaviews.stream_song, {'kind': 'video'}, name='stream_song_video'),
+    path('songs/<str:song_id>/hls/playlist.m3u8', mediaviews.song_hls_playlist, name='song_hls_playlist'),
+    path('songs/<str:song_id>/hls/<str:version>/<int:index>.mp3', mediaviews.song_hls_segment, name='song_hls_segment'),
     path('albums/<str:album_id>/songs/<str:song_id>/delete', songviews.delete_song_inAlbum, name='delete_song'),
     path('songs/get_songs_by_album/<str:album_id>', songviews.get_songs_by_album, name='get_songs_by_album'),
+    # IMAGE VARIANTS
+    path('images/<str:token>/<str:size>.<str:fmt>', mediaviews.image_variant, name='image_variant'),
     # ALBUM
 
     path('albums/', albumviews.list_albums, name='list_albums'),  # Lấy tất cả album
     path('albums/create/', albumviews.create_album, name='create_album'),  # Tạo album mới
     path('albums/<str:album_id>/', albumviews.get_album, name='get_album'),  # Lấy chi tiết album
+    path('albums/<str:album_id>/detail/', albumviews.get_album_detail, name='get_album_detail'),  # Album + bài hát + nghệ sĩ
     path('albums/<str:albumId>/update/', albumviews.update_album, name='update_album'),
   # Cập nhật album
     path('albums/<str:album_id>/delete/', albumviews.delete_album, name='delete_album'),  # Xóa album
@@ -35,10 +46,14 @@ urlpatterns = [
     path('playlists/<str:playlist_id>', playlistviews.get_playlist_by_id, name='get_playlist_by_id'),
     path('playlists/<str:playlist_id>/update', playlistviews.update_playlist, name='update_playlist'),
     path('playlists/<str:playlist_id>/delete', playlistviews.delete_playlist, name='delete_playlist'),
+    path('playlists/<str:playlist_id>/clone', playlistviews.clone_playlist, name='clone_playlist'),
     # PLAYLIST SONGS
     path('playlists/<str:playlist_id>/add_songs', playlist_songviews.add_songs_to_playlist, name='add_songs_to_playlist'),
+    path('playlists/<str:playlist_id>/add_songs/batch', playlist_songviews.add_songs_to_playlist_batch, name='add_songs_to_playlist_batch'),
     # path('playlists/<str:playlist_id>/remove_songs', playlist_songviews.remove_songs_from_playlist, name='remove_songs_from_playlist'),
     path('playlists/<str:playlist_id>/songs', playlist_songviews.get_songs_in_playlist, name='get_songs_in_playlist'),
+    path('playlists/<str:playlist_id>/songs/<str:song_id>/move', playlist_songviews.move_song_in_playlist, name='move_song_in_playlist'),
+    path('playlists/<str:playlist_id>/changes', playlist_songviews.get_playlist_changes, name='get_playlist_changes'),
     # ARTIST
     path('artists/', artistviews.get_all_artists, name='get_all_artists'),
     path('artists/create', artistviews.create_artist, name='create_artist'),
@@ -56,6 +71,9 @@ urlpatterns = [
     # Người dùng follow target (nghệ sĩ hoặc user khác)
     path('follow/', followviews.follow_target, name='follow_target'),
     # path('follow/<str:user_id>/<str:followed_id>/unfollow/', playlistviews.unfollow_user, name='unfollow_user'),
+    # SEARCH
+    path('search/', searchviews.search, name='search'),
+    path('search/autocomplete/', searchviews.autocomplete, name='autocomplete'),
 ]
 
 
@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from .models import User
+from spotify_app.images import ImageVariantsField
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_pic_variants = ImageVariantsField(source='profile_pic')
+
     class Meta:
         model = User
         fields = '__all__'  # Includes all attributes
@@ -7,7 +7,6 @@ from .models import User
 from .serializers import *
 from datetime import timedelta
 from django.conf import settings
-import traceback
 import jwt
 from spotify_app.middlewares import JWTAuthMiddleware
 from spotify_app.permissionsCustom import IsAdminUser
@@ -15,6 +14,9 @@ from rest_framework.pagination import LimitOffsetPagination
 from backend.utils import SchemaFactory
 
 from bson import ObjectId  # Import this at the top
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # 1. Register API
@@ -71,7 +73,7 @@ def register(request):
         }, status=201)
 
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Registration failed")
         return Response({
             "error": "Registration failed",
             "detail": str(e)
@@ -316,12 +318,12 @@ def get_user_list(request):
 @api_view(['PUT'])
 @permission_classes([AllowAny])
 def update_user(request, _id=None):
-    print(f"Received request for user_id: {_id}")  # Debugging line
+    logger.debug("Received request for user_id: %s", _id)
     try:
         # Use _id field in the query for MongoDB (Djongo)
         try:
             user = User.objects.get(_id=ObjectId(_id))# Searching by _id, not id
-            print(f"User found: {user}")
+            logger.debug("User found: %s", user)
         except User.DoesNotExist:
             return Response({
                 "success": False,
@@ -347,7 +349,7 @@ def update_user(request, _id=None):
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Error updating user %s", _id)
         return Response({
             "success": False,
             "error": "Đã xảy ra lỗi khi cập nhật thông tin người dùng",
@@ -387,7 +389,7 @@ def get_user_by_id(request , _id=None):
         }, status=status.HTTP_404_NOT_FOUND)
     
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Error retrieving user %s", _id)
         return Response({
             "success": False,
             "error": "An error occurred while retrieving user information",